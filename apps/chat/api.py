@@ -2,9 +2,11 @@ from robyn.robyn import Request
 from robyn import Response
 from core.response import ApiResponse
 from apps.chat import crud as chat_crud
-from core.database import AsyncSessionLocal
+from core.database import AsyncSessionLocal, AsyncReadSessionLocal
 from apps.users import crud as user_crud
 from .utils import generate_session_id
+from .fts import search_messages as fts_search_messages
+from core.auth import get_current_user
 
 """
     定义用户API接口
@@ -20,12 +22,12 @@ async def create_chat_session(request: Request) -> Response:
         data = request.json()
         user_id = data.get("user_id")
         # token = data["token"]
-        async with AsyncSessionLocal() as db:
-            # 判断用户存在
-            user = await user_crud.get_user(db, user_id)
-            if not user:
-                return ApiResponse.error(message="用户不存在无法创建会话")
+        # 判断用户存在
+        user = await user_crud.load_user(user_id)
+        if not user:
+            return ApiResponse.error(message="用户不存在无法创建会话")
 
+        async with AsyncSessionLocal() as db:
             session = await chat_crud.create_session(
                 db, 
                 session_id=generate_session_id(),
@@ -40,9 +42,8 @@ async def get_session(request: Request) -> Response:
     """获取单个会话"""
     try:
         session_id = request.path_params.get("session_id")
-        async with AsyncSessionLocal() as db:
-            session = await chat_crud.get_session(db, session_id)
-            return ApiResponse.success(data=session.to_dict())
+        session = await chat_crud.load_session(session_id)
+        return ApiResponse.success(data=session.to_dict())
     except Exception as e:
         return ApiResponse.error(message=str(e))
     
@@ -51,9 +52,23 @@ async def get_sessions(request: Request) -> Response:
     try:
         session_data = request.json()
         user_id = session_data.get("user_id")
+        cursor = session_data.get("cursor")
         page = int(session_data.get("page", 1))
         page_size = int(session_data.get("page_size", 20))
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
+            if "cursor" in session_data:
+                # 游标分页, cursor 为空表示第一页
+                sessions, next_cursor, prev_cursor = await chat_crud.list_sessions_by_cursor(
+                    db, user_id, page_size, cursor or None
+                )
+                data = {
+                    "list": [s.to_dict() for s in sessions],
+                    "nextCursor": next_cursor,
+                    "prevCursor": prev_cursor
+                }
+                if session_data.get("with_total"):
+                    data["total"] = await chat_crud.get_user_session_count(db, user_id)
+                return ApiResponse.success(data=data)
             sessions = await chat_crud.list_sessions(db, user_id, page, page_size)
             return ApiResponse.success(data=[s.to_dict() for s in sessions])
     except Exception as e:
@@ -101,7 +116,7 @@ async def get_message(request: Request) -> Response:
         message_id = request.path_params.get("message_id")
         session_id = request.path_params.get("session_id")
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             message = await chat_crud.get_message(db, session_id, message_id)
             return ApiResponse.success(data=message.to_dict())
     except Exception as e:
@@ -111,10 +126,21 @@ async def get_messages(request: Request) -> Response:
     """批量获取会话历史消息"""
     try:
         session_id = request.path_params.get("session_id")
+        cursor = request.query_params.get("cursor", None)
         page = int(request.query_params.get("page", "1"))
         page_size = int(request.query_params.get("pageSize", "50"))
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
+            if cursor is not None:
+                # 游标分页, cursor 为空表示第一页
+                messages, next_cursor, prev_cursor = await chat_crud.list_messages_by_cursor(
+                    db, session_id, page_size, cursor or None
+                )
+                return ApiResponse.success(data={
+                    "list": [m.to_dict() for m in messages],
+                    "nextCursor": next_cursor,
+                    "prevCursor": prev_cursor
+                })
             messages = await chat_crud.list_messages(db, session_id, page, page_size)
             return ApiResponse.success(data=[m.to_dict() for m in messages])
     except ValueError as e:
@@ -144,3 +170,25 @@ async def update_message_content(request: Request) -> Response:
             return ApiResponse.success(data="消息编辑成功")
     except Exception as e:
         return ApiResponse.error(message=str(e))
+
+async def search_messages(request: Request) -> Response:
+    """
+    全文搜索当前用户的聊天记录
+    查询参数: q 关键词, cursor 上一次返回的 nextCursor, page_size 每页数量
+    """
+    try:
+        current_user = await get_current_user(request)
+        if not current_user:
+            return ApiResponse.unauthorized("请先登录")
+        keyword = request.query_params.get("q", "")
+        cursor = request.query_params.get("cursor", None)
+        page_size = int(request.query_params.get("page_size", 20))
+        async with AsyncReadSessionLocal() as db:
+            results, next_cursor = await fts_search_messages(
+                db, current_user["user_id"], keyword, page_size, cursor or None
+            )
+            return ApiResponse.success(data={"list": results, "nextCursor": next_cursor})
+    except ValueError as e:
+        return ApiResponse.error(message=f"无效的搜索参数: {str(e)}")
+    except Exception as e:
+        return ApiResponse.error(message=str(e))
@@ -10,7 +10,8 @@ from .api import (
     get_message,
     get_messages,
     delete_message,
-    update_message_content
+    update_message_content,
+    search_messages
 )
 
 
@@ -117,4 +118,15 @@ def chat_api_routes(app: Robyn):
         """
         修改单个消息内容
         """
-        return await update_message_content(request)
\ No newline at end of file
+        return await update_message_content(request)
+    
+    @app.get("/api/chat/search")
+    @error_handler
+    @request_logger
+    @auth_required
+    @rate_limit(max_requests=60, time_window=60)
+    async def search_messages_api(request):
+        """
+        全文搜索当前用户的聊天记录
+        """
+        return await search_messages(request)
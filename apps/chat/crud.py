@@ -1,10 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, insert, update, delete, func
 from core.database import AsyncSessionLocal
 from core.logger import setup_logger
 from common.utils.dynamic_query import dynamic_query
+from common.utils.cursor import paginate_by_cursor
+from common.utils.batch_loader import BatchLoader
+from core.cache_aside import cached, invalidate
 from .models import ChatSession, ChatMessage
 from typing import List, Optional, Dict
+from collections import Counter
 
 # 设置日志记录器
 logger = setup_logger('user_crud')
@@ -25,9 +29,11 @@ async def create_session(db: AsyncSession, session_id: str, user_id: str, title:
     db.add(new_session)
     await db.commit()
     await db.refresh(new_session)
+    await invalidate(f"chat:session:{session_id}", f"chat:user:{user_id}:sessions")
     return new_session
 
 
+@cached(key="chat:meta:{session_id}", model=ChatSession, tags=["chat:session:{session_id}"])
 async def get_session(db: AsyncSession, session_id: str) -> Optional[ChatSession]:
     """获取单个会话详情"""
     if not session_id:  # 防御性检查
@@ -40,6 +46,37 @@ async def get_session(db: AsyncSession, session_id: str) -> Optional[ChatSession
     return result.scalar_one_or_none()
 
 
+# 批量加载器: 同一轮事件循环中并发的按会话ID查询合并为一次 IN 查询
+session_loader = BatchLoader.for_column(ChatSession, "session_id", filters={"is_deleted": False})
+
+
+@cached(key="chat:meta:{session_id}", model=ChatSession, tags=["chat:session:{session_id}"])
+async def load_session(session_id: str) -> Optional[ChatSession]:
+    """
+    获取单个会话详情, 与 get_session 共用缓存
+    缓存未命中时通过批量加载器查询, 不需要调用方提供数据库会话
+    """
+    if not session_id:  # 防御性检查
+        return None
+    return await session_loader.load(session_id)
+
+
+def _session_list_tags(user_ids) -> List[str]:
+    """
+    用户会话列表各页共用的标签; 新消息会改变会话的更新时间, 各页的排序都可能变化, 需要整体失效
+    :param user_ids: 用户ID
+    :return: 标签列表
+    """
+    return [f"chat:user:{user_id}:sessions" for user_id in set(user_ids)]
+
+
+@cached(
+    key="chat:sessions:{user_id}:{page}:{page_size}",
+    model=ChatSession,
+    tags=lambda args, sessions: [f"chat:user:{args['user_id']}:sessions"]
+    + [f"chat:session:{session.session_id}" for session in sessions],
+    soft_ttl=30
+)
 async def list_sessions(
     db: AsyncSession, 
     user_id: str,
@@ -72,9 +109,13 @@ async def soft_delete_session(db: AsyncSession, session_id: str) -> bool:
         update(ChatSession)
         .where(ChatSession.session_id == session_id)
         .values(is_deleted=True)
+        .returning(ChatSession.user_id)
     )
+    user_ids = result.scalars().all()
     await db.commit()
-    return result.rowcount > 0
+    # 删除后其后各页的内容都会前移
+    await invalidate(f"chat:session:{session_id}", *_session_list_tags(user_ids))
+    return len(user_ids) > 0
 
 
 async def update_session_title(db: AsyncSession, session_id: str, new_title: str) -> bool:
@@ -85,8 +126,30 @@ async def update_session_title(db: AsyncSession, session_id: str, new_title: str
         .values(title=new_title)
     )
     await db.commit()
+    await invalidate(f"chat:session:{session_id}")
     return result.rowcount > 0
 
+async def list_sessions_by_cursor(
+    db: AsyncSession,
+    user_id: str,
+    page_size: int = 20,
+    cursor: Optional[str] = None
+):
+    """
+    游标分页获取用户会话列表, 按最后活动时间降序
+    接收 user_id 和上一次返回的游标
+    返回 (session对象列表, 下一页游标, 上一页游标)
+    """
+    page_size = min(max(1, page_size), 20)  # 限制每页最多20条
+    query = (
+        select(ChatSession)
+        .where(ChatSession.user_id == user_id)
+        .where(ChatSession.is_deleted == False)
+    )
+    return await paginate_by_cursor(
+        db, query, ChatSession.updated_at, ChatSession.session_id, page_size, cursor, descending=True
+    )
+
 # ------------------ 消息操作 ------------------
 
 async def create_message(
@@ -108,13 +171,17 @@ async def create_message(
         db.add(new_message)
         
         # 更新会话消息总数
-        await db.execute(
+        result = await db.execute(
             update(ChatSession)
             .where(ChatSession.session_id == session_id)
             .values(message_count=ChatSession.message_count + 1)
+            .returning(ChatSession.user_id)
         )
+        user_ids = result.scalars().all()
         
         await db.commit()
+        # 会话的消息数和更新时间已变化, 用户的会话列表排序也随之变化
+        await invalidate(f"chat:session:{session_id}", *_session_list_tags(user_ids))
         return new_message
         
     except Exception as e:
@@ -122,6 +189,38 @@ async def create_message(
         raise e  # 抛出异常供上层处理
 
 
+async def append_messages(db: AsyncSession, messages: List[Dict]) -> int:
+    """
+    批量写入聊天消息并更新会话计数（一次提交）
+    每个会话的消息数只更新一次, 由后台写入任务按批调用
+    :param messages: 消息字典列表（session_id, stream_id, content, role, created_at）
+    :return: 写入的消息数
+    """
+    if not messages:
+        return 0
+    try:
+        await db.execute(insert(ChatMessage), messages)
+
+        counts = Counter(msg["session_id"] for msg in messages)
+        user_ids = set()
+        for session_id, count in counts.items():
+            result = await db.execute(
+                update(ChatSession)
+                .where(ChatSession.session_id == session_id)
+                .values(message_count=ChatSession.message_count + count)
+                .returning(ChatSession.user_id)
+            )
+            user_ids.update(result.scalars().all())
+
+        await db.commit()
+        await invalidate(*{f"chat:session:{session_id}" for session_id in counts}, *_session_list_tags(user_ids))
+        return len(messages)
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+
 async def get_message(db: AsyncSession, session_id: str, message_id: int) -> Optional[ChatMessage]:
     """获取单条消息"""
     result = await db.execute(
@@ -156,6 +255,27 @@ async def list_messages(
 
 
 
+async def list_messages_by_cursor(
+    db: AsyncSession,
+    session_id: str,
+    page_size: int = 50,
+    cursor: Optional[str] = None
+):
+    """
+    游标分页获取会话消息历史, 按创建时间升序
+    返回 (message对象列表, 下一页游标, 上一页游标)
+    """
+    page_size = min(max(1, page_size), 50)  # 限制每页最多50条
+    query = (
+        select(ChatMessage)
+        .where(ChatMessage.session_id == session_id)
+        .where(ChatMessage.is_deleted == False)
+    )
+    return await paginate_by_cursor(
+        db, query, ChatMessage.created_at, ChatMessage.message_id, page_size, cursor
+    )
+
+
 async def soft_delete_message(db: AsyncSession, message_id: int) -> bool:
     """软删除消息"""
     result = await db.execute(
@@ -208,6 +328,11 @@ async def batch_create_messages(db: AsyncSession, messages: List[Dict]) -> bool:
     try:
         db.add_all([ChatMessage(**msg) for msg in messages])
         await db.commit()
+        session_ids = {msg["session_id"] for msg in messages if msg.get("session_id")}
+        user_ids = (await db.execute(
+            select(ChatSession.user_id).where(ChatSession.session_id.in_(session_ids)).distinct()
+        )).scalars().all() if session_ids else []
+        await invalidate(*{f"chat:session:{session_id}" for session_id in session_ids}, *_session_list_tags(user_ids))
         return True
     except Exception as e:
         logger.error(f"批量创建消息失败: {str(e)}")
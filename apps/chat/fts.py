@@ -0,0 +1,210 @@
+import os
+import asyncio
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.logger import setup_logger
+from common.utils.cursor import encode_cursor, decode_cursor
+from common.utils.fts import build_fts_query, like_pattern, snippet_terms, render_highlight, fts_tokenizer, HIGHLIGHT_START, HIGHLIGHT_END
+
+"""
+聊天记录全文索引(SQLite FTS5)
+chat_messages_fts 为外部内容(external content)表, 只索引未删除的消息:
+插入、修改内容、软删除和恢复消息时由触发器增量更新索引, 批量写入的消息同样会被索引;
+建表时随 chat_messages 表一起创建（见 models.py）
+
+应用启动时检查索引（见 ensure_fts）: 索引表不存在或分词器与配置不一致时自动重新建表并重建;
+也可手动重建索引（会按当前分词器重新建表）:
+    python -m apps.chat.fts
+"""
+
+# 设置日志记录器
+logger = setup_logger('chat_fts')
+
+# 分词器: trigram 按三字滑动窗口建索引, 中文整句中的词也能按子串检索, 少于三个字的关键词改用 LIKE 匹配
+CHAT_FTS_TOKENIZER = os.getenv('CHAT_FTS_TOKENIZER', 'trigram')
+CHAT_FTS_MAX_TERMS = int(os.getenv('CHAT_FTS_MAX_TERMS', 8))
+CHAT_SEARCH_MAX_PAGE_SIZE = int(os.getenv('CHAT_SEARCH_MAX_PAGE_SIZE', 50))
+
+CHAT_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+        content,
+        content='chat_messages', content_rowid='message_id', tokenize='{CHAT_FTS_TOKENIZER}'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages
+    WHEN IFNULL(new.is_deleted, 0) = 0 BEGIN
+        INSERT INTO chat_messages_fts(rowid, content) VALUES (new.message_id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ad AFTER DELETE ON chat_messages
+    WHEN IFNULL(old.is_deleted, 0) = 0 BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);
+    END
+    """,
+    # 只有已被索引（未删除）的旧行需要从索引中删除, 只有未删除的新行需要加入索引
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF content, is_deleted ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content)
+        SELECT 'delete', old.message_id, old.content WHERE IFNULL(old.is_deleted, 0) = 0;
+        INSERT INTO chat_messages_fts(rowid, content)
+        SELECT new.message_id, new.content WHERE IFNULL(new.is_deleted, 0) = 0;
+    END
+    """,
+]
+
+CHAT_FTS_DROP = "DROP TABLE IF EXISTS chat_messages_fts"
+
+# 外部内容表的 'rebuild' 会索引所有行（包括已删除的消息）, 因此清空后只写入未删除的消息
+CHAT_FTS_REBUILD = [
+    "INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('delete-all')",
+    "INSERT INTO chat_messages_fts(rowid, content) "
+    "SELECT message_id, content FROM chat_messages WHERE IFNULL(is_deleted, 0) = 0",
+]
+
+# 少于三个字的关键词（trigram 索引无法匹配）按子串过滤消息内容
+SEARCH_LIKE = " AND m.content LIKE :like{i} ESCAPE '\\'"
+
+
+@lru_cache(maxsize=64)
+def _search_statement(has_match: bool, like_count: int):
+    """
+    按查询结构生成搜索语句, 同一结构只生成一次
+    按相关度(bm25, 越小越相关)和消息ID排序, 游标为上一页最后一条的 (score, message_id);
+    只有短词时不经过全文索引, score 均为0, 即按消息ID排序
+    :param has_match: 是否有可以通过全文索引匹配的关键词
+    :param like_count: 需要子串匹配的关键词数量
+    :return: 搜索语句
+    """
+    likes = "".join(SEARCH_LIKE.format(i=i) for i in range(like_count))
+    if has_match:
+        columns = f"""snippet(chat_messages_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 24) AS snippet,
+               bm25(chat_messages_fts) AS score"""
+        source = """FROM chat_messages_fts
+        JOIN chat_messages m ON m.message_id = chat_messages_fts.rowid
+        JOIN chat_sessions s ON s.session_id = m.session_id
+        WHERE chat_messages_fts MATCH :match AND"""
+    else:
+        columns = "m.content AS snippet, 0.0 AS score"
+        source = """FROM chat_messages m
+        JOIN chat_sessions s ON s.session_id = m.session_id
+        WHERE"""
+    return text(f"""
+    SELECT * FROM (
+        SELECT m.message_id, m.session_id, m.role, m.created_at, s.title AS session_title,
+               {columns}
+        {source} s.user_id = :user_id AND s.is_deleted = 0 AND m.is_deleted = 0{likes}
+    )
+    WHERE :score IS NULL OR score > :score OR (score = :score AND message_id > :message_id)
+    ORDER BY score, message_id
+    LIMIT :limit
+""")
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: str,
+    keyword: str,
+    page_size: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    在用户自己的会话中全文搜索消息
+    :param db: 数据库会话
+    :param user_id: 用户ID, 只搜索该用户未删除的会话
+    :param keyword: 关键词, 多个词用空格分隔, 每个词按子串匹配
+    :param page_size: 每页数量
+    :param cursor: 上一次返回的 next_cursor
+    :return: (结果列表, 下一页游标或None)
+    :raises ValueError: 关键词为空或游标格式错误
+    """
+    query = build_fts_query(keyword or "", CHAT_FTS_MAX_TERMS, CHAT_FTS_TOKENIZER)
+    if not query.match and not query.like_terms:
+        raise ValueError("keyword is empty")
+    page_size = min(max(1, page_size), CHAT_SEARCH_MAX_PAGE_SIZE)
+    score, message_id = decode_cursor(cursor)[0] if cursor else (None, None)
+
+    params = {f"like{i}": like_pattern(term) for i, term in enumerate(query.like_terms)}
+    if query.match:
+        params["match"] = query.match
+    result = await db.execute(_search_statement(bool(query.match), len(query.like_terms)), {
+        **params,
+        "user_id": user_id,
+        "score": score,
+        "message_id": message_id,
+        "limit": page_size + 1,  # 多取一条, 判断是否还有下一页
+    })
+    rows = [dict(row) for row in result.mappings().all()]
+    # 摘要为转义后的HTML, 消息内容中的标签不会被执行
+    for row in rows:
+        if query.match:
+            row["snippet"] = render_highlight(row["snippet"])
+        else:
+            row["snippet"] = snippet_terms(row["snippet"], query.like_terms, width=48)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1]["score"], rows[-1]["message_id"]])
+    return rows, next_cursor
+
+
+async def install_fts(conn) -> None:
+    """
+    创建全文索引表和同步触发器（已存在时跳过）
+    :param conn: 异步数据库连接
+    """
+    for ddl in CHAT_FTS_DDL:
+        await conn.execute(text(ddl))
+
+
+async def rebuild_fts(conn) -> None:
+    """
+    按 chat_messages 表的当前数据重建全文索引, 跳过已删除的消息
+    :param conn: 异步数据库连接
+    """
+    for statement in CHAT_FTS_REBUILD:
+        await conn.execute(text(statement))
+
+
+async def ensure_fts(conn) -> bool:
+    """
+    检查全文索引: 补建缺失的索引表和触发器, 分词器与 CHAT_FTS_TOKENIZER 不一致时重新建表
+    :param conn: 异步数据库连接
+    :return: 是否重建了索引
+    """
+    if not (await conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages'"))).first():
+        # chat_messages 表尚未创建, 建表时会一起创建索引
+        return False
+    sql = (await conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages_fts'"))).scalar()
+    current = fts_tokenizer(sql) if sql else None
+    if current == " ".join(CHAT_FTS_TOKENIZER.split()):
+        await install_fts(conn)
+        return False
+    logger.warning(f"Chat message full-text index {'uses tokenizer ' + repr(current) if current else 'is missing'}, "
+                   f"rebuilding with {CHAT_FTS_TOKENIZER!r}")
+    await conn.execute(text(CHAT_FTS_DROP))
+    await install_fts(conn)
+    await rebuild_fts(conn)
+    return True
+
+
+async def main():
+    from core.database import engine
+
+    async with engine.begin() as conn:
+        # 删除后重新建表, 使分词器的修改生效
+        await conn.execute(text(CHAT_FTS_DROP))
+        await install_fts(conn)
+        await rebuild_fts(conn)
+        count = (await conn.execute(text("SELECT count(*) FROM chat_messages WHERE IFNULL(is_deleted, 0) = 0"))).scalar()
+    logger.info(f"Chat message full-text index rebuilt for {count} messages")
+    print(f"聊天记录全文索引重建完成, 共 {count} 条消息")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from core.database import AsyncSessionLocal
+from core.logger import setup_logger
+from apps.chat import crud
+
+"""
+聊天消息的后台批量写入(write-behind)
+消息先放入有界队列, 由后台任务按条数或时间攒成一批, 一次事务写入并提交,
+每个会话的消息数在一批中只更新一次; 队列已满时等待, 超时后改为直接写入数据库
+"""
+
+# 设置日志记录器
+logger = setup_logger('chat_writer')
+
+CHAT_WRITER_QUEUE_SIZE = int(os.getenv('CHAT_WRITER_QUEUE_SIZE', 10000))  # 队列最多缓存的消息数
+CHAT_WRITER_BATCH_SIZE = int(os.getenv('CHAT_WRITER_BATCH_SIZE', 200))  # 每批最多写入的消息数
+CHAT_WRITER_FLUSH_INTERVAL = float(os.getenv('CHAT_WRITER_FLUSH_INTERVAL', 0.2))  # 一批最多等待的时间（秒）
+CHAT_WRITER_ENQUEUE_TIMEOUT = float(os.getenv('CHAT_WRITER_ENQUEUE_TIMEOUT', 1))  # 队列已满时最多等待的时间（秒）
+
+
+class MessageWriter:
+    """聊天消息后台写入任务"""
+
+    def __init__(
+        self,
+        queue_size: int = CHAT_WRITER_QUEUE_SIZE,
+        batch_size: int = CHAT_WRITER_BATCH_SIZE,
+        flush_interval: float = CHAT_WRITER_FLUSH_INTERVAL
+    ):
+        """
+        :param queue_size: 队列容量
+        :param batch_size: 每批最多写入的消息数
+        :param flush_interval: 一批最多等待的时间（秒）
+        """
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._collecting: Optional[List[dict]] = None
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台写入任务"""
+        loop = asyncio.get_running_loop()
+        if self._task and not self._task.done() and self._task.get_loop() is loop:
+            return
+        # 队列与事件循环绑定, 切换事件循环时重新创建, 旧队列中尚未写入的消息转入新队列
+        if self._queue is None or self._task is None or self._task.get_loop() is not loop:
+            old_queue, self._queue = self._queue, asyncio.Queue(maxsize=self.queue_size)
+            if old_queue is not None:
+                self._take_over(old_queue)
+        self._task = loop.create_task(self._run())
+        logger.info("Chat message writer started")
+
+    def _take_over(self, old_queue: asyncio.Queue) -> None:
+        """
+        将旧事件循环中尚未写入的消息（正在攒批的和仍在队列中的）移入当前队列, 由新的后台任务写入
+        无法移入的消息计入 failed 并记录日志, 不会被静默丢弃
+        :param old_queue: 旧队列
+        """
+        moved = lost = 0
+        for message in self._collecting or []:
+            try:
+                self._queue.put_nowait(message)
+                moved += 1
+            except asyncio.QueueFull:
+                lost += 1
+        self._collecting = None
+        while not old_queue.empty():
+            try:
+                message = old_queue.get_nowait()
+            except Exception as e:
+                # 旧事件循环已关闭时, 唤醒其中等待的协程可能失败, 剩余消息无法取出
+                lost += old_queue.qsize()
+                logger.error(f"Failed to take over pending chat messages from the previous event loop: {str(e)}")
+                break
+            try:
+                self._queue.put_nowait(message)
+                moved += 1
+            except asyncio.QueueFull:
+                lost += 1
+        self.failed += lost
+        if moved:
+            logger.warning(f"Moved {moved} pending chat messages to the writer of the current event loop")
+        if lost:
+            logger.error(f"Lost {lost} pending chat messages while switching event loops")
+
+    async def enqueue(self, session_id: str, stream_id: Optional[str], content: str, role: str) -> None:
+        """
+        提交一条待写入的消息
+        创建时间在提交时确定, 批量写入后消息顺序与实际发送顺序一致
+        :param session_id: 会话ID
+        :param stream_id: 流ID
+        :param content: 消息内容
+        :param role: 角色
+        """
+        now = datetime.utcnow()
+        message = {
+            "session_id": session_id,
+            "stream_id": stream_id,
+            "content": content,
+            "role": role,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.start()
+        try:
+            await asyncio.wait_for(self._queue.put(message), CHAT_WRITER_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # 写入积压, 直接写入数据库, 不丢弃消息
+            logger.warning(f"Chat message queue is full, writing message for session {session_id} directly")
+            await self._write([message])
+
+    async def flush(self) -> None:
+        """等待队列中已有的消息全部写入"""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """写入剩余消息并停止后台任务"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info(f"Chat message writer stopped: {self.stats()}")
+
+    async def _run(self):
+        """取出消息, 满一批或等待超时后写入"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # 正在攒批的消息, 事件循环在攒批期间结束时由 _take_over 转入新队列
+            self._collecting = batch
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                # 已有积压时直接取出, 不等待
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._collecting = None
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[dict]) -> None:
+        """
+        写入一批消息, 整批失败时逐条重试, 只丢弃确实无法写入的消息
+        :param batch: 消息列表
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud.append_messages(db, batch)
+            self.written += len(batch)
+            self.batches += 1
+            return
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} chat messages in one batch, retrying one by one: {str(e)}")
+
+        for message in batch:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await crud.append_messages(db, [message])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to write chat message for session {message['session_id']}: {str(e)}")
+
+    def stats(self) -> dict:
+        """
+        获取写入统计
+        :return: 统计信息字典
+        """
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+
+message_writer = MessageWriter()
@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, DDL, event
 from sqlalchemy.orm import relationship
 from core.database import Base
+from apps.chat.fts import CHAT_FTS_DDL, CHAT_FTS_DROP
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,6 +28,7 @@ class ChatSession(Base):
     # 添加复合索引
     __table_args__ = (
         Index('ix_user_created', 'user_id', 'created_at'),  # 按用户和时间查询的复合索引
+        Index('ix_user_updated', 'user_id', 'updated_at', 'session_id'),  # 会话列表按最后活动时间游标分页
     )
 
     def __repr__(self):
@@ -84,3 +86,9 @@ class ChatMessage(Base):
             "updated_at": self.updated_at.isoformat(),
             "is_deleted": self.is_deleted
         }
+
+
+# 建表时同时创建消息全文索引和同步触发器, 删表前删除索引（仅SQLite）
+for _ddl in CHAT_FTS_DDL:
+    event.listen(ChatMessage.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(ChatMessage.__table__, "before_drop", DDL(CHAT_FTS_DROP).execute_if(dialect="sqlite"))
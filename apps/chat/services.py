@@ -9,7 +9,7 @@ from apps.chat.models import ChatSession
 from apps.chat.models import ChatMessage
 from core.auth import TokenService, get_token_from_request
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.database import AsyncSessionLocal
+from core.database import AsyncSessionLocal, AsyncReadSessionLocal
 from core.response import ApiResponse
 from core.logger import setup_logger
 from core.cache import Cache
@@ -33,12 +33,12 @@ async def create_session_service(request: Request) -> Response:
         # if not TokenService.verify_token(access_token):
         #     return ApiResponse.error(message="token验证失败，请重新登录！")
         
-        async with AsyncSessionLocal() as db:
-            # 判断用户存在
-            user = await user_crud.get_user(db, user_id)
-            if not user:
-                return ApiResponse.error(message="用户不存在无法创建会话")
+        # 判断用户存在
+        user = await user_crud.load_user(user_id)
+        if not user:
+            return ApiResponse.error(message="用户不存在无法创建会话")
 
+        async with AsyncSessionLocal() as db:
             session = await chat_crud.create_session(
                 db, 
                 session_id=generate_session_id(),
@@ -51,34 +51,43 @@ async def create_session_service(request: Request) -> Response:
     
 
 async def get_sessionlist_service(request: Request) -> Response:
-    """批量获取会话"""
+    """
+    批量获取会话
+    查询参数 cursor 存在时使用游标分页（为空表示第一页）, 否则按 page/page_size 分页
+    查询参数 with_total 控制是否统计总数, 游标分页默认不统计
+    """
     try:
         user_id = request.path_params.get("user_id")
-        print("####################批量获取会话##########################")
-        print('user_id:',user_id)
-        page = int(request.path_params.get("page", 1))
-        page_size = int(request.path_params.get("page_size", 20))
+        cursor = request.query_params.get("cursor", None)
+        page = int(request.query_params.get("page", request.path_params.get("page", 1)))
+        page_size = int(request.query_params.get("page_size", request.path_params.get("page_size", 20)))
+        with_total = request.query_params.get("with_total", "false" if cursor is not None else "true").lower() == "true"
         
-        async with AsyncSessionLocal() as db:
-            # 获取分页数据
-            sessions = await chat_crud.list_sessions(db, user_id, page, page_size)
-            print("###############################################################")
-            print(sessions)
-            # 获取总条数
-            total = await chat_crud.get_user_session_count(db, user_id)
-            
-            # 计算总页数
-            total_pages = (total + page_size - 1) // page_size
+        async with AsyncReadSessionLocal() as db:
+            pagination = {"pageSize": page_size}
+            if cursor is not None:
+                # 游标分页
+                sessions, next_cursor, prev_cursor = await chat_crud.list_sessions_by_cursor(
+                    db, user_id, page_size, cursor or None
+                )
+                pagination.update({"nextCursor": next_cursor, "prevCursor": prev_cursor})
+            else:
+                # 获取分页数据
+                sessions = await chat_crud.list_sessions(db, user_id, page, page_size)
+                pagination["pageNum"] = page
+
+            if with_total:
+                # 获取总条数, 计算总页数
+                total = await chat_crud.get_user_session_count(db, user_id)
+                pagination["total"] = total
+                pagination["totalPages"] = (total + page_size - 1) // page_size
             
             return ApiResponse.success(data={
                 "list": [s.to_dict() for s in sessions],
-                "pagination": {
-                    "total": total,
-                    "pageSize": page_size,
-                    "pageNum": page,
-                    "totalPages": total_pages
-                }
+                "pagination": pagination
             })
+    except ValueError as e:
+        return ApiResponse.error(message=f"无效的分页参数: {str(e)}")
     except Exception as e:
         return ApiResponse.error(message=str(e))
     
@@ -92,7 +101,7 @@ async def get_sessionlist_service_pro(request: Request) -> Response:
         page = 1
         page_size = 20
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             # 获取最近更新的20条会话（强制按更新时间降序）
             sessions = await chat_crud.list_sessions(db, user_id, page, page_size)
             
@@ -154,9 +163,9 @@ async def get_session(request: Request) -> Response:
     try:
         session_id = request.path_params.get("session_id")
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             # 获取会话基本信息
-            session = await chat_crud.get_session(db, session_id)
+            session = await chat_crud.load_session(session_id)
             if not session:
                 return ApiResponse.error(message="会话不存在", code=404)
             
@@ -204,10 +213,21 @@ async def get_messages(request: Request) -> Response:
     """批量获取会话历史消息"""
     try:
         session_id = request.path_params.get("session_id")
+        cursor = request.query_params.get("cursor", None)
         page = int(request.query_params.get("page", "1"))
         page_size = int(request.query_params.get("pageSize", "50"))
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
+            if cursor is not None:
+                # 游标分页, cursor 为空表示第一页
+                messages, next_cursor, prev_cursor = await chat_crud.list_messages_by_cursor(
+                    db, session_id, page_size, cursor or None
+                )
+                return ApiResponse.success(data={
+                    "list": [m.to_dict() for m in messages],
+                    "nextCursor": next_cursor,
+                    "prevCursor": prev_cursor
+                })
             messages = await chat_crud.list_messages(db, session_id, page, page_size)
             return ApiResponse.success(data=[m.to_dict() for m in messages])
     except ValueError as e:
@@ -5,9 +5,10 @@ import asyncio
 from model.base import AiChat
 import json
 import time
-from core.database import AsyncSessionLocal
+from core.database import AsyncReadSessionLocal
 from core.middleware import error_handler, request_logger, auth_required, admin_required, rate_limit
 from apps.chat import crud
+from apps.chat.message_writer import message_writer
 from core.auth import TokenService
 from core.cache import Cache
 
@@ -77,7 +78,7 @@ def ai_websocket(app: Robyn):
 
         try:
             # 检查会话ID是否存在
-            async with AsyncSessionLocal() as db:
+            async with AsyncReadSessionLocal() as db:
                 existing_session = await crud.get_session(db, session_id=session_id)
             
             if not existing_session:
@@ -200,15 +201,13 @@ def ai_websocket(app: Robyn):
             print(f"[会话{session_id}] {msg_data.get('content', '')}")
 
             try:
-                # 创建用户消息记录（用户提问）
-                async with AsyncSessionLocal() as db:
-                    await crud.create_message(
-                        db=db,
-                        session_id=session_id,
-                        stream_id=None,  # 用户消息不关联stream_id
-                        content=content,
-                        role="user"      # 角色标记为用户
-                    )
+                # 创建用户消息记录（用户提问）, 由后台任务批量写入数据库
+                await message_writer.enqueue(
+                    session_id=session_id,
+                    stream_id=None,  # 用户消息不关联stream_id
+                    content=content,
+                    role="user"      # 角色标记为用户
+                )
             except Exception as e:
                 print(f"用户消息存储失败: {str(e)}")
             
@@ -253,15 +252,13 @@ def ai_websocket(app: Robyn):
             await Cache.set_message(session_id, {"role": "assistant", "content": full_ai_response})
             
             try:    
-                # 将完整AI回复写入数据库（角色标记为AI）
-                async with AsyncSessionLocal() as db:
-                    await crud.create_message(
-                        db=db,
-                        session_id=session_id,
-                        stream_id=stream_id,  # 关联本次stream_id
-                        content=full_ai_response,
-                        role="assistant"      # 角色标记为AI助手
-                    )
+                # 将完整AI回复写入数据库（角色标记为AI）, 由后台任务批量写入
+                await message_writer.enqueue(
+                    session_id=session_id,
+                    stream_id=stream_id,  # 关联本次stream_id
+                    content=full_ai_response,
+                    role="assistant"      # 角色标记为AI助手
+                )
             except Exception as e:
                 print(f"AI回复存储失败: {str(e)}")
                 await ws.async_send_to(ws.id, json.dumps({
@@ -281,4 +278,10 @@ def ai_websocket(app: Robyn):
     @app.startup_handler
     async def startup_handler():
         asyncio.create_task(heartbeat_checker())
+        message_writer.start()
         print("WebSocket服务已启动，心跳检测已启用")
+
+    # 关闭前写入队列中剩余的聊天消息
+    @app.shutdown_handler
+    async def shutdown_handler():
+        await message_writer.stop()
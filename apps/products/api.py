@@ -7,6 +7,7 @@ from apps.products.services import (
     update_product_service,
     delete_product_service
 )
+from apps.products.queries import search_products
 
 """
     定义商城API接口
@@ -48,4 +49,14 @@ async def delete_product_api(request: Request):
     """
     删除产品 接口
     """
-    return await delete_product_service(request)
\ No newline at end of file
+    return await delete_product_service(request)
+
+async def search_products_api(request: Request):
+    """
+    全文搜索产品 接口
+    查询参数: q 关键词, page 页码, page_size 每页数量
+    """
+    keyword = request.query_params.get("q", "")
+    page = int(request.query_params.get("page", 1))
+    page_size = int(request.query_params.get("page_size", 20))
+    return await search_products(keyword, page, page_size)
@@ -5,7 +5,8 @@ from apps.products.api import (
     get_product_by_id_api,
     get_product_by_name_api,
     update_product_api,
-    delete_product_api
+    delete_product_api,
+    search_products_api
 )
 from core.middleware import error_handler, request_logger, auth_required, admin_required, rate_limit
 
@@ -36,6 +37,16 @@ def products_api_routes(app):
         """
         return await create_product_api(request)
     
+    @app.get("/api/products/search")
+    @error_handler
+    @request_logger
+    @rate_limit(max_requests=100, time_window=60)
+    async def products_search(request: Request):
+        """
+        全文搜索产品
+        """
+        return await search_products_api(request)
+    
     @app.get("/api/products/:product_id")
     @error_handler
     @request_logger
@@ -1,22 +1,49 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from apps.products.models import Product
-from common.utils.dynamic_query import dynamic_query
+from common.utils.dynamic_query import execute_dynamic_query, fetch_rows
+from common.utils.batch_loader import BatchLoader
+from core.cache_aside import cached, invalidate
 # from sqlalchemy.future import select
 
 """
     定义商城CRUD操作, 解耦API和数据库操作
     只定义 单表的基础操作 和 动态查询功能
-    CRUD层函数 返回值一律为 ORM实例对象
+    CRUD层函数 返回值一律为 ORM实例对象, 列表展示用的 *_rows 函数返回字典列表
 """
 
+# 列表接口返回的列, 与 Product.to_dict() 的字段一致
+PRODUCT_LIST_COLUMNS = ["id", "name", "description", "price", "image", "category", "stock", "created_at", "updated_at", "is_deleted"]
+
 # 单表的基础操作
+@cached(
+    key="product:id:{product_id}",
+    model=Product,
+    tags=lambda args, product: [f"product:{args['product_id']}"] if product else ["product:missing"]
+)
 async def get_product(db: AsyncSession, product_id: int):
     """
     根据产品ID获取单个产品
     """
     return await db.get(Product, product_id)
 
+
+# 批量加载器: 同一轮事件循环中并发的按ID查询合并为一次 IN 查询
+product_loader = BatchLoader.for_column(Product, "id")
+
+
+@cached(
+    key="product:id:{product_id}",
+    model=Product,
+    tags=lambda args, product: [f"product:{args['product_id']}"] if product else ["product:missing"]
+)
+async def load_product(product_id: int):
+    """
+    根据产品ID获取单个产品, 与 get_product 共用缓存
+    缓存未命中时通过批量加载器查询, 不需要调用方提供数据库会话
+    """
+    return await product_loader.load(product_id)
+
 async def create_product(db: AsyncSession, product: dict):
     """
     创建产品
@@ -25,6 +52,7 @@ async def create_product(db: AsyncSession, product: dict):
     db.add(new_product)  # 直接添加 Product 实例
     await db.commit()
     await db.refresh(new_product)
+    await invalidate("product:missing", "products")
     return new_product
 
 async def update_product(db: AsyncSession, product_id: int, product_data: dict):
@@ -39,6 +67,7 @@ async def update_product(db: AsyncSession, product_id: int, product_data: dict):
         setattr(target_product, key, value) # 设置目标产品的属性
     await db.commit() # 提交事务
     await db.refresh(target_product) # 刷新目标产品
+    await invalidate(f"product:{product_id}", "products") # 清除产品缓存及产品列表缓存
     return target_product
 
 async def delete_product(db: AsyncSession, product_id: int):
@@ -51,6 +80,7 @@ async def delete_product(db: AsyncSession, product_id: int):
     
     await db.delete(target_product)
     await db.commit()
+    await invalidate(f"product:{product_id}", "products")
     return target_product
 
 
@@ -60,16 +90,35 @@ async def get_product_by_filter(db: AsyncSession, filters: dict):
     """
     根据过滤条件查询产品
     """
-    query = await dynamic_query(db, Product, filters)
-    result = await db.execute(query)
+    result = await execute_dynamic_query(db, Product, filters)
     return result.first()
 
 
+@cached(
+    key="product:list:{filters}:{order_by}:{limit}:{offset}",
+    model=Product,
+    ttl=600,
+    tags=["products"],
+    soft_ttl=60
+)
 async def get_products_by_filters(db: AsyncSession, filters=None, order_by=None, limit=None, offset=None):
     """
     批量查询产品
     """
-    query = await dynamic_query(db, Product, filters, order_by, limit, offset)
-    result = await db.execute(query)
+    result = await execute_dynamic_query(db, Product, filters, order_by, limit, offset)
     return result.scalars().all()
 
+
+@cached(
+    key="product:rows:{filters}:{order_by}:{limit}:{offset}",
+    model=None,
+    ttl=600,
+    tags=["products"],
+    soft_ttl=60
+)
+async def get_product_rows(db: AsyncSession, filters=None, order_by=None, limit=None, offset=None):
+    """
+    批量查询产品列表数据, 只查询列表需要的列, 不创建ORM实例
+    """
+    return await fetch_rows(db, Product, PRODUCT_LIST_COLUMNS, filters, order_by, limit, offset)
+
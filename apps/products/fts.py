@@ -0,0 +1,116 @@
+import os
+import asyncio
+from sqlalchemy import text
+from core.logger import setup_logger
+from common.utils.fts import fts_tokenizer
+
+"""
+产品全文索引(SQLite FTS5)
+products_fts 为外部内容(external content)表, 只保存倒排索引, 正文仍在 products 表中;
+products 表的增删改由触发器同步到索引, 建表时随 products 表一起创建（见 models.py）
+
+应用启动时检查索引（见 ensure_fts）: 索引表不存在或分词器与配置不一致时自动重新建表并重建;
+也可手动重建索引（会按当前分词器重新建表）:
+    python -m apps.products.fts
+"""
+
+# 设置日志记录器
+logger = setup_logger('product_fts')
+
+# 分词器: trigram 按三字滑动窗口建索引, 中文连续文本也能按子串检索（需要 SQLite >= 3.34）,
+# 少于三个字的关键词由查询改用 LIKE 匹配; unicode61 只按空白和标点分词, 中文整句会被视为一个词
+PRODUCT_FTS_TOKENIZER = os.getenv('PRODUCT_FTS_TOKENIZER', 'trigram')
+# 搜索时最多使用的关键词数量
+PRODUCT_FTS_MAX_TERMS = int(os.getenv('PRODUCT_FTS_MAX_TERMS', 8))
+
+# 索引列的顺序与 bm25()/snippet() 的列序号对应: 0 name, 1 description, 2 category
+PRODUCT_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, category,
+        content='products', content_rowid='id', tokenize='{PRODUCT_FTS_TOKENIZER}'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description, category ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO products_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+]
+
+PRODUCT_FTS_DROP = "DROP TABLE IF EXISTS products_fts"
+
+PRODUCT_FTS_REBUILD = "INSERT INTO products_fts(products_fts) VALUES ('rebuild')"
+
+
+async def install_fts(conn) -> None:
+    """
+    创建全文索引表和同步触发器（已存在时跳过）
+    :param conn: 异步数据库连接
+    """
+    for ddl in PRODUCT_FTS_DDL:
+        await conn.execute(text(ddl))
+
+
+async def rebuild_fts(conn) -> None:
+    """
+    按 products 表的当前数据重建全文索引
+    :param conn: 异步数据库连接
+    """
+    await conn.execute(text(PRODUCT_FTS_REBUILD))
+
+
+async def ensure_fts(conn) -> bool:
+    """
+    检查全文索引: 补建缺失的索引表和触发器, 分词器与 PRODUCT_FTS_TOKENIZER 不一致时重新建表
+    已有数据库升级或修改分词器后, 启动时即可恢复搜索, 无需手动执行本模块
+    :param conn: 异步数据库连接
+    :return: 是否重建了索引
+    """
+    if not (await conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'"))).first():
+        # products 表尚未创建, 建表时会一起创建索引
+        return False
+    sql = (await conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"))).scalar()
+    current = fts_tokenizer(sql) if sql else None
+    if current == " ".join(PRODUCT_FTS_TOKENIZER.split()):
+        await install_fts(conn)
+        return False
+    logger.warning(f"Product full-text index {'uses tokenizer ' + repr(current) if current else 'is missing'}, "
+                   f"rebuilding with {PRODUCT_FTS_TOKENIZER!r}")
+    await conn.execute(text(PRODUCT_FTS_DROP))
+    await install_fts(conn)
+    await rebuild_fts(conn)
+    return True
+
+
+async def main():
+    from core.database import engine
+
+    async with engine.begin() as conn:
+        # 删除后重新建表, 使分词器的修改生效
+        await conn.execute(text(PRODUCT_FTS_DROP))
+        await install_fts(conn)
+        await rebuild_fts(conn)
+        count = (await conn.execute(text("SELECT count(*) FROM products"))).scalar()
+    logger.info(f"Product full-text index rebuilt for {count} products")
+    print(f"产品全文索引重建完成, 共 {count} 个产品")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
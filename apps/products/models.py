@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import DateTime, Integer, String, Boolean, Float
+from sqlalchemy import DateTime, Integer, String, Boolean, Float, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column
 from core.database import Base
+from apps.products.fts import PRODUCT_FTS_DDL, PRODUCT_FTS_DROP
 
 
 class Product(Base):
@@ -39,3 +40,9 @@ class Product(Base):
             "updated_at": self.updated_at,
             "is_deleted": self.is_deleted
         }
+
+
+# 建表时同时创建全文索引和同步触发器, 删表前删除索引（仅SQLite）
+for _ddl in PRODUCT_FTS_DDL:
+    event.listen(Product.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(Product.__table__, "before_drop", DDL(PRODUCT_FTS_DROP).execute_if(dialect="sqlite"))
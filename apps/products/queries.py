@@ -4,19 +4,62 @@
     职责：解耦复杂逻辑，方便复用。
 """
 
-from sqlalchemy import select
+import os
+from functools import lru_cache
+from sqlalchemy import select, text
 from apps.products.models import Product
+from apps.products.fts import PRODUCT_FTS_MAX_TERMS, PRODUCT_FTS_TOKENIZER
+from common.utils.fts import (
+    build_fts_query, like_pattern, highlight_terms, snippet_terms, render_highlight, HIGHLIGHT_START, HIGHLIGHT_END
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.database import AsyncSessionLocal
+from core.database import AsyncReadSessionLocal
 from core.response import ApiResponse
 from robyn import status_codes
 
+PRODUCT_SEARCH_MAX_PAGE_SIZE = int(os.getenv('PRODUCT_SEARCH_MAX_PAGE_SIZE', 50))
+
+# 结果列; 经过全文索引时名称高亮和描述摘要由 highlight()/snippet() 生成, 只有短词时在 Python 中生成,
+# 两者都是转义后的HTML（见 common.utils.fts.render_highlight）
+SEARCH_COLUMNS = "p.id, p.name, p.price, p.image, p.category, p.stock"
+# 少于三个字的关键词（trigram 索引无法匹配）在名称、描述、分类中按子串匹配
+SEARCH_LIKE = " AND (p.name LIKE :like{i} ESCAPE '\\' OR p.description LIKE :like{i} ESCAPE '\\' OR p.category LIKE :like{i} ESCAPE '\\')"
+
+
+@lru_cache(maxsize=64)
+def _search_statements(has_match: bool, like_count: int):
+    """
+    按查询结构生成搜索语句和计数语句, 同一结构只生成一次
+    :param has_match: 是否有可以通过全文索引匹配的关键词
+    :param like_count: 需要子串匹配的关键词数量
+    :return: (搜索语句, 计数语句)
+    """
+    likes = "".join(SEARCH_LIKE.format(i=i) for i in range(like_count))
+    if has_match:
+        # bm25 列权重: 名称 10, 描述 1, 分类 2; bm25 越小越相关
+        columns = f"""{SEARCH_COLUMNS},
+           highlight(products_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') AS name_highlight,
+           snippet(products_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 16) AS snippet,
+           bm25(products_fts, 10.0, 1.0, 2.0) AS score"""
+        source = """FROM products_fts
+    JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH :match AND p.is_deleted = 0"""
+        order = "score"
+    else:
+        columns = f"{SEARCH_COLUMNS}, p.name AS name_highlight, p.description AS snippet, 0.0 AS score"
+        source = "FROM products p WHERE p.is_deleted = 0"
+        order = "p.id"
+    return (
+        text(f"SELECT {columns} {source}{likes} ORDER BY {order} LIMIT :limit OFFSET :offset"),
+        text(f"SELECT count(*) {source}{likes}"),
+    )
+
 async def get_products_by_category(category: str):
     """
     根据分类查询产品
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             query = select(Product).where(Product.category == category)
             result = await db.execute(query)
             products = result.scalars().all()
@@ -35,7 +78,7 @@ async def get_products_by_price_range(min_price: float, max_price: float):
     根据价格范围查询产品
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             query = select(Product).where(Product.price >= min_price, Product.price <= max_price)
             result = await db.execute(query)
             products = result.scalars().all()
@@ -49,24 +92,49 @@ async def get_products_by_price_range(min_price: float, max_price: float):
         print(f"Error: {e}")
         return ApiResponse.error(message="获取价格范围产品失败", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
 
-async def search_products(keyword: str):
+async def search_products(keyword: str, page: int = 1, page_size: int = 20):
     """
-    搜索产品（名称和描述）
+    搜索产品（名称、描述和分类）
+    使用 FTS5 全文索引, 按 BM25 相关度排序（名称命中权重最高）, trigram 分词下每个关键词按子串匹配,
+    少于三个字的关键词在名称、描述、分类中按子串过滤; 返回名称高亮和描述中命中位置附近的摘要
+    注意: data 为 {list, pagination}（原先为产品数组）, 调用方需从 data.list 读取结果
     """
     try:
-        async with AsyncSessionLocal() as db:
-            query = select(Product).where(
-                (Product.name.ilike(f"%{keyword}%")) |
-                (Product.description.ilike(f"%{keyword}%"))
-            )
-            result = await db.execute(query)
-            products = result.scalars().all()
-            
-            if not products:
+        query = build_fts_query(keyword or "", PRODUCT_FTS_MAX_TERMS, PRODUCT_FTS_TOKENIZER)
+        if not query.match and not query.like_terms:
+            return ApiResponse.validation_error("请输入搜索关键词")
+        page = max(1, page)
+        page_size = min(max(1, page_size), PRODUCT_SEARCH_MAX_PAGE_SIZE)
+
+        search_sql, count_sql = _search_statements(bool(query.match), len(query.like_terms))
+        params = {f"like{i}": like_pattern(term) for i, term in enumerate(query.like_terms)}
+        if query.match:
+            params["match"] = query.match
+
+        async with AsyncReadSessionLocal() as db:
+            total = (await db.execute(count_sql, params)).scalar()
+            if not total:
                 return ApiResponse.not_found("未找到相关产品")
-            
-            products_data = [product.to_dict() for product in products]
-            return ApiResponse.success(data=products_data)
+
+            rows = [dict(row) for row in (await db.execute(
+                search_sql, {**params, "limit": page_size, "offset": (page - 1) * page_size}
+            )).mappings().all()]
+            for row in rows:
+                if query.match:
+                    row["name_highlight"] = render_highlight(row["name_highlight"])
+                    row["snippet"] = render_highlight(row["snippet"])
+                else:
+                    row["name_highlight"] = highlight_terms(row["name_highlight"], query.like_terms)
+                    row["snippet"] = snippet_terms(row["snippet"], query.like_terms)
+            return ApiResponse.success(data={
+                "list": rows,
+                "pagination": {
+                    "total": total,
+                    "pageNum": page,
+                    "pageSize": page_size,
+                    "totalPages": (total + page_size - 1) // page_size
+                }
+            })
     except Exception as e:
         print(f"Error: {e}")
         return ApiResponse.error(message="搜索产品失败", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,7 +1,7 @@
 from robyn import Request, Response, jsonify, status_codes
 from apps.products import crud
 from apps.products.models import Product
-from core.database import AsyncSessionLocal
+from core.database import AsyncSessionLocal, AsyncReadSessionLocal
 from core.response import ApiResponse
 
 """
@@ -15,12 +15,11 @@ async def get_product_by_id(request):
     通过产品ID获取单个产品
     """
     try:
-        async with AsyncSessionLocal() as db:
-            product_id = request.path_params.get("product_id")
-            product_obj = await crud.get_product(db, product_id)
-            if not product_obj:
-                return ApiResponse.not_found("产品不存在")
-            return ApiResponse.success(data=product_obj.to_dict())
+        product_id = request.path_params.get("product_id")
+        product_obj = await crud.load_product(product_id)
+        if not product_obj:
+            return ApiResponse.not_found("产品不存在")
+        return ApiResponse.success(data=product_obj.to_dict())
     except Exception as e:
         print(f"Error: {e}")
         return ApiResponse.error(message="获取产品失败", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -30,7 +29,7 @@ async def get_product_by_name(request):
     通过产品名称获取单个产品
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             product_name = request.path_params.get("product_name")
             product_obj = await crud.get_product_by_filter(db, {"name": product_name})
             if not product_obj:
@@ -43,12 +42,28 @@ async def get_product_by_name(request):
 async def get_products_service(request):
     """
     获取所有产品
+    可选查询参数: category 分类, min_price / max_price 价格范围, sort 排序列（"-" 开头表示降序, 如 -price）
     """
     try:
-        async with AsyncSessionLocal() as db:
-            products = await crud.get_products_by_filters(db)
-            products_data = [product.to_dict() for product in products]
+        filters = {}
+        category = request.query_params.get("category", None)
+        min_price = request.query_params.get("min_price", None)
+        max_price = request.query_params.get("max_price", None)
+        sort = request.query_params.get("sort", None)
+        if category:
+            filters["category"] = category
+        if min_price:
+            filters["price__gte"] = float(min_price)
+        if max_price:
+            filters["price__lte"] = float(max_price)
+        order_by = [sort] if sort else None
+
+        async with AsyncReadSessionLocal() as db:
+            # 只查询列表需要的列, 直接得到字典, 不创建ORM实例
+            products_data = await crud.get_product_rows(db, filters or None, order_by)
             return ApiResponse.success(data=products_data)
+    except ValueError as e:
+        return ApiResponse.error(message=f"无效的查询参数: {str(e)}")
     except Exception as e:
         print(f"Error: {e}")
         return ApiResponse.error(message="获取产品列表失败", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,9 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from core.database import AsyncSessionLocal
+from core.database import AsyncReadSessionLocal
 from core.logger import setup_logger
 from apps.users.models import User
-from common.utils.dynamic_query import dynamic_query
+from common.utils.dynamic_query import execute_dynamic_query, fetch_rows
+from common.utils.batch_loader import BatchLoader
+from core.cache_aside import cached, invalidate
 
 # 设置日志记录器
 logger = setup_logger('user_crud')
@@ -11,16 +13,59 @@ logger = setup_logger('user_crud')
 """
     定义用户CRUD操作, 解耦API和数据库操作
     只定义 单表的基础操作 和 动态查询功能
-    CRUD层函数 返回值一律为 ORM实例对象
+    CRUD层函数 返回值一律为 ORM实例对象, 列表展示用的 *_rows 函数返回字典列表
 """
 
+# 列表接口返回的列, 与 User.to_dict() 的字段一致
+USER_LIST_COLUMNS = [
+    "user_id", "username", "nickname", "email", "phone", "password", "is_admin", "is_active",
+    "is_deleted", "ip_address", "last_login", "created_at", "updated_at"
+]
+
+# 按条件查询的字段, 查询结果为None时负缓存按 字段:值 打标签, 只在该字段被写入相同的值时失效
+USER_LOOKUP_FIELDS = ("username", "email", "phone")
+# 不写入缓存的列, 需要时通过 get_password_hash 直接查询
+USER_CACHE_EXCLUDE = ("password",)
+
+
+def _missing_tags(filters: dict) -> list:
+    """
+    负缓存的标签
+    :param filters: 查询条件
+    :return: 每个查询字段一个 user:missing:{字段}:{值} 标签, 其他条件使用通用的 user:missing 标签
+    """
+    tags = [f"user:missing:{field}:{value}" for field, value in filters.items() if field in USER_LOOKUP_FIELDS]
+    if len(tags) < len(filters):
+        tags.append("user:missing")
+    return tags
+
+
+def _user_tags(args: dict, user) -> list:
+    return [f"user:{user.user_id}"] if user else _missing_tags(args["filters"])
+
+
 # 单表基础操作
+@cached(key="user:id:{user_id}", model=User, tags=["user:{user_id}"], exclude=USER_CACHE_EXCLUDE)
 async def get_user(db: AsyncSession, user_id: str):
     """
     根据用户ID获取单个用户
     """
     return await db.get(User, user_id)
 
+
+# 批量加载器: 同一轮事件循环中并发的按ID/用户名查询合并为一次 IN 查询
+user_loader = BatchLoader.for_column(User, "user_id")
+username_loader = BatchLoader.for_column(User, "username")
+
+
+@cached(key="user:id:{user_id}", model=User, tags=["user:{user_id}"], exclude=USER_CACHE_EXCLUDE)
+async def load_user(user_id: str):
+    """
+    根据用户ID获取单个用户, 与 get_user 共用缓存
+    缓存未命中时通过批量加载器查询, 不需要调用方提供数据库会话
+    """
+    return await user_loader.load(user_id)
+
 async def create_user(db: AsyncSession, user: dict):
     """
     创建用户
@@ -29,6 +74,11 @@ async def create_user(db: AsyncSession, user: dict):
     db.add(new_user)
     await db.commit()
     await db.refresh(new_user)
+    # 新用户可能命中之前按用户名、邮箱、手机号查询的负缓存
+    await invalidate(
+        f"user:{new_user.user_id}", "user:missing",
+        *_missing_tags({field: getattr(new_user, field) for field in USER_LOOKUP_FIELDS})
+    )
     return new_user
 
 async def update_user(db: AsyncSession, user_id: str, user_data: dict):
@@ -39,11 +89,20 @@ async def update_user(db: AsyncSession, user_id: str, user_data: dict):
     if user is None:
         raise Exception("User not found")
     
+    # 用户名、邮箱、手机号被修改时, 清除按新值查询的负缓存; 登录等只更新其他字段的写操作不影响负缓存
+    changed = {
+        field: user_data[field] for field in USER_LOOKUP_FIELDS
+        if field in user_data and user_data[field] != getattr(user, field)
+    }
     for key, value in user_data.items():
         setattr(user, key, value)
     
     await db.commit()
     await db.refresh(user)
+    tags = [f"user:{user_id}"]
+    if changed:
+        tags += _missing_tags(changed) + ["user:missing"]
+    await invalidate(*tags)
     return user
 
 async def delete_user(db: AsyncSession, user_id: str):
@@ -56,30 +115,58 @@ async def delete_user(db: AsyncSession, user_id: str):
     
     await db.delete(target_user)
     await db.commit()
+    await invalidate(f"user:{user_id}")
     return target_user
 
 # 动态查询
+@cached(key="user:filter:{filters}", model=User, tags=_user_tags, exclude=USER_CACHE_EXCLUDE)
 async def get_user_by_filter(db: AsyncSession, filters: dict):
     """
     根据过滤条件查询用户
     """
-    query = await dynamic_query(db, User, filters)
-    result = await db.execute(query)
+    result = await execute_dynamic_query(db, User, filters)
     # 返回第一条完整记录（ORM 对象）
     # return result.first()
     user = result.scalar_one_or_none()
     return user
 
 
+@cached(
+    key=lambda args, _: f"user:filter:username={args['username']}",
+    model=User,
+    tags=lambda args, user: [f"user:{user.user_id}"] if user else _missing_tags({"username": args["username"]}),
+    exclude=USER_CACHE_EXCLUDE
+)
+async def load_user_by_username(username: str):
+    """
+    根据用户名获取单个用户, 与 get_user_by_filter(db, {"username": ...}) 共用缓存
+    缓存未命中时通过批量加载器查询
+    """
+    return await username_loader.load(username)
+
+
+async def get_password_hash(db: AsyncSession, user_id: str):
+    """
+    获取用户的密码哈希, 不经过缓存（缓存中不保存密码哈希）
+    """
+    return await db.scalar(select(User.password).where(User.user_id == user_id))
+
+
 async def get_users_by_filters(db: AsyncSession, filters=None, order_by=None, limit=None, offset=None):
     """
     批量查询用户
     """
-    query = await dynamic_query(db, User, filters, order_by, limit, offset)
-    result = await db.execute(query)
+    result = await execute_dynamic_query(db, User, filters, order_by, limit, offset)
     # 返回所有完整记录（ORM 对象列表）
     return result.scalars().all()
 
+
+async def get_user_rows(db: AsyncSession, filters=None, order_by=None, limit=None, offset=None):
+    """
+    批量查询用户列表数据, 只查询列表需要的列, 不创建ORM实例
+    """
+    return await fetch_rows(db, User, USER_LIST_COLUMNS, filters, order_by, limit, offset)
+
 async def check_username_exists(username: str) -> bool:
     """
     检查用户名是否已存在
@@ -87,7 +174,7 @@ async def check_username_exists(username: str) -> bool:
     :return: 是否存在
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             result = await db.execute(
                 select(User).where(User.username == username)
             )
@@ -104,7 +191,7 @@ async def check_email_exists(email: str) -> bool:
     :return: 是否存在
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             result = await db.execute(
                 select(User).where(User.email == email)
             )
@@ -121,7 +208,7 @@ async def check_username_exists(username: str) -> bool:
     :return: 是否存在
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             result = await db.execute(
                 select(User).where(User.username == username)
             )
@@ -138,7 +225,7 @@ async def check_phone_exists(phone: str) -> bool:
     :return: 是否存在
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             result = await db.execute(
                 select(User).where(User.phone == phone)
             )
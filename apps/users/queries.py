@@ -3,7 +3,7 @@ from sqlalchemy import select
 from apps.users import crud
 from apps.users.models import User
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.database import AsyncSessionLocal
+from core.database import AsyncReadSessionLocal
 from core.response import ApiResponse
 from core.logger import setup_logger
 
@@ -21,12 +21,11 @@ async def get_user_by_id(request):
     通过用户ID获取单个用户
     """
     try:
-        async with AsyncSessionLocal() as db:
-            user_id = request.path_params.get("user_id")
-            user_obj = await crud.get_user(db, user_id)
-            if not user_obj:
-                return ApiResponse.not_found("用户不存在")
-            return ApiResponse.success(data=user_obj.to_dict())
+        user_id = request.path_params.get("user_id")
+        user_obj = await crud.load_user(user_id)
+        if not user_obj:
+            return ApiResponse.not_found("用户不存在")
+        return ApiResponse.success(data=user_obj.to_dict())
     except Exception as e:
         print(f"Error: {e}")
         return ApiResponse.error(message="获取用户失败", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -36,7 +35,7 @@ async def get_user_by_username(username):
     通过用户名获取单个用户
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user_obj = await crud.get_user_by_filter(db, {"username": username})
             if not user_obj:
                 return ApiResponse.not_found("用户不存在")
@@ -48,7 +47,7 @@ async def get_user_by_username(username):
 async def get_user_by_email(email: str) -> Response:
     """通过邮箱获取用户"""
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user = await crud.get_user_by_filter(db, {"email": email})
             if not user:
                 logger.warning(f"User not found with email: {email}")
@@ -64,7 +63,7 @@ async def get_user_by_email(email: str) -> Response:
 async def get_user_by_phone(phone: str) -> Response:
     """通过手机号获取用户"""
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user = await crud.get_user_by_filter(db, {"phone": phone})
             if not user:
                 logger.warning(f"User not found with phone: {phone}")
@@ -83,7 +82,7 @@ async def get_user(userdata):
     通过用户ID、邮箱、用户名、手机号查询用户
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user_obj = (await crud.get_user(db, userdata) or 
                        await crud.get_user_by_filter(db, {"username": userdata}) or 
                        await crud.get_user_by_filter(db, {"email": userdata}) or 
@@ -101,7 +100,7 @@ async def fuzzy_search_user(account):
     账号匹配用户
     """
     try:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user_obj = (await crud.get_user_by_filter(db, {"username": account}) or 
                        await crud.get_user_by_filter(db, {"email": account}) or 
                        await crud.get_user_by_filter(db, {"phone": account}))
@@ -117,9 +116,9 @@ async def get_users_service(request):
     获取所有用户列表
     """
     try:
-        async with AsyncSessionLocal() as db:
-            users_obj = await crud.get_users_by_filters(db)
-            users_data = [user.to_dict() for user in users_obj]
+        async with AsyncReadSessionLocal() as db:
+            # 只查询列表需要的列, 直接得到字典, 不创建ORM实例
+            users_data = await crud.get_user_rows(db)
             return ApiResponse.success(data=users_data)
     except Exception as e:
         print(f"Error: {e}")
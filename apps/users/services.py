@@ -5,10 +5,10 @@ from datetime import datetime, timedelta
 from robyn import Headers, Request, Response, jsonify, status_codes
 from apps.users import crud
 from apps.users.models import User
-from core.auth import TokenService, verify_password, get_password_hash, get_token_from_request
+from core.auth import TokenService, verify_password_async, get_password_hash_async, get_token_from_request, get_auth_context
 from sqlalchemy.ext.asyncio import AsyncSession
 from apps.users.queries import get_user_by_email, get_user_by_phone
-from core.database import AsyncSessionLocal
+from core.database import AsyncSessionLocal, AsyncReadSessionLocal
 from core.response import ApiResponse
 from core.logger import setup_logger
 from core.cache import Cache
@@ -53,7 +53,7 @@ async def create_user_service(request):
                 )
 
             user_data["user_id"] = generate_user_id()
-            user_data["password"] = get_password_hash(user_data["password"])
+            user_data["password"] = await get_password_hash_async(user_data["password"])
 
             try:
                 inserted_user = await crud.create_user(db, user_data)
@@ -82,7 +82,7 @@ async def update_user_service(request):
             if not user_obj:
                 return ApiResponse.not_found("用户不存在")
 
-            user_data["password"] = get_password_hash(user_data["password"])
+            user_data["password"] = await get_password_hash_async(user_data["password"])
     
             user = await crud.update_user(db, user_id, user_data)
             if not user:
@@ -121,7 +121,7 @@ async def update_user_field_service(request):
                         user_data[field] = bool(user_data[field])
 
             if "password" in user_data:
-                user_data["password"] = get_password_hash(user_data["password"])
+                user_data["password"] = await get_password_hash_async(user_data["password"])
                 
             user = await crud.update_user(db, user_id, user_data)
             if not user:
@@ -148,9 +148,9 @@ async def update_user_field_by_email(email, password):
                 return ApiResponse.not_found("用户不存在")
 
             user_data = {
-                "password": get_password_hash(password)
+                "password": await get_password_hash_async(password)
             }
-            old_password = user_obj.password
+            old_password = await crud.get_password_hash(db, user_obj.user_id)
             
                 
             user = await crud.update_user(db, user_obj.user_id, user_data)
@@ -226,11 +226,14 @@ async def login_user(request):
                 logger.error("User data is not a dictionary")
                 return ApiResponse.error(message="用户数据格式错误", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            if "password" not in user_data:
-                logger.error("No password field in user data")
+            # 缓存的用户数据中不含密码哈希, 直接从数据库读取
+            async with AsyncReadSessionLocal() as db:
+                password_hash = await crud.get_password_hash(db, user_data["user_id"])
+            if not password_hash:
+                logger.error("No password hash for user")
                 return ApiResponse.error(message="用户数据格式错误", status_code=status_codes.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            if not verify_password(password, user_data["password"]):
+            if not await verify_password_async(password, password_hash):
                 logger.warning(f"Invalid password attempt for account: {account}")
                 return ApiResponse.error(
                     message="密码错误",
@@ -298,7 +301,7 @@ async def refresh_token(request):
             return ApiResponse.validation_error("缺少刷新令牌")
         
         # 验证刷新令牌
-        payload = TokenService.decode_token(refresh_token)
+        payload = await TokenService.decode_token_async(refresh_token)
         if not payload or payload.get("type") != "refresh":
             return ApiResponse.unauthorized("无效的刷新令牌")
         
@@ -654,13 +657,13 @@ async def logout_user(request):
     try:
         # 获取当前令牌
         token = get_token_from_request(request)
-        payload = TokenService.decode_token(token)
-        user_id = payload.get("user_id")
-        async with AsyncSessionLocal() as db:
-            try:
-                await crud.update_user(db, user_id, {"is_active": False})
-            except Exception as e:
-                logger.error(f"Error updating user status: {str(e)}")
+        payload = await TokenService.decode_token_async(token) if token else None
+        if payload:
+            async with AsyncSessionLocal() as db:
+                try:
+                    await crud.update_user(db, payload.get("user_id"), {"is_active": False})
+                except Exception as e:
+                    logger.error(f"Error updating user status: {str(e)}")
         
         if token:
             # 将令牌加入黑名单
@@ -686,7 +689,7 @@ async def get_user_ip_history(request):
     try:
         user_id = request.path_params.get("user_id")
         
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             user = await crud.get_user(db, user_id)
             if not user:
                 return ApiResponse.not_found("用户不存在")
@@ -859,7 +862,7 @@ async def verify_and_register(request: Request) -> Response:
         # 创建用户
         try:
             # 确保密码被正确加密
-            user_data['password'] = get_password_hash(request_data['password'])
+            user_data['password'] = await get_password_hash_async(request_data['password'])
             user_data['user_id'] = generate_user_id()
             username = user_data['username']
             # 获取用户IP地址
@@ -984,7 +987,8 @@ async def check_token(request):
         logger.info(f"token2是:{token}")
             
         # 检查令牌是否需要续期
-        needs_refresh, payload = TokenService.check_token_needs_refresh(token)
+        context = await get_auth_context(request)
+        needs_refresh, payload = context.needs_refresh, context.payload
         logger.info(f"是否需要刷新:{needs_refresh},解码后的数据是：{payload}")
         if needs_refresh and payload:
             # 创建响应
@@ -1025,7 +1029,8 @@ async def get_userinfo(request):
         logger.info(f"token是:{token}")
             
         # 检查令牌是否需要续期
-        needs_refresh, payload = TokenService.check_token_needs_refresh(token)
+        context = await get_auth_context(request)
+        needs_refresh, payload = context.needs_refresh, context.payload
         logger.info(f"是否需要刷新:{needs_refresh},解码后的数据是：{payload}")
         if not payload:
             return ApiResponse.unauthorized("无效的token")
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+"""
+缓存读写路径基准测试
+    python benchmarks/bench_cache.py --backend memory
+    python benchmarks/bench_cache.py --backend redis --concurrency 50
+同一组操作分别在内存后端和Redis后端上运行, 对比各操作的吞吐量和延迟
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cache benchmark")
+    parser.add_argument("--backend", choices=["memory", "redis"], default="memory")
+    parser.add_argument("--requests", type=int, default=10000, help="每项操作的总次数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发协程数")
+    parser.add_argument("--local", action="store_true", help="启用进程内一级缓存")
+    return parser.parse_args()
+
+
+def percentile(samples: list, p: float) -> float:
+    index = min(int(len(samples) * p), len(samples) - 1)
+    return samples[index]
+
+
+async def run(name: str, operation, total: int, concurrency: int):
+    """
+    并发执行操作并输出统计
+    :param name: 操作名称
+    :param operation: 接收序号的协程函数
+    :param total: 总次数
+    :param concurrency: 并发数
+    """
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name:<16} {total / elapsed:>10.0f} ops/s"
+        f"  p50 {percentile(latencies, 0.50) * 1000:>7.3f} ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:>7.3f} ms"
+    )
+
+
+async def main(args):
+    from core.cache import Cache
+
+    await Cache.init()
+    keys = 1000
+    value = {"id": 1, "name": "benchmark", "tags": ["a", "b", "c"], "description": "x" * 200}
+    message = {"role": "user", "content": "hello " * 20}
+
+    print(f"backend={args.backend} requests={args.requests} concurrency={args.concurrency} local={args.local}")
+    await run("set", lambda i: Cache.set(f"bench:key:{i % keys}", value, expire=300), args.requests, args.concurrency)
+    await run("get", lambda i: Cache.get(f"bench:key:{i % keys}"), args.requests, args.concurrency)
+    await run(
+        "get_many(10)",
+        lambda i: Cache.get_many(f"bench:key:{(i + j) % keys}" for j in range(10)),
+        args.requests, args.concurrency
+    )
+    await run("set_message", lambda i: Cache.set_message(f"bench:{i % 100}", message, expire=300), args.requests, args.concurrency)
+    await run("get_messages", lambda i: Cache.get_messages(f"bench:{i % 100}", last_n=20), args.requests, args.concurrency)
+
+    await Cache.delete_many([f"bench:key:{i}" for i in range(keys)] + [f"chat:session:bench:{i}" for i in range(100)])
+    await Cache.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # 缓存配置在导入 core.cache 时读取, 需先设置环境变量
+    os.environ["CACHE_BACKEND"] = args.backend
+    os.environ["CACHE_LOCAL_ENABLED"] = "true" if args.local else "false"
+    asyncio.run(main(args))
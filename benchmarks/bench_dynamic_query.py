@@ -0,0 +1,77 @@
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+"""
+动态查询语句构造与执行基准测试
+    python benchmarks/bench_dynamic_query.py --iterations 20000
+对比每次调用都重新构造 select() 的旧写法与按查询形状缓存语句的写法:
+    prepare: 只构造语句并生成SQLAlchemy缓存键（决定能否命中编译缓存的Python端开销）
+    execute: 在内存SQLite上执行按用户名查询
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="dynamic_query benchmark")
+    parser.add_argument("--iterations", type=int, default=20000, help="每项测试的调用次数")
+    parser.add_argument("--rows", type=int, default=1000, help="测试表中的用户数")
+    return parser.parse_args()
+
+
+def legacy_query(model, filters: dict):
+    """旧写法: 每次调用构造新的语句"""
+    from sqlalchemy import select
+
+    query = select(model)
+    for column, value in filters.items():
+        query = query.where(getattr(model, column) == value)
+    return query, {}
+
+
+def report(name: str, elapsed: float, iterations: int):
+    print(f"{name:<24} {elapsed / iterations * 1e6:>9.2f} us/call")
+
+
+async def main(args):
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    from common.utils.dynamic_query import build_query
+    from apps.users.models import User
+
+    builders = [("legacy select()", legacy_query), ("shape-cached", build_query)]
+
+    print(f"iterations={args.iterations}")
+    for name, builder in builders:
+        started = time.perf_counter()
+        for i in range(args.iterations):
+            query, _ = builder(User, {"username": f"user{i % args.rows}"})
+            query._generate_cache_key()
+        report(f"prepare {name}", time.perf_counter() - started, args.iterations)
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+        await conn.execute(User.__table__.insert(), [
+            {"user_id": str(i), "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(args.rows)
+        ])
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    for name, builder in builders:
+        async with session_factory() as db:
+            started = time.perf_counter()
+            for i in range(args.iterations):
+                query, params = builder(User, {"username": f"user{i % args.rows}"})
+                result = await db.execute(query, params)
+                result.scalar_one_or_none()
+            report(f"execute {name}", time.perf_counter() - started, args.iterations)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,72 @@
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+"""
+并发登录时的事件循环延迟基准测试
+    python benchmarks/bench_password_hash.py --logins 50
+模拟同时到达的登录请求（每个请求验证一次bcrypt密码）, 同时运行一个每10ms唤醒一次的协程,
+记录其实际唤醒时间比预期晚多少（事件循环延迟）, 对比在事件循环中直接验证与在线程池中验证
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+TICK = 0.01
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="bcrypt loop lag benchmark")
+    parser.add_argument("--logins", type=int, default=50, help="并发登录数")
+    return parser.parse_args()
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    """按固定间隔休眠, 记录每次唤醒的延迟"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run(name: str, login, logins: int):
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    lags.sort()
+    p99 = lags[min(int(len(lags) * 0.99), len(lags) - 1)] if lags else 0
+    print(
+        f"{name:<12} total {elapsed * 1000:>8.1f} ms"
+        f"  loop lag max {max(lags, default=0) * 1000:>8.1f} ms  p99 {p99 * 1000:>8.1f} ms"
+    )
+
+
+async def main(args):
+    from core.auth import get_password_hash, verify_password, verify_password_async, BCRYPT_POOL_SIZE
+
+    hashed = get_password_hash("benchmark-password")
+
+    async def login_blocking():
+        verify_password("benchmark-password", hashed)
+
+    async def login_pooled():
+        await verify_password_async("benchmark-password", hashed)
+
+    print(f"logins={args.logins} BCRYPT_POOL_SIZE={BCRYPT_POOL_SIZE}")
+    await run("blocking", login_blocking, args.logins)
+    await run("pooled", login_pooled, args.logins)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
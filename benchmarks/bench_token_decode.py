@@ -0,0 +1,52 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+
+"""
+令牌验证吞吐量基准测试
+    python benchmarks/bench_token_decode.py --iterations 100000 --tokens 100
+对比启用、关闭已验证令牌缓存时 TokenService.decode_token 的吞吐量,
+--tokens 为轮流验证的不同令牌数（模拟同时在线的用户数）
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="decode_token benchmark")
+    parser.add_argument("--iterations", type=int, default=100000, help="验证次数")
+    parser.add_argument("--tokens", type=int, default=100, help="不同令牌的数量")
+    return parser.parse_args()
+
+
+def run(name: str, decode, tokens: list, iterations: int):
+    started = time.perf_counter()
+    for i in range(iterations):
+        if decode(tokens[i % len(tokens)]) is None:
+            raise RuntimeError("token verification failed")
+    elapsed = time.perf_counter() - started
+    print(f"{name:<16} {iterations / elapsed:>12.0f} ops/s  {elapsed / iterations * 1e6:>8.2f} us/op")
+
+
+def main(args):
+    from core.auth import TokenService, verified_tokens
+
+    tokens = [
+        TokenService.create_access_token({"user_id": str(i), "username": f"user{i}", "is_admin": False})
+        for i in range(args.tokens)
+    ]
+    print(f"iterations={args.iterations} tokens={args.tokens}")
+
+    verified_tokens.enabled = False
+    run("without cache", TokenService.decode_token, tokens, args.iterations)
+
+    verified_tokens.enabled = True
+    verified_tokens.clear()
+    run("with cache", TokenService.decode_token, tokens, args.iterations)
+    print(f"cache stats: {verified_tokens.stats()}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,163 @@
+import os
+import asyncio
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+from core.database import AsyncReadSessionLocal
+from core.logger import setup_logger
+from common.utils.dynamic_query import execute_dynamic_query
+
+"""
+批量加载器(DataLoader)
+同一轮事件循环中对同一类数据的多次按键查询（可以来自不同的请求）合并为一次 WHERE key IN (...) 查询,
+查询结果再按键分发给各个调用方:
+    user_loader = BatchLoader.for_column(User, "user_id")
+    user = await user_loader.load(user_id)
+
+在 request_scope() 内, 同一个请求重复加载同一个键时直接返回第一次的结果（请求级缓存）
+"""
+
+# 设置日志记录器
+logger = setup_logger('batch_loader')
+
+BATCH_LOADER_MAX_SIZE = int(os.getenv('BATCH_LOADER_MAX_SIZE', 500))  # 单次 IN 查询最多包含的键数
+
+# 当前请求的加载结果 {(加载器名称, 键): 结果}, 为None时不缓存
+_request_memo: ContextVar[Optional[dict]] = ContextVar("batch_loader_memo", default=None)
+
+
+@contextmanager
+def request_scope():
+    """
+    开启请求级缓存, 退出时丢弃
+        with request_scope():
+            return await handler(request)
+    """
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+class BatchLoader:
+    """按键批量加载数据, 每个事件循环各自收集和分发"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        name: str,
+        max_batch_size: int = BATCH_LOADER_MAX_SIZE
+    ):
+        """
+        :param batch_fn: 批量查询函数, 接收键列表, 返回 {字符串键: 结果} 字典, 不存在的键可以不返回
+        :param name: 加载器名称, 用于请求级缓存和日志
+        :param max_batch_size: 单次查询最多包含的键数, 超过时拆分为多次查询
+        """
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        # 每个事件循环各自等待查询的键 {字符串键: (原始键, Future)}
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+        # 进行中的查询任务, 保留引用避免被回收
+        self._tasks: set = set()
+        self.batches = 0
+        self.keys_loaded = 0
+
+    @classmethod
+    def for_column(cls, model, column: str, filters: dict = None, name: str = None, max_batch_size: int = BATCH_LOADER_MAX_SIZE):
+        """
+        创建按模型某一列加载ORM实例的加载器, 使用只读会话执行 IN 查询
+        键统一按字符串比较, 路径参数中的 "1" 与整数主键 1 视为同一个键
+        :param model: 数据库模型
+        :param column: 作为键的列名, 应为主键或唯一列
+        :param filters: 附加的过滤条件, 如 {"is_deleted": False}
+        :param name: 加载器名称, 默认为 "表名.列名"
+        :param max_batch_size: 单次查询最多包含的键数
+        :return: 加载器
+        """
+        async def batch_fn(keys: List[Hashable]) -> Dict[Hashable, Any]:
+            async with AsyncReadSessionLocal() as db:
+                result = await execute_dynamic_query(db, model, {**(filters or {}), f"{column}__in": keys})
+                return {str(getattr(obj, column)): obj for obj in result.scalars().all()}
+
+        return cls(batch_fn, name or f"{model.__tablename__}.{column}", max_batch_size)
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        加载单个键
+        :param key: 键
+        :return: 查询结果, 不存在时为None
+        """
+        memo = _request_memo.get()
+        memo_key = (self.name, str(key))
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            # 本轮事件循环的第一次加载, 在本轮结束时统一查询
+            pending = self._pending[loop] = {}
+            loop.call_soon(self._dispatch, loop)
+        entry = pending.get(str(key))
+        if entry is None:
+            entry = pending[str(key)] = (key, loop.create_future())
+
+        # 共享的 Future 不随单个调用方取消
+        value = await asyncio.shield(entry[1])
+        if memo is not None:
+            memo[memo_key] = value
+        return value
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """
+        加载多个键
+        :param keys: 键列表
+        :return: 与键顺序一致的结果列表, 不存在的键为None
+        """
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        """取出本轮收集的键, 按批次大小拆分后查询"""
+        pending = self._pending.pop(loop, None)
+        if not pending:
+            return
+        items = list(pending.items())
+        for start in range(0, len(items), self.max_batch_size):
+            task = loop.create_task(self._load_batch(dict(items[start:start + self.max_batch_size])))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, batch: Dict[str, tuple]) -> None:
+        """
+        执行一次批量查询并分发结果, 查询失败时所有等待的调用方收到同一个异常
+        :param batch: {字符串键: (原始键, Future)}
+        """
+        try:
+            results = await self.batch_fn([key for key, _ in batch.values()])
+        except Exception as e:
+            logger.error(f"Batch load {self.name} failed for {len(batch)} keys: {str(e)}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # 调用方都已取消时避免"异常未被获取"的警告
+                    future.exception()
+            return
+        self.batches += 1
+        self.keys_loaded += len(batch)
+        for key, (_, future) in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        """
+        获取加载统计
+        :return: 统计信息字典
+        """
+        return {
+            "batches": self.batches,
+            "keys": self.keys_loaded,
+            "avg_batch_size": round(self.keys_loaded / self.batches, 2) if self.batches else 0,
+        }
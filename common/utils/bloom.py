@@ -0,0 +1,66 @@
+import math
+import hashlib
+
+"""
+布隆过滤器
+判断"一定不存在"时没有误判, 判断"可能存在"时按设定的误判率误判; 不支持删除, 需要删除元素时整体重建
+    bloom = BloomFilter(capacity=100000, error_rate=0.001)
+    bloom.add(key)
+    key in bloom
+"""
+
+
+class BloomFilter:
+    """定长位数组的布隆过滤器, 使用双重哈希计算各个位置"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        :param capacity: 预期元素数量, 超过后误判率上升
+        :param error_rate: 元素数量达到 capacity 时的误判率
+        """
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        # 位数 m = -n·ln(p) / (ln2)², 哈希函数个数 k = m/n·ln2
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        data = key if isinstance(key, bytes) else key.encode()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        # 第二个哈希取奇数, 保证各个位置不会重合
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key) -> None:
+        """
+        加入元素
+        :param key: 元素（字符串或字节串）
+        """
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def stats(self) -> dict:
+        """
+        获取容量、位数和按当前元素数量估算的误判率
+        :return: 统计信息字典
+        """
+        estimated = (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+        return {
+            "capacity": self.capacity,
+            "count": self.count,
+            "bits": self.size,
+            "hash_count": self.hash_count,
+            "memory_bytes": len(self._bits),
+            "estimated_error_rate": round(estimated, 6),
+        }
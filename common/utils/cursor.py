@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+"""
+通用游标(keyset)分页
+按 (排序列, 唯一键列) 定位上一页的边界, 查询条件为 "排序列在边界之后", 不使用 OFFSET,
+翻到多深的页耗时都与第一页相同
+游标是对调用方不透明的字符串, 包含边界行的排序值和翻页方向
+"""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(position: List[Any], backward: bool = False) -> str:
+    """
+    编码游标
+    :param position: 边界行的 [排序值, 唯一键]
+    :param backward: 是否向前翻页（上一页）
+    :return: 游标字符串
+    """
+    payload = {"p": [_dump_value(value) for value in position], "b": 1 if backward else 0}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], bool]:
+    """
+    解码游标
+    :param cursor: 游标字符串
+    :return: (边界行的 [排序值, 唯一键], 是否向前翻页)
+    :raises ValueError: 游标格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        position = [_load_value(value) for value in payload["p"]]
+        if len(position) != 2:
+            raise ValueError("cursor position must have 2 values")
+        return position, bool(payload.get("b"))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def paginate_by_cursor(
+    db: AsyncSession,
+    query,
+    sort_column,
+    key_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False
+):
+    """
+    游标分页查询
+    :param db: 数据库会话
+    :param query: 已包含过滤条件、未排序的 select 查询
+    :param sort_column: 排序列, 如 ChatSession.updated_at
+    :param key_column: 唯一键列, 排序值相同时用于确定顺序, 如 ChatSession.session_id
+    :param limit: 每页数量
+    :param cursor: 上一次返回的 next_cursor / prev_cursor, 为空时查询第一页
+    :param descending: 是否按降序排列
+    :return: (ORM实例列表, 下一页游标或None, 上一页游标或None)
+    """
+    position, backward = decode_cursor(cursor) if cursor else (None, False)
+
+    if position is not None:
+        sort_value, key_value = position
+        # 向后翻页取边界之后的行, 向前翻页取边界之前的行
+        after = descending == backward
+        if after:
+            boundary = and_(sort_column >= sort_value, or_(sort_column > sort_value, key_column > key_value))
+        else:
+            boundary = and_(sort_column <= sort_value, or_(sort_column < sort_value, key_column < key_value))
+        query = query.where(boundary)
+
+    # 向前翻页时反向排序取最近的 limit 条, 取出后再恢复原顺序
+    ascending = descending == backward
+    order = [sort_column.asc(), key_column.asc()] if ascending else [sort_column.desc(), key_column.desc()]
+    # 多取一条, 判断是否还有更多数据
+    result = await db.execute(query.order_by(*order).limit(limit + 1))
+    items = list(result.scalars().all())
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backward:
+        items.reverse()
+
+    next_cursor = prev_cursor = None
+    if items:
+        has_next = has_more if not backward else True
+        has_prev = position is not None if not backward else has_more
+        if has_next:
+            last = items[-1]
+            next_cursor = encode_cursor([getattr(last, sort_column.key), getattr(last, key_column.key)])
+        if has_prev:
+            first = items[0]
+            prev_cursor = encode_cursor([getattr(first, sort_column.key), getattr(first, key_column.key)], backward=True)
+    return items, next_cursor, prev_cursor
@@ -1,38 +1,207 @@
-from sqlalchemy import select
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import select, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 
 """
 通用动态查询
 返回构造的查询对象：而不是直接执行查询
 调用方可以根据具体需求选择 scalars().all() 或 first() 或其他形式的处理方式。
+
+相同"形状"（模型、过滤列和运算符、排序列、投影列、是否分页）的查询只构造一次并缓存, 过滤值和分页值作为绑定参数在执行时传入。
+同一个语句对象会记住自己的缓存键, SQLAlchemy 可以直接命中编译缓存, 重复查询时不再构造语句、生成缓存键和编译SQL。
+
+过滤条件的键为 "列名" 或 "列名__运算符":
+    {"category": "book", "price__gte": 10, "price__lt": 100, "id__in": [1, 2], "name__like": "%pen%", "image__is_null": True}
+排序规则可以是列名字符串（"-" 开头表示降序）, 如 ["-created_at", "id"], 也可以是 [Model.name.asc()] 这样的表达式
 """
 
-async def dynamic_query(db: AsyncSession, model, filters: dict = None, order_by: list = None, limit: int = None, offset: int = None):
+DYNAMIC_QUERY_CACHE_SIZE = int(os.getenv('DYNAMIC_QUERY_CACHE_SIZE', 256))  # 缓存的查询形状数量上限
+
+# 运算符 -> 构造条件的函数（列, 绑定参数）
+OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "like": lambda column, value: column.like(value),
+    "ilike": lambda column, value: column.ilike(value),
+    "in": lambda column, value: column.in_(value),
+    "not_in": lambda column, value: column.not_in(value),
+}
+
+
+def _column(model, name: str):
     """
-    通用动态查询方法
+    获取模型的列属性
+    :raises ValueError: 列不存在
+    """
+    if name.startswith("_") or name not in model.__table__.columns:
+        raise ValueError(f"{model.__name__} has no column '{name}'")
+    return getattr(model, name)
+
+
+@lru_cache(maxsize=DYNAMIC_QUERY_CACHE_SIZE)
+def _statement_for_shape(
+    model,
+    conditions: Tuple[Tuple[str, str, Any], ...],
+    order_by: Tuple[str, ...],
+    columns: Tuple[str, ...],
+    has_limit: bool,
+    has_offset: bool
+):
+    """
+    按查询形状构造带绑定参数的语句
+    :param model: 查询的数据库模型
+    :param conditions: (列名, 运算符, is_null 的取值) 列表, 其余运算符的值为绑定参数 dq_列名__运算符
+    :param order_by: 排序列名, "-" 开头表示降序
+    :param columns: 投影的列名, 为空时查询完整的ORM实体
+    :param has_limit: 是否有数量限制
+    :param has_offset: 是否有偏移量
+    :return: 查询语句
+    """
+    query = select(*[_column(model, name) for name in columns]) if columns else select(model)
+    for name, op, null_value in conditions:
+        column = _column(model, name)
+        if op == "is_null":
+            query = query.where(column.is_(None) if null_value else column.is_not(None))
+        else:
+            param = bindparam(f"dq_{name}__{op}", expanding=op in ("in", "not_in"))
+            query = query.where(OPERATORS[op](column, param))
+    for name in order_by:
+        if name.startswith("-"):
+            query = query.order_by(_column(model, name[1:]).desc())
+        else:
+            query = query.order_by(_column(model, name).asc())
+    if has_limit:
+        query = query.limit(bindparam("dq_limit"))
+    if has_offset:
+        query = query.offset(bindparam("dq_offset"))
+    return query
+
+
+def build_query(
+    model,
+    filters: dict = None,
+    order_by: list = None,
+    limit: int = None,
+    offset: int = None,
+    columns: list = None
+):
+    """
+    构造查询语句和绑定参数
+    :param model: 查询的数据库模型
+    :param filters: 查询条件的字典 如 {"name": "John", "price__gte": 10}
+    :param order_by: 排序规则列表 如 ["-created_at"] 或 [Model.name.asc(), Model.age.desc()]
+    :param limit: 查询结果数量限制
+    :param offset: 查询起始偏移量
+    :param columns: 只查询的列名列表, 结果为行而不是ORM实体
+    :return: (查询语句, 绑定参数字典), 使用 db.execute(query, params) 执行
+    :raises ValueError: 列名或运算符不存在
+    """
+    params: Dict[str, Any] = {}
+    conditions = []
+    if filters:
+        for key, value in filters.items():
+            name, _, op = key.partition("__")
+            op = op or "eq"
+            if op == "eq" and value is None:
+                op, value = "is_null", True
+            if op == "is_null":
+                conditions.append((name, op, bool(value)))
+                continue
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported filter operator '{op}' in '{key}'")
+            conditions.append((name, op, None))
+            params[f"dq_{name}__{op}"] = list(value) if op in ("in", "not_in") else value
+    if limit is not None:
+        params["dq_limit"] = limit
+    if offset is not None:
+        params["dq_offset"] = offset
+
+    # 列名排序是形状的一部分; 表达式排序每次调用都是新的对象, 在缓存的语句上追加
+    order_names = tuple(item for item in order_by or () if isinstance(item, str))
+    order_clauses = [item for item in order_by or () if not isinstance(item, str)]
+    query = _statement_for_shape(
+        model,
+        tuple(conditions),
+        order_names,
+        tuple(columns or ()),
+        limit is not None,
+        offset is not None
+    )
+    if order_clauses:
+        query = query.order_by(*order_clauses)
+    return query, params
+
+
+async def execute_dynamic_query(
+    db: AsyncSession,
+    model,
+    filters: dict = None,
+    order_by: list = None,
+    limit: int = None,
+    offset: int = None,
+    columns: list = None
+):
+    """
+    执行动态查询
     :param db: 数据库会话
     :param model: 查询的数据库模型
-    :param filters: 查询条件的字典 如 {"name": "John"}
-    :param order_by: 排序规则列表 如 [Model.name.asc(), Model.age.desc()]
+    :param filters: 查询条件的字典 如 {"name": "John", "price__gte": 10}
+    :param order_by: 排序规则列表 如 ["-created_at"] 或 [Model.name.asc(), Model.age.desc()]
     :param limit: 查询结果数量限制
     :param offset: 查询起始偏移量
+    :param columns: 只查询的列名列表
     :return: 查询结果
     """
-    query = select(model)
+    query, params = build_query(model, filters, order_by, limit, offset, columns)
+    return await db.execute(query, params)
 
-    # 应用过滤条件
-    if filters:
-        for column, value in filters.items():
-            query = query.where(getattr(model, column) == value)
 
-    # 应用排序规则
-    if order_by:
-        query = query.order_by(*order_by)
+async def fetch_rows(
+    db: AsyncSession,
+    model,
+    columns: list,
+    filters: dict = None,
+    order_by: list = None,
+    limit: int = None,
+    offset: int = None
+) -> List[dict]:
+    """
+    只查询指定的列, 返回字典列表, 不创建ORM实体, 适用于只需要展示数据的列表接口
+    日期时间转换为ISO格式字符串, 结果可直接序列化为JSON
+    :param db: 数据库会话
+    :param model: 查询的数据库模型
+    :param columns: 查询的列名列表
+    :param filters: 查询条件的字典
+    :param order_by: 排序规则列表
+    :param limit: 查询结果数量限制
+    :param offset: 查询起始偏移量
+    :return: 行字典列表
+    """
+    result = await execute_dynamic_query(db, model, filters, order_by, limit, offset, columns)
+    return [
+        {key: value.isoformat() if isinstance(value, (datetime, date)) else value for key, value in row.items()}
+        for row in result.mappings()
+    ]
 
-    # 应用分页规则
-    if limit is not None:
-        query = query.limit(limit)
-    if offset is not None:
-        query = query.offset(offset)
 
-    return query
+async def dynamic_query(db: AsyncSession, model, filters: dict = None, order_by: list = None, limit: int = None, offset: int = None):
+    """
+    通用动态查询方法
+    返回已绑定参数值的查询对象, 可以继续追加条件; 只需执行时优先使用 execute_dynamic_query
+    :param db: 数据库会话
+    :param model: 查询的数据库模型
+    :param filters: 查询条件的字典 如 {"name": "John", "price__gte": 10}
+    :param order_by: 排序规则列表 如 ["-created_at"] 或 [Model.name.asc(), Model.age.desc()]
+    :param limit: 查询结果数量限制
+    :param offset: 查询起始偏移量
+    :return: 查询结果
+    """
+    query, params = build_query(model, filters, order_by, limit, offset)
+    return query.params(params) if params else query
@@ -0,0 +1,141 @@
+"""
+SQLite FTS5 全文检索的通用工具
+各索引默认使用 trigram 分词器: 按三字滑动窗口建索引, 中文等没有空格分隔的文本也能按子串检索;
+少于三个字的关键词无法通过 trigram 索引匹配, 由调用方改用 LIKE '%词%' 过滤（见 build_fts_query）
+返回给前端的高亮、摘要均为转义后的HTML: highlight()/snippet() 使用私用区字符作为标记,
+转义原文后再替换为 <mark>（见 render_highlight）, 文本中的标签不会被执行
+"""
+
+import re
+import html
+from typing import List, NamedTuple
+
+# trigram 分词器能够匹配的最短关键词长度
+TRIGRAM_MIN_LENGTH = 3
+
+# highlight()/snippet() 的标记, 使用Unicode私用区字符, 不会与HTML转义冲突
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+
+
+class FtsQuery(NamedTuple):
+    # MATCH 表达式, 没有可用索引匹配的关键词时为空字符串
+    match: str
+    # 需要用 LIKE 子串匹配的关键词（trigram 下少于三个字的词）
+    like_terms: List[str]
+
+
+def is_trigram(tokenizer: str) -> bool:
+    """
+    是否为 trigram 分词器
+    :param tokenizer: FTS5 tokenize 参数, 如 "trigram" 或 "unicode61 remove_diacritics 2"
+    """
+    return bool(tokenizer) and tokenizer.split()[0].lower() == "trigram"
+
+
+def fts_tokenizer(sql: str) -> str:
+    """
+    从 sqlite_master 中的建表语句解析 FTS5 表使用的分词器
+    :param sql: CREATE VIRTUAL TABLE 语句
+    :return: tokenize 参数（空白已规整）, 未指定时为 FTS5 默认的 "unicode61"
+    """
+    found = re.search(r"tokenize\s*=\s*(['\"])(.*?)\1", sql or "", re.IGNORECASE)
+    return " ".join(found.group(2).split()) if found else "unicode61"
+
+
+def split_keyword(keyword: str, max_terms: int = 8) -> List[str]:
+    """
+    按空白拆分关键词, 只保留包含文字或数字的词（纯符号的词没有意义）
+    :param keyword: 关键词
+    :param max_terms: 最多使用的关键词数量
+    :return: 关键词列表
+    """
+    return [term for term in (keyword or "").split() if any(ch.isalnum() for ch in term)][:max_terms]
+
+
+def build_fts_query(keyword: str, max_terms: int = 8, tokenizer: str = "") -> FtsQuery:
+    """
+    将用户输入的关键词转换为 FTS5 查询, 多个词之间为 AND 关系
+    每个词作为带引号的短语, 用户输入中的 FTS5 语法字符（引号、括号、NEAR、列过滤等）不会生效:
+    trigram 下短语即子串匹配, 少于三个字的词放入 like_terms; 其他分词器按前缀匹配（"词"*）
+    :param keyword: 关键词
+    :param max_terms: 最多使用的关键词数量
+    :param tokenizer: 索引使用的分词器, 默认按非 trigram 分词器处理
+    :return: FtsQuery(MATCH 表达式, LIKE 关键词列表), 两者都为空表示没有有效关键词
+    """
+    terms = split_keyword(keyword, max_terms)
+    if not is_trigram(tokenizer):
+        return FtsQuery(" ".join('"{}"*'.format(term.replace('"', '""')) for term in terms), [])
+    indexed = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+    short = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+    return FtsQuery(" ".join('"{}"'.format(term.replace('"', '""')) for term in indexed), short)
+
+
+def build_match_query(keyword: str, max_terms: int = 8, tokenizer: str = "") -> str:
+    """
+    将用户输入的关键词转换为 FTS5 MATCH 表达式（不含需要 LIKE 匹配的短词）
+    :param keyword: 关键词
+    :param max_terms: 最多使用的关键词数量
+    :param tokenizer: 索引使用的分词器
+    :return: MATCH 表达式, 没有有效关键词时为空字符串
+    """
+    return build_fts_query(keyword, max_terms, tokenizer).match
+
+
+def like_pattern(term: str) -> str:
+    """
+    子串匹配的 LIKE 模式, 转义 % _ 和转义符本身, 配合 ESCAPE '\\' 使用
+    :param term: 关键词
+    :return: LIKE 模式
+    """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def render_highlight(value: str, start: str = "<mark>", end: str = "</mark>") -> str:
+    """
+    转义带标记的文本, 再将 HIGHLIGHT_START / HIGHLIGHT_END 替换为HTML标签
+    :param value: highlight()/snippet() 的结果, 或 _mark_terms 标记后的文本
+    :return: 可以直接作为HTML渲染的文本
+    """
+    if not value:
+        return value
+    return html.escape(value).replace(HIGHLIGHT_START, start).replace(HIGHLIGHT_END, end)
+
+
+def _mark_terms(value: str, terms: List[str]) -> str:
+    """用 HIGHLIGHT_START / HIGHLIGHT_END 标记关键词（不区分大小写）"""
+    if not value or not terms:
+        return value
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    return pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", value)
+
+
+def highlight_terms(value: str, terms: List[str], start: str = "<mark>", end: str = "</mark>") -> str:
+    """
+    转义文本并标记关键词（不区分大小写）, 用于未经过 FTS 索引的结果
+    :param value: 文本
+    :param terms: 关键词
+    :return: 转义、标记后的HTML
+    """
+    return render_highlight(_mark_terms(value, terms), start, end)
+
+
+def snippet_terms(value: str, terms: List[str], width: int = 32, start: str = "<mark>", end: str = "</mark>", ellipsis: str = "...") -> str:
+    """
+    截取第一个关键词附近的文本, 转义并标记关键词, 用于未经过 FTS 索引的结果
+    :param value: 文本
+    :param terms: 关键词
+    :param width: 截取的字符数
+    :return: 转义、标记后的HTML摘要
+    """
+    if not value:
+        return value
+    lowered = value.lower()
+    positions = [pos for pos in (lowered.find(term.lower()) for term in terms) if pos >= 0]
+    first = min(positions) if positions else 0
+    begin = max(0, first - width // 4)
+    piece = value[begin:begin + width]
+    prefix = ellipsis if begin > 0 else ""
+    suffix = ellipsis if begin + width < len(value) else ""
+    return render_highlight(f"{prefix}{_mark_terms(piece, terms)}{suffix}", start, end)
@@ -1,3 +1,10 @@
+import os
+import time
+import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Tuple
 from jose import JWTError, jwt
@@ -5,8 +12,9 @@ from passlib.context import CryptContext
 from core.response import ApiResponse
 from core.logger import setup_logger
 from apps.users import crud
-from core.database import AsyncSessionLocal
+from core.database import AsyncReadSessionLocal
 from core.token_blacklist import token_blacklist
+from core.context import AuthContext, current_auth_context, set_auth_context
 from robyn import Request
 
 # 设置日志记录器
@@ -22,6 +30,14 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 AUTO_REFRESH_BEFORE_EXPIRY_MINUTES = 5  # 在过期前5分钟自动续期
 
+# 已验证令牌缓存配置
+TOKEN_CACHE_ENABLED = os.getenv('TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))  # 最多缓存的令牌数
+
+# 密码哈希线程池大小; bcrypt 计算时释放GIL, 线程池即可并行, 超出的请求在池中排队, 不阻塞事件循环
+BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', min(4, os.cpu_count() or 1)))
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_POOL_SIZE, thread_name_prefix="bcrypt")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     验证密码
@@ -39,6 +55,121 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在密码哈希线程池中验证密码, 不阻塞事件循环
+    :param plain_password: 明文密码
+    :param hashed_password: 哈希密码
+    :return: 是否匹配
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    在密码哈希线程池中计算密码哈希值, 不阻塞事件循环
+    :param password: 明文密码
+    :return: 哈希密码
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_executor, get_password_hash, password)
+
+class VerifiedTokenCache:
+    """
+    已验证令牌的LRU缓存
+    以令牌的SHA-256摘要为键, 保存解码结果和过期时间; 同一个令牌在有效期内再次验证时
+    不再重复校验签名和解析JSON; 过期、吊销的令牌会被移除, 超出容量时淘汰最久未使用的令牌
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, enabled: bool = TOKEN_CACHE_ENABLED):
+        """
+        :param max_size: 最多缓存的令牌数
+        :param enabled: 是否启用
+        """
+        self.max_size = max_size
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取已验证令牌的解码结果
+        :param token: JWT令牌
+        :return: 解码结果的副本, 未缓存或已过期时为None
+        """
+        if not self.enabled:
+            return None
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, exp = entry
+            if exp <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """
+        缓存验证通过的令牌, 没有过期时间的令牌不缓存
+        :param token: JWT令牌
+        :param payload: 解码结果
+        """
+        exp = payload.get("exp")
+        if not self.enabled or not exp:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        """
+        移除令牌（吊销时调用）
+        :param token: JWT令牌
+        """
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计
+        :return: 统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+verified_tokens = VerifiedTokenCache()
+
+
 class TokenService:
     """Token服务类"""
     
@@ -86,21 +217,82 @@ class TokenService:
     def decode_token(token: str) -> Optional[Dict[str, Any]]:
         """
         解码并验证令牌
+        当前请求已解码过同一个令牌时直接返回鉴权上下文中的结果
         :param token: JWT令牌
         :return: 解码后的数据或None（如果验证失败）
         """
+        context = current_auth_context(token)
+        if context is not None:
+            return context.payload
+        return TokenService._decode(token)
+
+    @staticmethod
+    async def decode_token_async(token: str) -> Optional[Dict[str, Any]]:
+        """
+        解码并验证令牌, 本进程无法确定是否已吊销时向Redis确认
+        :param token: JWT令牌
+        :return: 解码后的数据或None（如果验证失败）
+        """
+        context = current_auth_context(token)
+        if context is not None:
+            return context.payload
+        return TokenService._decode(token, await token_blacklist.is_revoked(token))
+
+    @staticmethod
+    def _decode(token: str, revoked: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """
+        检查黑名单并校验签名, 解码令牌
+        有效期内验证过的令牌直接使用缓存的解码结果, 黑名单仍每次检查
+        :param token: JWT令牌
+        :param revoked: 已确认的吊销状态, 为None时只检查本进程的黑名单（无法确定时按未吊销处理, 需要确认时使用异步接口）
+        :return: 解码后的数据或None（如果验证失败）
+        """
         try:
             # 首先检查令牌是否在黑名单中
-            if token_blacklist.is_blacklisted(token):
+            if revoked is None:
+                revoked = token_blacklist.is_blacklisted(token)
+            if revoked:
                 logger.warning("Token is blacklisted")
                 return None
+
+            payload = verified_tokens.get(token)
+            if payload is not None:
+                return payload
                 
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            verified_tokens.put(token, payload)
             return payload
         except JWTError as e:
             logger.error(f"Token decode error: {str(e)}")
             return None
     
+    @staticmethod
+    def build_context(token: Optional[str], revoked: Optional[bool] = None) -> AuthContext:
+        """
+        解码、验证令牌并计算续期判断, 生成鉴权上下文
+        :param token: JWT令牌, 可以为空
+        :param revoked: 已确认的吊销状态, 见 _decode
+        :return: 鉴权上下文, 令牌无效或已过期时 payload 为None
+        """
+        payload = TokenService._decode(token, revoked) if token else None
+        exp = payload.get("exp") if payload else None
+        if not exp or exp <= time.time():
+            return AuthContext(token=token)
+        # 距离过期的时间小于设定的阈值时需要续期
+        needs_refresh = exp - time.time() <= AUTO_REFRESH_BEFORE_EXPIRY_MINUTES * 60
+        return AuthContext(token=token, payload=payload, needs_refresh=needs_refresh)
+
+    @staticmethod
+    async def build_context_async(token: Optional[str]) -> AuthContext:
+        """
+        生成鉴权上下文, 本进程无法确定令牌是否已吊销时向Redis确认
+        :param token: JWT令牌, 可以为空
+        :return: 鉴权上下文
+        """
+        if not token:
+            return AuthContext(token=token)
+        return TokenService.build_context(token, await token_blacklist.is_revoked(token))
+
     @staticmethod
     def verify_token(token: str) -> bool:
         """
@@ -108,16 +300,9 @@ class TokenService:
         :param token: JWT令牌
         :return: 是否有效
         """
-        payload = TokenService.decode_token(token)
-        if not payload:
-            return False
-            
-        # 检查令牌是否过期
-        exp = payload.get("exp")
-        if not exp or datetime.fromtimestamp(exp) < datetime.utcnow():
-            return False
-            
-        return True
+        # 没有请求上下文时同样按 build_context 以时间戳比较过期时间
+        context = current_auth_context(token) or TokenService.build_context(token)
+        return context.authenticated
     
     @staticmethod
     def check_token_needs_refresh(token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
@@ -126,22 +311,8 @@ class TokenService:
         :param token: JWT令牌
         :return: (是否需要续期, 令牌数据)
         """
-        payload = TokenService.decode_token(token)
-        print("payload是",payload)
-        if not payload:
-            return False, None
-            
-        exp = payload.get("exp")
-        if not exp:
-            return False, None
-            
-        # 计算距离过期还有多少分钟
-        exp_time = datetime.fromtimestamp(exp)
-        remaining_time = exp_time - datetime.utcnow()
-        
-        # 如果剩余时间小于设定的阈值，需要续期
-        needs_refresh = remaining_time <= timedelta(minutes=AUTO_REFRESH_BEFORE_EXPIRY_MINUTES)
-        return needs_refresh, payload
+        context = current_auth_context(token) or TokenService.build_context(token)
+        return context.needs_refresh, context.payload
     
     @staticmethod
     def revoke_token(token: str) -> None:
@@ -152,9 +323,14 @@ class TokenService:
         try:
             payload = TokenService.decode_token(token)
             if payload and "exp" in payload:
-                expire_time = datetime.fromtimestamp(payload["exp"])
-                token_blacklist.add_to_blacklist(token, expire_time)
+                # JWT exp 为UTC时间戳, 直接传入, 不经本地时区转换
+                token_blacklist.add_to_blacklist(token, payload["exp"])
                 logger.info("Token revoked and added to blacklist")
+            verified_tokens.discard(token)
+            # 当前请求的鉴权上下文不再视为有效
+            context = current_auth_context(token)
+            if context is not None:
+                set_auth_context(AuthContext(token=token))
         except Exception as e:
             logger.error(f"Error revoking token: {str(e)}")
     
@@ -165,18 +341,12 @@ class TokenService:
         :param token: JWT令牌
         :return: 是否是管理员
         """
-        payload = TokenService.decode_token(token)
-        if not payload:
-            return False
-            
-        username = payload.get("sub")
-        if not username:
-            return False
-            
+        context = current_auth_context(token) or await TokenService.build_context_async(token)
         try:
-            async with AsyncSessionLocal() as db:
-                user = await crud.get_user_by_filter(db, {"username": username})
-                return user and user.is_admin
+            if not context.authenticated:
+                return False
+            user = await load_context_user(context)
+            return bool(user and user.is_admin)
         except Exception as e:
             logger.error(f"Admin verification error: {str(e)}")
             return False
@@ -195,28 +365,45 @@ def get_token_from_request(request: Request) -> Optional[str]:
     
     return None
 
+async def get_auth_context(request) -> AuthContext:
+    """
+    获取当前请求的鉴权上下文, 同一请求内令牌只解码、验证一次
+    本进程无法确定令牌是否已吊销时（尚未从Redis加载、布隆过滤器命中）向Redis确认
+    :param request: 请求对象
+    :return: 鉴权上下文
+    """
+    token = get_token_from_request(request)
+    context = current_auth_context()
+    if context is not None and context.token == token:
+        return context
+    context = await TokenService.build_context_async(token)
+    set_auth_context(context)
+    return context
+
+async def load_context_user(context: AuthContext):
+    """
+    加载鉴权上下文对应的用户记录, 同一请求内只查询一次
+    :param context: 鉴权上下文
+    :return: 用户ORM实例或None
+    """
+    if not context.user_loaded:
+        username = context.username
+        context.user = await crud.load_user_by_username(username) if username else None
+    return context.user
+
 async def get_current_user(request) -> Optional[Dict[str, Any]]:
     """
     获取当前登录用户信息
     :param request: 请求对象
     :return: 用户信息或None
     """
-    token = get_token_from_request(request)
-    if not token:
-        return None
-        
-    payload = TokenService.decode_token(token)
-    if not payload:
-        return None
-        
-    username = payload.get("sub")
-    if not username:
+    context = await get_auth_context(request)
+    if not context.authenticated:
         return None
         
     try:
-        async with AsyncSessionLocal() as db:
-            user = await crud.get_user_by_filter(db, {"username": username})
-            return user.to_dict() if user else None
+        user = await load_context_user(context)
+        return user.to_dict() if user else None
     except Exception as e:
         logger.error(f"Get current user error: {str(e)}")
         return None 
\ No newline at end of file
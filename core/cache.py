@@ -1,8 +1,19 @@
 import json
 import os
+import uuid
 import asyncio
-from redis.asyncio import Redis
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional
+from redis.asyncio import Redis, BlockingConnectionPool
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from core.logger import setup_logger
+from core.local_cache import LocalCache, MISSING
+from core.circuit_breaker import CircuitBreaker, HALF_OPEN
+from core import memory_redis
+from core.serializers import ValueCodec
+from core.cache_metrics import (
+    instrumented, mark_error, metrics, single_lookup, many_lookup, tagged_lookup, list_lookup
+)
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -12,6 +23,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # 加载环境变量
 load_dotenv(os.path.join(BASE_DIR, "robyn.env"))
 
+# 缓存后端: redis / memory（进程内实现, 无需Redis服务, 数据不在进程间共享）
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis').lower()
+
 # Redis配置
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
@@ -19,71 +33,476 @@ REDIS_DB = int(os.getenv('REDIS_DB', 0))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
 REDIS_MAX_RETRIES = 3
 REDIS_RETRY_DELAY = 1  # 秒
+REDIS_POOL_SIZE = int(os.getenv('REDIS_POOL_SIZE', 50))  # 连接池最大连接数
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 5))  # 连接池耗尽时等待空闲连接的时间（秒）
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))  # 秒
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))  # 连接空闲超过该时间后, 复用前先做健康检查（秒）
+
+# 熔断配置: Redis故障时快速失败, 不再逐次等待超时
+CACHE_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CACHE_BREAKER_FAILURE_THRESHOLD', 5))  # 时间窗口内失败多少次后熔断
+CACHE_BREAKER_WINDOW = float(os.getenv('CACHE_BREAKER_WINDOW', 10))  # 秒
+CACHE_BREAKER_RECOVERY_TIMEOUT = float(os.getenv('CACHE_BREAKER_RECOVERY_TIMEOUT', 5))  # 熔断多久后探测恢复（秒）
+CACHE_PROBE_TIMEOUT = float(os.getenv('CACHE_PROBE_TIMEOUT', 0.5))  # 探测PING的超时时间（秒）
+CACHE_WRITE_BUFFER_SIZE = int(os.getenv('CACHE_WRITE_BUFFER_SIZE', 1000))  # 熔断期间逐条暂存的失效键、标签数量, 超出后恢复时全量失效
+
+# 进程内缓存(一级缓存)配置
+CACHE_LOCAL_ENABLED = os.getenv('CACHE_LOCAL_ENABLED', 'false').lower() == 'true'
+CACHE_LOCAL_MAX_SIZE = int(os.getenv('CACHE_LOCAL_MAX_SIZE', 1024))
+CACHE_LOCAL_DEFAULT_TTL = int(os.getenv('CACHE_LOCAL_DEFAULT_TTL', 30))  # 秒, 用于Redis中没有过期时间的键
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate')
+
+# 缓存值序列化配置
+CACHE_SERIALIZER = os.getenv('CACHE_SERIALIZER', 'orjson')  # orjson / msgpack
+CACHE_COMPRESS_THRESHOLD = int(os.getenv('CACHE_COMPRESS_THRESHOLD', 1024))  # 序列化后超过该字节数时压缩, 0 表示不压缩
+CACHE_COMPRESS_LEVEL = int(os.getenv('CACHE_COMPRESS_LEVEL', 6))
+
+# 聊天记录队列配置
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', 50))  # 最多保留的消息条数, 0 表示不限制
+CHAT_HISTORY_MAX_BYTES = int(os.getenv('CHAT_HISTORY_MAX_BYTES', 0))  # 最多保留的消息总字节数, 0 表示不限制
+
+# 追加聊天消息并裁剪队列的脚本, 在Redis服务端原子执行
+# KEYS[1]: 队列键
+# ARGV[1]: 消息; ARGV[2]: 最大条数; ARGV[3]: 最大总字节数; ARGV[4]: 过期时间（秒）
+# 返回裁剪后的队列长度
+APPEND_MESSAGE_SCRIPT = """
+local key = KEYS[1]
+local max_len = tonumber(ARGV[2])
+local max_bytes = tonumber(ARGV[3])
+local expire = tonumber(ARGV[4])
+
+local len = redis.call('RPUSH', key, ARGV[1])
+if max_len > 0 and len > max_len then
+    redis.call('LTRIM', key, -max_len, -1)
+    len = max_len
+end
+
+if max_bytes > 0 then
+    -- 从最新的消息往前累加字节数, 至少保留最新的一条
+    local items = redis.call('LRANGE', key, 0, -1)
+    local total = 0
+    local keep = 0
+    for i = #items, 1, -1 do
+        total = total + string.len(items[i])
+        if total > max_bytes and keep > 0 then
+            break
+        end
+        keep = keep + 1
+    end
+    if keep < #items then
+        redis.call('LTRIM', key, -keep, -1)
+    end
+    len = keep
+end
+
+if expire > 0 then
+    redis.call('EXPIRE', key, expire)
+end
+return len
+"""
+
+# 缓存标签配置
+CACHE_TAG_TTL = int(os.getenv('CACHE_TAG_TTL', 86400))  # 标签集合的过期时间（秒）, 需不小于任何带标签缓存的过期时间
+CACHE_TAG_TOMBSTONE_TTL = int(os.getenv('CACHE_TAG_TOMBSTONE_TTL', 600))  # 标签失效记录的保留时间（秒）
+CACHE_INVALIDATION_SEQ_KEY = 'cache:invalidation_seq'
+
+# 写入带标签的缓存
+# KEYS[1]: 缓存键; KEYS[2..n+1]: 标签集合键; KEYS[n+2..2n+1]: 标签失效序号键
+# ARGV[1]: 值; ARGV[2]: 过期时间（秒）; ARGV[3]: 读取数据前的全局失效序号; ARGV[4]: 标签集合过期时间（秒）
+# 读取数据之后若有任一标签被失效, 放弃写入, 避免把旧数据写回缓存; 返回是否写入
+SET_TAGGED_SCRIPT = """
+local n = (#KEYS - 1) / 2
+local start_seq = tonumber(ARGV[3])
+for i = 1, n do
+    local seq = tonumber(redis.call('GET', KEYS[1 + n + i]) or '0')
+    if seq > start_seq then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 1, n do
+    redis.call('SADD', KEYS[1 + i], KEYS[1])
+    redis.call('EXPIRE', KEYS[1 + i], ARGV[4])
+end
+return 1
+"""
+
+# 按标签失效缓存
+# KEYS[1]: 全局失效序号键; KEYS[2..n+1]: 标签集合键; KEYS[n+2..2n+1]: 标签失效序号键
+# ARGV[1]: 失效记录保留时间（秒）
+# 返回被删除的缓存键列表
+INVALIDATE_TAGS_SCRIPT = """
+local n = (#KEYS - 1) / 2
+local seq = redis.call('INCR', KEYS[1])
+local deleted = {}
+for i = 1, n do
+    local members = redis.call('SMEMBERS', KEYS[1 + i])
+    for _, member in ipairs(members) do
+        redis.call('DEL', member)
+        table.insert(deleted, member)
+    end
+    redis.call('DEL', KEYS[1 + i])
+    redis.call('SET', KEYS[1 + n + i], seq, 'EX', ARGV[1])
+end
+return deleted
+"""
+
+# 释放锁
+# KEYS[1]: 锁的键; ARGV[1]: 持有者标识
+# 只删除自己持有的锁, 锁已过期并被其他进程获取时不删除; 返回是否删除
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 内存后端中各脚本对应的Python实现
+MEMORY_SCRIPTS = {
+    APPEND_MESSAGE_SCRIPT: memory_redis.append_message,
+    SET_TAGGED_SCRIPT: memory_redis.set_tagged,
+    INVALIDATE_TAGS_SCRIPT: memory_redis.invalidate_tags,
+    RELEASE_LOCK_SCRIPT: memory_redis.release_lock,
+}
 
 logger = setup_logger('cache')
 
+
+class CacheUnavailable(Exception):
+    """熔断期间的缓存调用, 不访问Redis直接失败"""
+
+
+class CachePipeline:
+    """
+    缓存批量命令
+    由 Cache.pipeline() 创建, 退出上下文时所有命令在一次往返中执行
+    set/get/delete/exists 会按 Cache 的格式编解码; 其他Redis命令原样透传
+    """
+
+    def __init__(self, pipe, codec: ValueCodec):
+        self._pipe = pipe
+        self._codec = codec
+        self._decoders = []
+        self.written_keys = []
+        self.results = []
+
+    def set(self, key: str, value: dict, expire: int = None):
+        """
+        设置缓存
+        :param key: 键
+        :param value: 值（字典类型）
+        :param expire: 过期时间（秒）
+        """
+        self._pipe.set(key, self._codec.encode(value), ex=expire or None)
+        self._decoders.append(None)
+        self.written_keys.append(key)
+        return self
+
+    def get(self, key: str):
+        """
+        获取缓存, 结果为字典或None
+        :param key: 键
+        """
+        self._pipe.get(key)
+        self._decoders.append(self._codec.decode)
+        return self
+
+    def delete(self, *keys: str):
+        """
+        删除缓存
+        :param keys: 键
+        """
+        self._pipe.delete(*keys)
+        self._decoders.append(None)
+        self.written_keys.extend(keys)
+        return self
+
+    def exists(self, key: str):
+        """
+        检查键是否存在, 结果为布尔值
+        :param key: 键
+        """
+        self._pipe.exists(key)
+        self._decoders.append(bool)
+        return self
+
+    def __getattr__(self, name):
+        # 其他命令直接透传给Redis pipeline, 结果不做解码
+        command = getattr(self._pipe, name)
+
+        def wrapper(*args, **kwargs):
+            command(*args, **kwargs)
+            self._decoders.append(None)
+            return self
+        return wrapper
+
+    async def execute(self) -> list:
+        """
+        执行所有命令
+        :return: 每条命令的结果列表
+        """
+        if not self._decoders:
+            return []
+        raw_results = await self._pipe.execute()
+        self.results = [
+            decoder(result) if decoder else result
+            for decoder, result in zip(self._decoders, raw_results)
+        ]
+        self._decoders = []
+        return self.results
+
+
 class Cache:
     _redis = None
+    _pool = None
     _initialized = False
+    # 缓存值编解码器
+    _codec = ValueCodec(CACHE_SERIALIZER, CACHE_COMPRESS_THRESHOLD, CACHE_COMPRESS_LEVEL)
+    # 已注册的追加消息脚本
+    _append_message_script = None
+    _set_tagged_script = None
+    _invalidate_tags_script = None
+    _release_lock_script = None
+    # 重连锁, 保证并发调用只触发一次重连
+    _reconnect_lock = None
+    # 进程内缓存, 未启用时为None
+    _local = LocalCache(CACHE_LOCAL_MAX_SIZE, CACHE_LOCAL_DEFAULT_TTL) if CACHE_LOCAL_ENABLED else None
+    # 当前进程标识, 用于忽略自己发布的失效消息
+    _instance_id = uuid.uuid4().hex
+    _listener_task = None
+    # Redis层命中统计
+    _redis_hits = 0
+    _redis_misses = 0
+    # 熔断器, 以及熔断期间暂存的失效操作（需要删除的键、需要失效的标签）, 恢复后执行
+    # 写入值的操作不暂存, 只记录其键, 恢复后删除, 由之后的读取重新回填, 不会用旧值覆盖恢复后写入的新值
+    _breaker = CircuitBreaker(CACHE_BREAKER_FAILURE_THRESHOLD, CACHE_BREAKER_WINDOW, CACHE_BREAKER_RECOVERY_TIMEOUT)
+    _deferred_keys = set()
+    _deferred_tags = set()
+    # 暂存数量超出 CACHE_WRITE_BUFFER_SIZE 时不再逐条记录, 恢复后失效全部带标签的缓存和消息队列
+    _deferred_flush = False
+    _deferred_flushes = 0
     
     @classmethod
-    async def init(cls):
-        """初始化Redis连接"""
+    async def init(cls, max_retries: int = REDIS_MAX_RETRIES):
+        """
+        初始化Redis连接
+        :param max_retries: 最多尝试次数, 运行中的惰性重连只尝试一次, 不等待重试间隔
+        """
         if cls._initialized:
             return
+
+        if CACHE_BACKEND == "memory":
+            cls._redis = memory_redis.MemoryRedis(scripts=MEMORY_SCRIPTS)
+            cls._register_scripts()
+            cls._initialized = True
+            logger.info("Using in-process memory cache backend")
+            cls._start_invalidation_listener()
+            return
+        if CACHE_BACKEND != "redis":
+            raise ValueError(f"Unknown cache backend: {CACHE_BACKEND}")
             
         retries = 0
-        while retries < REDIS_MAX_RETRIES:
+        while retries < max_retries:
             try:
-                logger.info(f"Attempting to connect to Redis at {REDIS_HOST}:{REDIS_PORT} (attempt {retries + 1}/{REDIS_MAX_RETRIES})")
+                logger.info(f"Attempting to connect to Redis at {REDIS_HOST}:{REDIS_PORT} (attempt {retries + 1}/{max_retries})")
                 
-                # 使用环境变量配置Redis连接
-                cls._redis = Redis(
+                # 使用环境变量配置Redis连接池
+                # 连接空闲超过 health_check_interval 后, 连接池会在复用前自动检查连接是否存活
+                cls._pool = BlockingConnectionPool(
                     host=REDIS_HOST,
                     port=REDIS_PORT,
                     db=REDIS_DB,
                     password=REDIS_PASSWORD,
-                    encoding='utf-8',
-                    decode_responses=True,
-                    socket_timeout=5,
-                    socket_connect_timeout=5
+                    # 值以字节串存取, 由 ValueCodec 负责编解码
+                    decode_responses=False,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                    max_connections=REDIS_POOL_SIZE,
+                    timeout=REDIS_POOL_TIMEOUT
                 )
+                cls._redis = Redis(connection_pool=cls._pool)
+                cls._register_scripts()
                 
                 # 测试连接
                 await cls._redis.ping()
                 cls._initialized = True
                 logger.info("Redis connection established successfully")
+                cls._start_invalidation_listener()
                 return
                 
             except Exception as e:
                 logger.error(f"Failed to connect to Redis (attempt {retries + 1}): {str(e)}")
                 logger.error(f"Redis configuration: host={REDIS_HOST}, port={REDIS_PORT}, db={REDIS_DB}")
                 
-                if cls._redis:
-                    await cls._redis.close()
-                    cls._redis = None
+                await cls._release_pool()
                 
                 retries += 1
-                if retries < REDIS_MAX_RETRIES:
+                if retries < max_retries:
                     logger.info(f"Retrying in {REDIS_RETRY_DELAY} seconds...")
                     await asyncio.sleep(REDIS_RETRY_DELAY)
                 else:
                     logger.error("Max retries reached, giving up")
                     raise
 
+    @classmethod
+    def _register_scripts(cls):
+        """注册服务端脚本"""
+        cls._append_message_script = cls._redis.register_script(APPEND_MESSAGE_SCRIPT)
+        cls._set_tagged_script = cls._redis.register_script(SET_TAGGED_SCRIPT)
+        cls._invalidate_tags_script = cls._redis.register_script(INVALIDATE_TAGS_SCRIPT)
+        cls._release_lock_script = cls._redis.register_script(RELEASE_LOCK_SCRIPT)
+
     @classmethod
     async def ensure_connection(cls):
-        """确保Redis连接可用"""
-        if not cls._initialized or not cls._redis:
-            await cls.init()
+        """
+        确保Redis连接可用
+        已初始化时直接返回, 不再逐次发送PING; 连接是否存活由连接池的健康检查和调用时的连接错误判断
+        熔断期间直接抛出 CacheUnavailable; 熔断恢复时间到达后, 由一次调用负责探测
+        """
+        if not cls._breaker.allow():
+            raise CacheUnavailable("Cache circuit breaker is open")
+        if cls._breaker.state == HALF_OPEN:
+            await cls._probe()
+        elif not cls._initialized or not cls._redis:
+            async with cls._get_reconnect_lock():
+                # 等待锁期间其他协程可能已经完成重连
+                if not cls._initialized or not cls._redis:
+                    await cls._release_pool()
+                    await cls.init(max_retries=1)
+        cls._start_invalidation_listener()
+
+    @classmethod
+    async def client(cls):
+        """
+        获取底层Redis客户端, 供需要直接执行命令或订阅频道的模块使用（如令牌黑名单）
+        :return: redis.asyncio.Redis 或 MemoryRedis
+        :raises CacheUnavailable: 熔断期间
+        """
+        await cls.ensure_connection()
+        return cls._redis
+
+    @classmethod
+    async def _probe(cls):
+        """
+        熔断后的探测: 重连或PING成功则恢复, 并执行暂存的失效操作; 失败则继续熔断
+        """
+        try:
+            async with cls._get_reconnect_lock():
+                if not cls._initialized or not cls._redis:
+                    await cls._release_pool()
+                    await cls.init(max_retries=1)
+                else:
+                    await asyncio.wait_for(cls._redis.ping(), CACHE_PROBE_TIMEOUT)
+        except asyncio.CancelledError:
+            # 探测被取消时回到熔断状态, 由下一次调用重新探测
+            cls._breaker.record_failure()
+            raise
+        except Exception as e:
+            cls._initialized = False
+            cls._breaker.record_failure()
+            logger.warning(f"Cache probe failed, circuit stays open: {str(e)}")
+            raise CacheUnavailable("Cache circuit breaker is open") from e
+
+        cls._breaker.record_success()
+        logger.info("Cache probe succeeded, circuit closed")
+        # 先执行暂存的失效操作再返回, 恢复后的读取不会读到熔断期间被修改的旧值
+        if cls._deferred_keys or cls._deferred_tags or cls._deferred_flush:
+            await cls._replay_deferred_invalidations()
+
+    @classmethod
+    def _defer_invalidation(cls, keys: Iterable[str] = (), tags: Iterable[str] = ()):
+        """
+        熔断期间暂存失效操作, 恢复后执行; 超出容量时改为恢复后全量失效, 不会丢弃
+        :param keys: 需要删除的键
+        :param tags: 需要失效的标签
+        """
+        keys = list(keys)
+        if cls._local is not None:
+            for key in keys:
+                cls._local.delete(key)
+        if cls._deferred_flush:
+            return
+        cls._deferred_keys.update(keys)
+        cls._deferred_tags.update(tags)
+        if len(cls._deferred_keys) + len(cls._deferred_tags) > CACHE_WRITE_BUFFER_SIZE:
+            cls._deferred_keys.clear()
+            cls._deferred_tags.clear()
+            cls._deferred_flush = True
+            cls._deferred_flushes += 1
+            logger.warning("Too many cache invalidations deferred, all tagged entries will be flushed after recovery")
+
+    @classmethod
+    async def _scan(cls, pattern: str) -> list:
+        """
+        按模式列出键
+        :param pattern: 键的模式（glob）
+        :return: 键列表
+        """
+        return [key.decode() if isinstance(key, bytes) else key async for key in cls._redis.scan_iter(match=pattern, count=1000)]
+
+    @classmethod
+    async def _replay_deferred_invalidations(cls):
+        """执行熔断期间暂存的失效操作, 全量失效时删除全部带标签的缓存和消息队列"""
+        keys, tags, flush = list(cls._deferred_keys), list(cls._deferred_tags), cls._deferred_flush
+        cls._deferred_keys.clear()
+        cls._deferred_tags.clear()
+        cls._deferred_flush = False
         try:
-            await cls._redis.ping()
+            if flush:
+                tags = [key[len("tag:"):] for key in await cls._scan("tag:*")]
+                keys = await cls._scan("chat:session:*")
+            logger.info(f"Applying deferred cache invalidations: {len(keys)} keys, {len(tags)} tags")
+            if keys:
+                await cls.delete_many(keys)
+            for start in range(0, len(tags), 500):
+                await cls.invalidate_tags(*tags[start:start + 500])
         except Exception as e:
-            logger.error(f"Redis connection lost: {str(e)}")
+            logger.error(f"Failed to apply deferred cache invalidations: {str(e)}")
+            # 下一次恢复时全量失效
+            cls._deferred_flush = True
+
+    @classmethod
+    def _get_reconnect_lock(cls) -> asyncio.Lock:
+        """获取当前事件循环的重连锁"""
+        loop = asyncio.get_running_loop()
+        if cls._reconnect_lock is None or cls._reconnect_lock[0] is not loop:
+            cls._reconnect_lock = (loop, asyncio.Lock())
+        return cls._reconnect_lock[1]
+
+    @classmethod
+    def _handle_error(cls, e: Exception) -> bool:
+        """
+        处理Redis调用异常
+        连接类错误时标记为未连接, 下一次调用时惰性重连, 并计入熔断器的失败次数
+        :param e: 异常
+        :return: 是否需要记录错误日志, 熔断期间的快速失败不记录
+        """
+        mark_error()
+        if isinstance(e, CacheUnavailable):
+            return False
+        if isinstance(e, (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)):
+            if cls._initialized:
+                logger.error(f"Redis connection lost: {str(e)}")
             cls._initialized = False
-            await cls.init()
+            cls._breaker.record_failure()
+        return True
 
     @classmethod
+    async def _release_pool(cls):
+        """关闭客户端并断开连接池中的所有连接"""
+        redis, pool = cls._redis, cls._pool
+        cls._redis = None
+        cls._pool = None
+        try:
+            if redis is not None:
+                await redis.close()
+            if pool is not None:
+                await pool.disconnect()
+        except Exception as e:
+            logger.error(f"Error releasing Redis connection pool: {str(e)}")
+
+    @classmethod
+    @instrumented("set")
     async def set(cls, key: str, value: dict, expire: int = None):
         """
         设置缓存
@@ -94,25 +513,28 @@ class Cache:
         try:
             await cls.ensure_connection()
             
-            # 将字典转换为JSON字符串
-            value_str = json.dumps(value)
-            logger.debug(f"Setting cache for key: {key}, value: {value_str}")
+            # 编码为带格式头的字节串
+            encoded_value = cls._codec.encode(value)
+            logger.debug(f"Setting cache for key: {key}, size: {len(encoded_value)} bytes")
             
-            # 设置值
-            await cls._redis.set(key, value_str)
+            # 设置值, 同时设置过期时间（SET ... EX, 一次往返且原子）
+            await cls._redis.set(key, encoded_value, ex=expire or None)
             
-            # 如果设置了过期时间
-            if expire:
-                await cls._redis.expire(key, expire)
-                logger.debug(f"Set expiration for key {key}: {expire} seconds")
+            # 更新本进程的一级缓存, 并通知其他进程失效
+            if cls._local is not None:
+                cls._local.set(key, encoded_value, expire)
+                await cls._publish_invalidation([key])
             
-            logger.info(f"Successfully set cache for key: {key}")
+            logger.debug(f"Successfully set cache for key: {key}")
+        except CacheUnavailable:
+            cls._defer_invalidation(keys=[key])
         except Exception as e:
-            logger.error(f"Failed to set cache for key {key}: {str(e)}")
-            logger.error(f"Value type: {type(value)}, Value: {value}")
+            if cls._handle_error(e):
+                logger.error(f"Failed to set cache for key {key} (value type: {type(value).__name__}): {str(e)}")
             raise
 
     @classmethod
+    @instrumented("get", lookup=single_lookup)
     async def get(cls, key: str) -> dict:
         """
         获取缓存
@@ -120,35 +542,46 @@ class Cache:
         :return: 值（字典类型）
         """
         try:
+            # 优先读取进程内缓存
+            if cls._local is not None:
+                value = cls._local.get(key)
+                if value is not MISSING:
+                    return cls._codec.decode(value)
+
             await cls.ensure_connection()
             
-            logger.debug(f"Getting cache for key: {key}")
-            value = await cls._redis.get(key)
+            if cls._local is not None:
+                # 同时取回剩余过期时间, 使一级缓存的TTL与Redis保持一致
+                value, ttl = await cls._get_with_ttl(key)
+            else:
+                value = await cls._redis.get(key)
             
             if value:
-                result = json.loads(value)
-                logger.debug(f"Cache hit for key {key}: {result}")
-                return result
+                cls._redis_hits += 1
+                if cls._local is not None:
+                    cls._local.set(key, value, ttl)
+                return cls._codec.decode(value)
             
-            logger.debug(f"Cache miss for key {key}")
+            cls._redis_misses += 1
             return None
         except Exception as e:
-            logger.error(f"Failed to get cache for key {key}: {str(e)}")
+            if cls._handle_error(e):
+                logger.error(f"Failed to get cache for key {key}: {str(e)}")
             return None
 
     @classmethod
     async def close(cls):
         """关闭Redis连接"""
+        if cls._listener_task:
+            cls._listener_task.cancel()
+            cls._listener_task = None
         if cls._redis:
-            try:
-                await cls._redis.close()
-                cls._redis = None
-                cls._initialized = False
-                logger.info("Redis connection closed successfully")
-            except Exception as e:
-                logger.error(f"Error closing Redis connection: {str(e)}")
+            cls._initialized = False
+            await cls._release_pool()
+            logger.info("Redis connection closed successfully")
 
     @classmethod
+    @instrumented("exists", lookup=lambda exists: (1, 0) if exists else (0, 1))
     async def exists(cls, key: str) -> bool:
         """
         检查键是否存在
@@ -156,15 +589,20 @@ class Cache:
         :return: 是否存在
         """
         try:
+            if cls._local is not None and cls._local.get(key) is not MISSING:
+                return True
+
             await cls.ensure_connection()
             exists = await cls._redis.exists(key)
             logger.debug(f"Checking existence of key {key}: {exists}")
             return bool(exists)
         except Exception as e:
-            logger.error(f"Failed to check existence for key {key}: {str(e)}")
+            if cls._handle_error(e):
+                logger.error(f"Failed to check existence for key {key}: {str(e)}")
             return False 
 
     @classmethod
+    @instrumented("delete")
     async def delete(cls, key: str) -> bool:
         """
         删除缓存
@@ -172,54 +610,503 @@ class Cache:
         :return: 是否删除成功
         """
         try:
-            if not cls._redis:
-                logger.error("Redis connection not initialized")
-                return False
-            
             await cls.ensure_connection()
             await cls._redis.delete(key)
+            if cls._local is not None:
+                cls._local.delete(key)
+                await cls._publish_invalidation([key])
             logger.debug(f"Cache deleted: {key}")
             return True
+        except CacheUnavailable:
+            cls._defer_invalidation(keys=[key])
+            return True
         except Exception as e:
-            logger.error(f"Error deleting cache: {str(e)}")
+            if cls._handle_error(e):
+                logger.error(f"Error deleting cache: {str(e)}")
             return False 
         
     
     @classmethod
-    async def set_message(cls, session_id: str, message: dict, expire: int = None):
+    @instrumented("set_message", prefix="chat:session:*")
+    async def set_message(
+        cls,
+        session_id: str,
+        message: dict,
+        expire: int = None,
+        max_messages: int = None,
+        max_bytes: int = None
+    ) -> int:
         """
         将消息存储到 Redis 队列
+        追加和裁剪由服务端脚本一次完成, 并发写入时同样是原子的
         :param session_id: 会话 ID
         :param message: 消息内容（字典格式）
         :param expire: 过期时间（秒）
+        :param max_messages: 最多保留的消息条数, 默认取 CHAT_HISTORY_MAX_MESSAGES
+        :param max_bytes: 最多保留的消息总字节数, 默认取 CHAT_HISTORY_MAX_BYTES
+        :return: 裁剪后的队列长度
         """
         key = f"chat:session:{session_id}"
-        # 将消息以 JSON 格式存储
-        message_json = json.dumps(message)
+        # 编码为带格式头的字节串
+        encoded_message = cls._codec.encode(message)
+        if max_messages is None:
+            max_messages = CHAT_HISTORY_MAX_MESSAGES
+        if max_bytes is None:
+            max_bytes = CHAT_HISTORY_MAX_BYTES
         try:
             await cls.ensure_connection()
-            await cls._redis.rpush(key, message_json)
-            # 限制队列长度为 50
-            await cls._redis.ltrim(key, -50, -1)
-            if expire:
-                await cls._redis.expire(key, expire)
+            length = await cls._append_message_script(
+                keys=[key],
+                args=[encoded_message, max_messages, max_bytes, expire or 0]
+            )
+            if cls._local is not None:
+                cls._local.delete(key)
+                await cls._publish_invalidation([key])
+            return length
+        except CacheUnavailable:
+            cls._defer_invalidation(keys=[f"chat:session:{session_id}"])
+            return 0
         except Exception as e:
-            logger.error(f"Failed to store message for session {session_id}: {str(e)}")
+            if cls._handle_error(e):
+                logger.error(f"Failed to store message for session {session_id}: {str(e)}")
             raise
 
     @classmethod
-    async def get_messages(cls, session_id: str) -> list:
+    @instrumented("get_messages", prefix="chat:session:*", lookup=list_lookup)
+    async def get_messages(cls, session_id: str, last_n: int = None) -> list:
         """
         从 Redis 队列中获取消息
         :param session_id: 会话 ID
+        :param last_n: 只返回最近的 N 条消息, 默认返回全部
         :return: 消息列表（字典格式）
         """
         key = f"chat:session:{session_id}"
         try:
-            await cls.ensure_connection()
-            messages_json = await cls._redis.lrange(key, 0, -1)
+            if cls._local is not None:
+                messages_json = cls._local.get(key)
+                if messages_json is MISSING:
+                    await cls.ensure_connection()
+                    async with cls._redis.pipeline(transaction=False) as pipe:
+                        pipe.lrange(key, 0, -1)
+                        pipe.pttl(key)
+                        messages_json, pttl = await pipe.execute()
+                    if messages_json:
+                        cls._local.set(key, messages_json, cls._local_ttl(pttl))
+                if last_n:
+                    messages_json = messages_json[-last_n:]
+            else:
+                await cls.ensure_connection()
+                start = -last_n if last_n else 0
+                messages_json = await cls._redis.lrange(key, start, -1)
             # 将 JSON 字符串转换为字典列表
-            return [json.loads(msg) for msg in messages_json]
+            return [cls._codec.decode(msg) for msg in messages_json]
+        except CacheUnavailable:
+            # 熔断期间按未命中处理
+            return []
         except Exception as e:
-            logger.error(f"Failed to retrieve messages for session {session_id}: {str(e)}")
-            raise
\ No newline at end of file
+            if cls._handle_error(e):
+                logger.error(f"Failed to retrieve messages for session {session_id}: {str(e)}")
+            raise
+
+    # ------------------ 批量操作 ------------------
+
+    @classmethod
+    @instrumented("get_many", multi=True, lookup=many_lookup)
+    async def get_many(cls, keys: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """
+        批量获取缓存（一次往返）
+        :param keys: 键列表
+        :return: {键: 值（字典类型）或None}
+        """
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        try:
+            pending = []
+            for key in keys:
+                if cls._local is not None:
+                    value = cls._local.get(key)
+                    if value is not MISSING:
+                        result[key] = cls._codec.decode(value)
+                        continue
+                pending.append(key)
+
+            if not pending:
+                return result
+
+            await cls.ensure_connection()
+            if cls._local is not None:
+                async with cls._redis.pipeline(transaction=False) as pipe:
+                    pipe.mget(pending)
+                    for key in pending:
+                        pipe.pttl(key)
+                    values, *pttls = await pipe.execute()
+            else:
+                values = await cls._redis.mget(pending)
+                pttls = [None] * len(pending)
+
+            for key, value, pttl in zip(pending, values, pttls):
+                if value:
+                    cls._redis_hits += 1
+                    if cls._local is not None:
+                        cls._local.set(key, value, cls._local_ttl(pttl))
+                    result[key] = cls._codec.decode(value)
+                else:
+                    cls._redis_misses += 1
+                    result[key] = None
+            return result
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to get cache for keys {keys}: {str(e)}")
+            return {key: result.get(key) for key in keys}
+
+    @classmethod
+    @instrumented("set_many", multi=True)
+    async def set_many(cls, mapping: Dict[str, dict], expire: int = None):
+        """
+        批量设置缓存（一次往返）
+        :param mapping: {键: 值（字典类型）}
+        :param expire: 过期时间（秒）
+        """
+        if not mapping:
+            return
+        try:
+            await cls.ensure_connection()
+            encoded = {key: cls._codec.encode(value) for key, value in mapping.items()}
+            async with cls._redis.pipeline(transaction=False) as pipe:
+                for key, encoded_value in encoded.items():
+                    pipe.set(key, encoded_value, ex=expire or None)
+                await pipe.execute()
+
+            if cls._local is not None:
+                for key, encoded_value in encoded.items():
+                    cls._local.set(key, encoded_value, expire)
+                await cls._publish_invalidation(list(encoded))
+            logger.debug(f"Successfully set cache for {len(encoded)} keys")
+        except CacheUnavailable:
+            cls._defer_invalidation(keys=mapping)
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to set cache for keys {list(mapping)}: {str(e)}")
+            raise
+
+    @classmethod
+    @instrumented("delete_many", multi=True)
+    async def delete_many(cls, keys: Iterable[str]) -> int:
+        """
+        批量删除缓存（一次往返）
+        :param keys: 键列表
+        :return: 实际删除的键数量
+        """
+        keys = list(keys)
+        if not keys:
+            return 0
+        try:
+            await cls.ensure_connection()
+            deleted = await cls._redis.delete(*keys)
+            if cls._local is not None:
+                for key in keys:
+                    cls._local.delete(key)
+                await cls._publish_invalidation(keys)
+            logger.debug(f"Cache deleted: {keys}")
+            return deleted
+        except CacheUnavailable:
+            cls._defer_invalidation(keys=keys)
+            return 0
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Error deleting cache for keys {keys}: {str(e)}")
+            return 0
+
+    @classmethod
+    @asynccontextmanager
+    async def pipeline(cls, transaction: bool = False):
+        """
+        批量命令上下文, 退出时所有命令在一次往返中执行
+        用法:
+            async with Cache.pipeline() as pipe:
+                pipe.get("a").set("b", {"x": 1}, expire=60)
+            results = pipe.results
+        :param transaction: 是否使用 MULTI/EXEC 包裹为事务
+        """
+        await cls.ensure_connection()
+        try:
+            async with cls._redis.pipeline(transaction=transaction) as pipe:
+                wrapper = CachePipeline(pipe, cls._codec)
+                yield wrapper
+                await wrapper.execute()
+        except Exception as e:
+            cls._handle_error(e)
+            raise
+
+        if cls._local is not None and wrapper.written_keys:
+            for key in wrapper.written_keys:
+                cls._local.delete(key)
+            await cls._publish_invalidation(wrapper.written_keys)
+
+    # ------------------ 标签 ------------------
+
+    @staticmethod
+    def _tag_keys(tags: list) -> list:
+        """标签集合键 + 标签失效序号键"""
+        return [f"tag:{tag}" for tag in tags] + [f"tagseq:{tag}" for tag in tags]
+
+    @classmethod
+    @instrumented("get_tagged", lookup=tagged_lookup)
+    async def get_tagged(cls, key: str):
+        """
+        获取带标签的缓存, 未命中时同时返回当前的全局失效序号, 供回填时使用
+        :param key: 键
+        :return: (值或None, 全局失效序号)
+        """
+        try:
+            if cls._local is not None:
+                value = cls._local.get(key)
+                if value is not MISSING:
+                    return cls._codec.decode(value), None
+
+            await cls.ensure_connection()
+            async with cls._redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.get(CACHE_INVALIDATION_SEQ_KEY)
+                pipe.pttl(key)
+                value, seq, pttl = await pipe.execute()
+
+            if value:
+                cls._redis_hits += 1
+                if cls._local is not None:
+                    cls._local.set(key, value, cls._local_ttl(pttl))
+                return cls._codec.decode(value), None
+
+            cls._redis_misses += 1
+            return None, int(seq or 0)
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to get tagged cache for key {key}: {str(e)}")
+            return None, None
+
+    @classmethod
+    @instrumented("set_tagged")
+    async def set_tagged(cls, key: str, value, expire: int, tags: list, seq: int, replace: bool = False) -> bool:
+        """
+        写入带标签的缓存
+        读取数据之后若有任一标签被失效, 放弃写入
+        :param key: 键
+        :param value: 值
+        :param expire: 过期时间（秒）
+        :param tags: 标签列表
+        :param seq: get_tagged 或 get_invalidation_seq 返回的全局失效序号
+        :param replace: 是否为替换已有的值（后台刷新）, 是则通知其他进程删除一级缓存中的旧值
+        :return: 是否写入
+        """
+        if seq is None:
+            return False
+        try:
+            await cls.ensure_connection()
+            encoded_value = cls._codec.encode(value)
+            written = await cls._set_tagged_script(
+                keys=[key] + cls._tag_keys(tags),
+                args=[encoded_value, min(expire, CACHE_TAG_TTL), seq, CACHE_TAG_TTL]
+            )
+            if written and cls._local is not None:
+                cls._local.set(key, encoded_value, expire)
+                if replace:
+                    await cls._publish_invalidation([key])
+            return bool(written)
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to set tagged cache for key {key}: {str(e)}")
+            return False
+
+    @classmethod
+    @instrumented("get_invalidation_seq", prefix="cache:*")
+    async def get_invalidation_seq(cls):
+        """
+        获取当前的全局失效序号
+        :return: 序号, 获取失败时返回None
+        """
+        try:
+            await cls.ensure_connection()
+            return int(await cls._redis.get(CACHE_INVALIDATION_SEQ_KEY) or 0)
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to get cache invalidation sequence: {str(e)}")
+            return None
+
+    @classmethod
+    @instrumented("try_lock", prefix="lock:*")
+    async def try_lock(cls, key: str, expire: int) -> bool:
+        """
+        尝试获取一个到期自动释放的锁（SET NX EX）, 用于多进程间互斥
+        :param key: 锁的键
+        :param expire: 过期时间（秒）
+        :return: 是否获取成功
+        """
+        try:
+            await cls.ensure_connection()
+            return bool(await cls._redis.set(f"lock:{key}", cls._instance_id, ex=expire, nx=True))
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to acquire lock {key}: {str(e)}")
+            return False
+
+    @classmethod
+    @instrumented("release_lock", prefix="lock:*")
+    async def release_lock(cls, key: str) -> bool:
+        """
+        释放 try_lock 获取的锁, 只删除当前进程持有的锁
+        :param key: 锁的键
+        :return: 是否释放
+        """
+        try:
+            await cls.ensure_connection()
+            return bool(await cls._release_lock_script(keys=[f"lock:{key}"], args=[cls._instance_id]))
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to release lock {key}: {str(e)}")
+            return False
+
+    @classmethod
+    @instrumented("invalidate_tags", prefix="tag:*")
+    async def invalidate_tags(cls, *tags: str) -> int:
+        """
+        删除带有任一标签的缓存, 应在数据库事务提交之后调用
+        :param tags: 标签
+        :return: 删除的缓存键数量
+        """
+        if not tags:
+            return 0
+        try:
+            await cls.ensure_connection()
+            deleted = await cls._invalidate_tags_script(
+                keys=[CACHE_INVALIDATION_SEQ_KEY] + cls._tag_keys(list(tags)),
+                args=[CACHE_TAG_TOMBSTONE_TTL]
+            )
+            deleted = [key.decode() if isinstance(key, bytes) else key for key in deleted]
+            if cls._local is not None and deleted:
+                for key in deleted:
+                    cls._local.delete(key)
+                await cls._publish_invalidation(deleted)
+            logger.debug(f"Invalidated tags {tags}: {len(deleted)} keys")
+            return len(deleted)
+        except CacheUnavailable:
+            # 无法得知受影响的键, 清空一级缓存, 恢复后再删除Redis中的缓存
+            if cls._local is not None:
+                cls._local.clear()
+            cls._defer_invalidation(tags=tags)
+            return 0
+        except Exception as e:
+            if cls._handle_error(e):
+                logger.error(f"Failed to invalidate cache tags {tags}: {str(e)}")
+            return 0
+
+    # ------------------ 进程内缓存(一级缓存) ------------------
+
+    @staticmethod
+    def _local_ttl(pttl: int):
+        """
+        根据Redis的剩余过期时间计算一级缓存的过期时间
+        :param pttl: Redis PTTL 返回值（毫秒）, -1 表示未设置过期时间
+        :return: 过期时间（秒）, None 表示使用默认过期时间
+        """
+        if pttl is None or pttl < 0:
+            return None
+        return pttl / 1000
+
+    @classmethod
+    async def _get_with_ttl(cls, key: str):
+        """
+        在一次往返中获取值和剩余过期时间
+        :param key: 键
+        :return: (值, 过期时间（秒）)
+        """
+        async with cls._redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
+        return value, cls._local_ttl(pttl)
+
+    @classmethod
+    async def _publish_invalidation(cls, keys: list):
+        """
+        通过 Redis pub/sub 通知其他进程删除一级缓存中的键
+        :param keys: 键列表
+        """
+        try:
+            message = json.dumps({"origin": cls._instance_id, "keys": keys})
+            await cls._redis.publish(CACHE_INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            logger.error(f"Failed to publish cache invalidation for keys {keys}: {str(e)}")
+
+    @classmethod
+    def _start_invalidation_listener(cls):
+        """启动失效消息监听任务（仅在启用一级缓存时）"""
+        if cls._local is None:
+            return
+        loop = asyncio.get_running_loop()
+        task = cls._listener_task
+        # 任务仍在当前事件循环中运行时无需重复启动
+        if task and not task.done() and task.get_loop() is loop:
+            return
+        cls._listener_task = loop.create_task(cls._listen_invalidations())
+
+    @classmethod
+    async def _listen_invalidations(cls):
+        """监听其他进程发布的失效消息, 删除本进程一级缓存中的对应键"""
+        while True:
+            pubsub = None
+            try:
+                await cls.ensure_connection()
+                pubsub = cls._redis.pubsub()
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # 订阅期间可能错过了失效消息, 清空一级缓存以免读到旧值
+                cls._local.clear()
+                logger.info(f"Subscribed to cache invalidation channel: {CACHE_INVALIDATION_CHANNEL}")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") == cls._instance_id:
+                        continue
+                    for key in data.get("keys", []):
+                        cls._local.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if cls._handle_error(e):
+                    logger.error(f"Cache invalidation listener error: {str(e)}")
+                await asyncio.sleep(REDIS_RETRY_DELAY)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    @classmethod
+    def metrics_snapshot(cls) -> dict:
+        """
+        获取缓存指标快照: 各操作、各键前缀的调用次数、命中率和延迟分布, 以及各层缓存和熔断器的状态
+        :return: 指标字典
+        """
+        return {**metrics.snapshot(), "tiers": cls.stats()}
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        获取各层缓存的命中统计
+        :return: 统计信息字典
+        """
+        redis_total = cls._redis_hits + cls._redis_misses
+        return {
+            "local": cls._local.stats() if cls._local is not None else None,
+            "redis": {
+                "hits": cls._redis_hits,
+                "misses": cls._redis_misses,
+                "hit_rate": round(cls._redis_hits / redis_total, 4) if redis_total else 0.0,
+            },
+            "breaker": cls._breaker.stats(),
+            "deferred_keys": len(cls._deferred_keys),
+            "deferred_tags": len(cls._deferred_tags),
+            "deferred_flush": cls._deferred_flush,
+            "deferred_flushes": cls._deferred_flushes,
+        }
@@ -0,0 +1,271 @@
+import os
+import math
+import time
+import random
+import asyncio
+import inspect
+import weakref
+from datetime import datetime
+from functools import wraps, lru_cache
+from typing import Any, Callable, Iterable, Optional, Union
+from sqlalchemy import DateTime, inspect as sa_inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+from core.cache import Cache
+from core.database import AsyncReadSessionLocal
+from core.logger import setup_logger
+
+"""
+CRUD读操作的旁路缓存(cache-aside)
+    @cached(key="user:id:{user_id}", model=User, tags=["user:{user_id}"])
+    async def get_user(db, user_id): ...
+
+- 同一进程内对同一个键的并发未命中只会执行一次数据库查询(single-flight); 只合并到在最近一次失效之后发起的查询,
+  写操作提交并失效之后到达的请求不会拿到写入前的查询结果
+- 查询结果为None时同样缓存(负缓存), 使用较短的过期时间
+- 写操作提交后调用 invalidate(...) 按标签删除相关缓存; 回填前会检查标签是否在查询之后被失效, 不会把旧数据写回缓存
+- 设置 soft_ttl 后, 超过软过期时间的值仍直接返回, 同时由一个后台任务刷新(stale-while-revalidate);
+  临近软过期时按概率提前刷新(early refresh), 使同一时刻写入的大量键不会同时过期
+缓存中保存的是模型的列值, 命中时还原为游离(detached)状态的ORM实例, 调用方无需区分是否来自缓存;
+exclude 中的列（如密码哈希）不写入缓存, 命中时为None, 需要这些列的调用方应直接查询数据库
+"""
+
+# 设置日志记录器
+logger = setup_logger('cache_aside')
+
+CACHE_ASIDE_ENABLED = os.getenv('CACHE_ASIDE_ENABLED', 'true').lower() == 'true'
+CACHE_ASIDE_TTL = int(os.getenv('CACHE_ASIDE_TTL', 300))  # 秒
+CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 30))  # 秒
+# 提前刷新的系数, 越大越早刷新, 0 表示只在软过期后刷新
+CACHE_EARLY_REFRESH_BETA = float(os.getenv('CACHE_EARLY_REFRESH_BETA', 1.0))
+
+# 每个事件循环各自的进行中查询 {键: (Future, 发起查询时的失效版本)}
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+# 本进程调用 invalidate 的次数, 与Redis的全局失效序号一起作为失效版本, Redis不可用时同样能区分写入前后发起的查询
+_local_invalidations = 0
+# 后台刷新任务, 保留引用避免被回收 {键: Task}
+_refreshing: dict = {}
+
+
+@lru_cache(maxsize=None)
+def _columns(model) -> tuple:
+    """模型的列属性名, 以及其中的日期时间列"""
+    attrs = sa_inspect(model).column_attrs
+    keys = tuple(attr.key for attr in attrs)
+    datetime_keys = frozenset(attr.key for attr in attrs if isinstance(attr.columns[0].type, DateTime))
+    return keys, datetime_keys
+
+
+def _dump_row(model, obj, exclude: frozenset = frozenset()) -> dict:
+    if model is None:
+        return {key: value for key, value in obj.items() if key not in exclude}
+    keys, _ = _columns(model)
+    return {key: getattr(obj, key) for key in keys if key not in exclude}
+
+
+def _load_row(model, row: dict, exclude: frozenset = frozenset()):
+    """将列值还原为游离状态的ORM实例（列值均视为已加载, 不会被当作待更新的修改）, 未缓存的列为None"""
+    if model is None:
+        return row
+    _, datetime_keys = _columns(model)
+    obj = sa_inspect(model).class_manager.new_instance()
+    for key, value in row.items():
+        if key in datetime_keys and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        set_committed_value(obj, key, value)
+    for key in exclude:
+        set_committed_value(obj, key, None)
+    make_transient_to_detached(obj)
+    return obj
+
+
+def _dump(model, result, exclude: frozenset = frozenset()) -> dict:
+    if result is None:
+        return {"v": None}
+    if isinstance(result, (list, tuple)):
+        return {"l": [_dump_row(model, obj, exclude) for obj in result]}
+    return {"v": _dump_row(model, result, exclude)}
+
+
+def _load(model, entry: dict, exclude: frozenset = frozenset()):
+    if "l" in entry:
+        return [_load_row(model, row, exclude) for row in entry["l"]]
+    if entry.get("v") is None:
+        return None
+    return _load_row(model, entry["v"], exclude)
+
+
+def _key_part(value) -> str:
+    """字典、列表参数转换为稳定的字符串, 保证相同条件得到相同的键"""
+    if isinstance(value, dict):
+        return "&".join(f"{k}={_key_part(v)}" for k, v in sorted(value.items(), key=lambda item: str(item[0])))
+    if isinstance(value, (list, tuple)):
+        return ",".join(_key_part(v) for v in value)
+    return str(value)
+
+
+def _render(template: Union[str, Callable], arguments: dict, result: Any = None):
+    if callable(template):
+        return template(arguments, result)
+    return template.format(**{name: _key_part(value) for name, value in arguments.items()})
+
+
+def _render_tags(tags, arguments: dict, result) -> list:
+    if tags is None:
+        return []
+    if callable(tags):
+        return list(tags(arguments, result))
+    return [_render(tag, arguments) for tag in tags]
+
+
+def _should_refresh(entry: dict, beta: float) -> bool:
+    """
+    判断是否需要后台刷新
+    超过软过期时间时一定刷新; 之前按概率提前刷新, 查询耗时越长、越接近软过期, 概率越大
+    """
+    soft_expire_at = entry.get("s")
+    if soft_expire_at is None:
+        return False
+    now = time.time()
+    if now >= soft_expire_at:
+        return True
+    if beta <= 0:
+        return False
+    delta = entry.get("d", 0)
+    return now - delta * beta * math.log(1.0 - random.random()) >= soft_expire_at
+
+
+def cached(
+    key: Union[str, Callable],
+    model,
+    ttl: int = CACHE_ASIDE_TTL,
+    tags: Optional[Union[Iterable[str], Callable]] = None,
+    negative_ttl: int = CACHE_NEGATIVE_TTL,
+    soft_ttl: Optional[int] = None,
+    early_refresh_beta: float = CACHE_EARLY_REFRESH_BETA,
+    exclude: Iterable[str] = ()
+) -> Callable:
+    """
+    CRUD读操作缓存装饰器
+    :param key: 缓存键模板（按参数名格式化, 如 "user:id:{user_id}"）, 或 (参数字典, None) -> 键 的函数
+    :param model: 返回值的ORM模型, 返回值可以是模型实例、实例列表或None; 为None时返回值为可序列化的字典或字典列表
+    :param ttl: 过期时间（秒）, 设置了 soft_ttl 时为旧值最多可被返回的时间
+    :param tags: 标签模板列表, 或 (参数字典, 查询结果) -> 标签列表 的函数
+    :param negative_ttl: 查询结果为None时的过期时间（秒）, 0 表示不缓存
+    :param soft_ttl: 软过期时间（秒）, 超过后返回旧值并在后台刷新; 被装饰函数需要有名为 db 的会话参数
+    :param early_refresh_beta: 提前刷新的系数, 0 表示只在软过期后刷新
+    :param exclude: 不写入缓存的列名（如密码哈希）, 从缓存还原的实例中为None
+    """
+    exclude = frozenset(exclude)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        def make_entry(result, delta: float) -> dict:
+            entry = _dump(model, result, exclude)
+            if soft_ttl:
+                entry["s"] = time.time() + soft_ttl
+                entry["d"] = delta
+            return entry
+
+        async def refresh(cache_key: str, arguments: dict):
+            """使用独立的数据库会话重新查询并替换缓存"""
+            lock = f"refresh:{cache_key}"
+            locked = False
+            try:
+                # 多个进程同时判断需要刷新时, 只由一个进程执行; 锁的过期时间只用于持有者异常退出的情况
+                locked = await Cache.try_lock(lock, max(1, soft_ttl))
+                if not locked:
+                    return
+                seq = await Cache.get_invalidation_seq()
+                async with AsyncReadSessionLocal() as db:
+                    started = time.perf_counter()
+                    result = await func(**{**arguments, "db": db})
+                    entry = make_entry(result, time.perf_counter() - started)
+                expire = ttl if result is not None else negative_ttl
+                if expire:
+                    await Cache.set_tagged(
+                        cache_key, entry, expire, _render_tags(tags, arguments, result), seq, replace=True
+                    )
+            except Exception as e:
+                logger.error(f"Failed to refresh cache for key {cache_key}: {str(e)}")
+            finally:
+                _refreshing.pop(cache_key, None)
+                if locked:
+                    await Cache.release_lock(lock)
+
+        def schedule_refresh(cache_key: str, arguments: dict):
+            if cache_key in _refreshing:
+                return
+            arguments = {name: value for name, value in arguments.items() if name != "db"}
+            _refreshing[cache_key] = asyncio.get_running_loop().create_task(refresh(cache_key, arguments))
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not CACHE_ASIDE_ENABLED:
+                return await func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            cache_key = _render(key, arguments)
+
+            local_version = _local_invalidations
+            entry, seq = await Cache.get_tagged(cache_key)
+            if entry is not None:
+                if soft_ttl and _should_refresh(entry, early_refresh_beta):
+                    schedule_refresh(cache_key, arguments)
+                return _load(model, entry, exclude)
+
+            # 同一个键已有查询在进行中, 且发起之后没有发生失效时等待其结果; 否则自行查询
+            version = (seq, local_version)
+            loop = asyncio.get_running_loop()
+            inflight = _inflight.setdefault(loop, {})
+            future, future_version = inflight.get(cache_key, (None, None))
+            if future is not None and future_version == version:
+                try:
+                    return _load(model, await asyncio.shield(future), exclude)
+                except asyncio.CancelledError:
+                    # 发起查询的协程被取消时自行查询; 自身被取消时继续抛出
+                    if not future.cancelled():
+                        raise
+                    return await func(*args, **kwargs)
+
+            future = loop.create_future()
+            inflight[cache_key] = (future, version)
+            try:
+                started = time.perf_counter()
+                result = await func(*args, **kwargs)
+                entry = make_entry(result, time.perf_counter() - started)
+                future.set_result(entry)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # 没有等待者时避免"异常未被获取"的警告
+                future.exception()
+                raise
+            finally:
+                # 之后发起的查询可能已替换了进行中的记录
+                if inflight.get(cache_key, (None,))[0] is future:
+                    del inflight[cache_key]
+
+            expire = ttl if result is not None else negative_ttl
+            if expire:
+                await Cache.set_tagged(cache_key, entry, expire, _render_tags(tags, arguments, result), seq)
+            return result
+
+        return wrapper
+    return decorator
+
+
+async def invalidate(*tags: str) -> None:
+    """
+    按标签删除缓存, 在写操作提交之后调用
+    :param tags: 标签
+    """
+    global _local_invalidations
+    if CACHE_ASIDE_ENABLED and tags:
+        _local_invalidations += 1
+        await Cache.invalidate_tags(*tags)
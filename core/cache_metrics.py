@@ -0,0 +1,239 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+"""
+缓存操作指标
+按 (操作, 键前缀) 统计调用次数、错误次数、命中/未命中次数和延迟直方图, 只保存在进程内存中
+键前缀取键的前几段并去掉最后一段(通常是ID), 如 registration:foo@bar.com -> registration:*,
+chat:session:abc -> chat:session:*
+"""
+
+CACHE_METRICS_ENABLED = os.getenv('CACHE_METRICS_ENABLED', 'true').lower() == 'true'
+CACHE_METRICS_PREFIX_DEPTH = int(os.getenv('CACHE_METRICS_PREFIX_DEPTH', 2))  # 键前缀最多保留的段数
+CACHE_METRICS_MAX_PREFIXES = int(os.getenv('CACHE_METRICS_MAX_PREFIXES', 200))  # 超出后归入 other
+
+# 延迟直方图的桶上界（毫秒）
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_BUCKET_BOUNDS = tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS)
+
+OTHER_PREFIX = "other"
+
+# 当前操作是否出错, 由 Cache._handle_error 标记（操作内部捕获的异常不会传到装饰器）
+_current_op: ContextVar[Optional[list]] = ContextVar('cache_current_op', default=None)
+
+
+def key_prefix(key: str) -> str:
+    """
+    计算键前缀
+    :param key: 缓存键
+    :return: 前缀, 如 chat:session:*
+    """
+    parts = key.split(":", CACHE_METRICS_PREFIX_DEPTH)
+    depth = min(CACHE_METRICS_PREFIX_DEPTH, len(parts) - 1)
+    if depth <= 0:
+        return "*"
+    return ":".join(parts[:depth]) + ":*"
+
+
+class _Series:
+    """单个 (操作, 键前缀) 的统计"""
+
+    __slots__ = ("count", "errors", "hits", "misses", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.total = 0.0
+        self.max = 0.0
+        # 最后一个桶表示超过最大上界
+        self.buckets = [0] * (len(_BUCKET_BOUNDS) + 1)
+
+    def observe(self, seconds: float, error: bool, hits: int, misses: int):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+        if error:
+            self.errors += 1
+        self.hits += hits
+        self.misses += misses
+
+    def percentile(self, p: float) -> Optional[float]:
+        """按直方图估算分位数（毫秒）, 取所在桶的上界"""
+        if not self.count:
+            return None
+        rank = self.count * p
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return LATENCY_BUCKETS_MS[index]
+                return round(self.max * 1000, 3)
+        return round(self.max * 1000, 3)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS_MS] + ["+inf"], self.buckets)),
+        }
+
+
+class CacheMetrics:
+    """缓存指标收集"""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._prefixes = set()
+        self.started_at = time.time()
+
+    def observe(self, op: str, prefix: str, seconds: float, error: bool = False, hits: int = 0, misses: int = 0):
+        """
+        记录一次操作
+        :param op: 操作名
+        :param prefix: 键前缀
+        :param seconds: 耗时（秒）
+        :param error: 是否出错
+        :param hits: 命中的键数量
+        :param misses: 未命中的键数量
+        """
+        if prefix not in self._prefixes:
+            # 限制前缀数量, 避免键设计不规范时指标无限增长
+            if len(self._prefixes) >= CACHE_METRICS_MAX_PREFIXES:
+                prefix = OTHER_PREFIX
+            self._prefixes.add(prefix)
+        series = self._series.get((op, prefix))
+        if series is None:
+            series = self._series[(op, prefix)] = _Series()
+        series.observe(seconds, error, hits, misses)
+
+    def snapshot(self) -> dict:
+        """
+        获取指标快照
+        :return: {"operations": {操作: {前缀: 统计}}, "prefixes": {前缀: 汇总}}
+        """
+        operations: Dict[str, dict] = {}
+        prefixes: Dict[str, dict] = {}
+        for (op, prefix), series in list(self._series.items()):
+            operations.setdefault(op, {})[prefix] = series.snapshot()
+            summary = prefixes.setdefault(prefix, {"count": 0, "errors": 0, "hits": 0, "misses": 0, "total_ms": 0.0})
+            summary["count"] += series.count
+            summary["errors"] += series.errors
+            summary["hits"] += series.hits
+            summary["misses"] += series.misses
+            summary["total_ms"] = round(summary["total_ms"] + series.total * 1000, 3)
+        for summary in prefixes.values():
+            lookups = summary["hits"] + summary["misses"]
+            summary["hit_rate"] = round(summary["hits"] / lookups, 4) if lookups else None
+        return {
+            "since": self.started_at,
+            "operations": operations,
+            # 按调用次数从多到少排列
+            "prefixes": dict(sorted(prefixes.items(), key=lambda item: item[1]["count"], reverse=True)),
+        }
+
+    def reset(self) -> None:
+        """清空指标"""
+        self._series.clear()
+        self._prefixes.clear()
+        self.started_at = time.time()
+
+
+metrics = CacheMetrics()
+
+
+def mark_error() -> None:
+    """标记当前操作出错"""
+    state = _current_op.get()
+    if state is not None:
+        state[0] = True
+
+
+def _single_key_prefix(args) -> str:
+    return key_prefix(args[0]) if args and isinstance(args[0], str) else "*"
+
+
+def _multi_key_prefix(args, result) -> str:
+    keys = args[0] if args else None
+    # 键可能以只能遍历一次的迭代器传入, 此时按返回的 {键: 值} 计算
+    if not isinstance(keys, (list, tuple, dict)):
+        keys = result if isinstance(result, dict) else None
+    for key in keys or ():
+        return key_prefix(key)
+    return "*"
+
+
+def instrumented(
+    op: str,
+    prefix: Optional[str] = None,
+    multi: bool = False,
+    lookup: Optional[Callable] = None
+) -> Callable:
+    """
+    Cache操作的指标装饰器, 用于 @classmethod 之下
+    :param op: 操作名
+    :param prefix: 固定的键前缀, 默认按第一个参数（键或键列表）计算
+    :param multi: 第一个参数是否为键列表/字典, 批量操作按第一个键计算前缀
+    :param lookup: 读操作 结果 -> (命中数, 未命中数) 的函数
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(cls, *args, **kwargs):
+            if not CACHE_METRICS_ENABLED:
+                return await func(cls, *args, **kwargs)
+
+            state = [False]
+            token = _current_op.set(state)
+            started = time.perf_counter()
+            result = None
+            try:
+                result = await func(cls, *args, **kwargs)
+                return result
+            except BaseException:
+                state[0] = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                _current_op.reset(token)
+                if multi:
+                    series_prefix = prefix or _multi_key_prefix(args, result)
+                else:
+                    series_prefix = prefix or _single_key_prefix(args)
+                hits, misses = lookup(result) if lookup is not None and not state[0] else (0, 0)
+                metrics.observe(op, series_prefix, elapsed, state[0], hits, misses)
+        return wrapper
+    return decorator
+
+
+def single_lookup(result) -> Tuple[int, int]:
+    return (0, 1) if result is None else (1, 0)
+
+
+def many_lookup(result) -> Tuple[int, int]:
+    hits = sum(1 for value in (result or {}).values() if value is not None)
+    return hits, len(result or {}) - hits
+
+
+def tagged_lookup(result) -> Tuple[int, int]:
+    return single_lookup(result[0] if result else None)
+
+
+def list_lookup(result) -> Tuple[int, int]:
+    return (1, 0) if result else (0, 1)
@@ -0,0 +1,82 @@
+import time
+from collections import deque
+
+"""
+熔断器
+- closed: 正常调用; 时间窗口内失败次数达到阈值后进入 open
+- open: 调用直接失败, 不再等待超时; 经过恢复时间后进入 half_open
+- half_open: 只放行一次探测调用, 成功则回到 closed, 失败则重新进入 open
+"""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """基于时间窗口失败次数的熔断器"""
+
+    def __init__(self, failure_threshold: int = 5, window: float = 10, recovery_timeout: float = 5):
+        """
+        :param failure_threshold: 进入 open 状态的失败次数
+        :param window: 统计失败次数的时间窗口（秒）
+        :param recovery_timeout: open 状态持续多久后允许探测（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self._failures = deque()
+        self._opened_at = 0.0
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    def allow(self) -> bool:
+        """
+        是否允许本次调用
+        open 状态超过恢复时间后放行一次, 并进入 half_open, 此次调用即为探测调用
+        :return: 是否允许
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self.state = HALF_OPEN
+            return True
+        self.rejected_count += 1
+        return False
+
+    def record_success(self) -> None:
+        """记录探测成功, 恢复正常调用"""
+        self.state = CLOSED
+        self._failures.clear()
+
+    def record_failure(self) -> None:
+        """记录一次失败"""
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if self.state == CLOSED and len(self._failures) >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+        self.opened_count += 1
+
+    def stats(self) -> dict:
+        """
+        获取熔断器状态
+        :return: 状态字典
+        """
+        return {
+            "state": self.state,
+            "recent_failures": len(self._failures),
+            "opened_count": self.opened_count,
+            "rejected_count": self.rejected_count,
+        }
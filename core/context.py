@@ -1,6 +1,15 @@
 # core/context.py
+from contextlib import contextmanager
 from contextvars import ContextVar
-from typing import Optional, Dict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+"""
+请求级上下文
+一次请求内令牌只解码、验证一次, 解码结果、续期判断和当前用户记录保存在 AuthContext 中,
+core.middleware 的各个装饰器和 core.auth 的辅助函数共用同一个上下文;
+request_context() 由 error_handler 在每个请求开始时开启, 退出时丢弃
+"""
 
 # 定义线程安全的上下文变量
 current_user: ContextVar[Optional[Dict]] = ContextVar("current_user", default=None)
@@ -9,4 +18,75 @@ def get_current_user() -> Optional[Dict]:
     return current_user.get()
 
 def set_current_user(user_info: Dict):
-    current_user.set(user_info)
\ No newline at end of file
+    current_user.set(user_info)
+
+
+# 未加载用户记录时的占位值, 与"用户不存在"(None)区分
+_UNLOADED = object()
+
+
+@dataclass
+class AuthContext:
+    """当前请求的鉴权信息"""
+
+    token: Optional[str]
+    # 令牌解码结果, 令牌缺失、无效、已过期或已吊销时为None
+    payload: Optional[Dict[str, Any]] = None
+    # 令牌是否临近过期需要续期
+    needs_refresh: bool = False
+    # 懒加载的用户记录（User ORM实例）
+    user: Any = _UNLOADED
+
+    @property
+    def authenticated(self) -> bool:
+        """令牌是否有效"""
+        return self.payload is not None
+
+    @property
+    def username(self) -> Optional[str]:
+        """令牌中的用户名"""
+        if not self.payload:
+            return None
+        return self.payload.get("sub") or self.payload.get("username")
+
+    @property
+    def user_loaded(self) -> bool:
+        """是否已加载用户记录"""
+        return self.user is not _UNLOADED
+
+
+_auth_context: ContextVar[Optional[AuthContext]] = ContextVar("auth_context", default=None)
+
+
+def current_auth_context(token: Optional[str] = None) -> Optional[AuthContext]:
+    """
+    获取当前请求的鉴权上下文
+    :param token: 指定时只返回该令牌的上下文, 用于判断能否复用解码结果
+    :return: 鉴权上下文, 没有时为None
+    """
+    context = _auth_context.get()
+    if context is None or (token is not None and context.token != token):
+        return None
+    return context
+
+
+def set_auth_context(context: Optional[AuthContext]) -> None:
+    """
+    设置当前请求的鉴权上下文
+    :param context: 鉴权上下文, None 表示清除
+    """
+    _auth_context.set(context)
+
+
+@contextmanager
+def request_context():
+    """
+    开启请求级上下文, 退出时恢复, 不同请求之间不会共享鉴权信息
+        with request_context():
+            return await handler(request)
+    """
+    token = _auth_context.set(None)
+    try:
+        yield
+    finally:
+        _auth_context.reset(token)
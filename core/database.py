@@ -1,32 +1,181 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core.logger import setup_logger
+from core.slow_query_log import slow_query_log
+from dotenv import load_dotenv
+from typing import Optional
 import os
+import time
+import sqlite3
+import random
 from pathlib import Path
 
 """
 异步数据库配置
+连接参数和SQLite PRAGMA 从 robyn.env 读取, 各部署环境可分别调整
+写操作使用 AsyncSessionLocal, 只读查询使用 AsyncReadSessionLocal（独立的只读连接池）
 """
 
 # 获取项目根目录
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 加载环境变量
+load_dotenv(os.path.join(BASE_DIR, "robyn.env"))
+
 # 数据库文件路径
 DB_PATH = os.path.join(BASE_DIR, "robyn_data.db")
 
-# 创建异步数据库引擎
-engine = create_async_engine(
-    f"sqlite+aiosqlite:///{DB_PATH}",
-    echo=True,  # 设置为 True 可以看到 SQL 语句
+# SQL日志配置
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() == 'true'  # 是否打印所有SQL语句, 仅用于调试
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))  # 耗时超过该值的SQL记录为慢查询（毫秒）, 0 表示不记录; 慢查询连同执行计划保存到 core.slow_query_log
+DB_SQL_LOG_SAMPLE_RATE = float(os.getenv('DB_SQL_LOG_SAMPLE_RATE', 0))  # 按比例抽样记录SQL（0~1）, 0 表示不抽样
+
+# 连接池配置
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # 等待空闲连接的时间（秒）
+
+# 只读连接池配置
+# 未设置 DATABASE_READ_URL 时以只读方式打开同一个SQLite文件; 使用服务端数据库时可设置为只读副本的地址
+DATABASE_READ_URL = os.getenv('DATABASE_READ_URL', '')
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 10))
+DB_READ_MAX_OVERFLOW = int(os.getenv('DB_READ_MAX_OVERFLOW', 10))
+
+# SQLite PRAGMA 配置, 每个连接建立时执行
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')  # WAL 模式下读写互不阻塞
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # WAL 模式下 NORMAL 不会损坏数据库, 只可能丢失最近的事务
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 268435456))  # 内存映射大小（字节）, 0 表示关闭
+DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', -64000))  # 页缓存, 负数表示KiB
+DB_BUSY_TIMEOUT = int(os.getenv('DB_BUSY_TIMEOUT', 5000))  # 数据库被锁定时的等待时间（毫秒）
+DB_TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+
+logger = setup_logger('sql')
+
+
+def _set_sqlite_pragmas(dbapi_connection, read_only: bool):
+    """
+    新建连接时设置 SQLite PRAGMA
+    :param dbapi_connection: 数据库连接
+    :param read_only: 是否为只读连接, 只读连接不修改日志模式, 并禁止写入
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if read_only:
+            cursor.execute("PRAGMA query_only=1")
+        else:
+            cursor.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA temp_store={DB_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start_time", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if DB_SLOW_QUERY_MS > 0 and elapsed_ms >= DB_SLOW_QUERY_MS:
+        plan = None
+        if conn.dialect.name == "sqlite" and not executemany:
+            # 在同一连接上采集执行计划, 此时仍在该连接的同步执行上下文中
+            plan = slow_query_log.explain(conn.connection, statement, parameters)
+        entry = slow_query_log.record(statement, parameters, elapsed_ms, executemany, plan)
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms, full_scan={entry['full_scan']}): {statement}")
+    elif DB_SQL_LOG_SAMPLE_RATE > 0 and random.random() < DB_SQL_LOG_SAMPLE_RATE:
+        logger.info(f"Sampled query ({elapsed_ms:.1f} ms): {statement}")
+
+
+def _create_engine(url: str, pool_size: int, max_overflow: int, read_only: bool = False, ensure_file: Optional[str] = None) -> AsyncEngine:
+    """
+    创建异步数据库引擎, SQLite 连接设置 PRAGMA, 并按配置记录慢查询和抽样SQL
+    :param url: 数据库地址
+    :param pool_size: 连接池大小
+    :param max_overflow: 连接池允许超出的连接数
+    :param read_only: 是否为只读引擎
+    :param ensure_file: 建立连接前确保存在的SQLite文件路径（只读方式打开同一文件时使用）
+    :return: 异步引擎
+    """
+    new_engine = create_async_engine(
+        url,
+        echo=DB_ECHO,  # 设置为 True 可以看到所有 SQL 语句
+        # aiosqlite 文件数据库默认使用 NullPool（不接受连接池参数）, 显式指定连接池以复用连接
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if new_engine.dialect.name == "sqlite":
+        event.listen(
+            new_engine.sync_engine, "connect",
+            lambda dbapi_connection, connection_record: _set_sqlite_pragmas(dbapi_connection, read_only)
+        )
+        if ensure_file:
+            # 在首次建立连接时创建文件, 导入本模块不会在磁盘上产生数据库文件
+            event.listen(
+                new_engine.sync_engine, "do_connect",
+                lambda dialect, connection_record, cargs, cparams: _ensure_sqlite_file(ensure_file)
+            )
+    if DB_SLOW_QUERY_MS > 0 or DB_SQL_LOG_SAMPLE_RATE > 0:
+        event.listen(new_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(new_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return new_engine
+
+
+def _ensure_sqlite_file(path: str) -> None:
+    """
+    数据库文件不存在时先创建（如首次部署、尚未执行 create_all）, 只读连接无法打开不存在的文件
+    由只读引擎在建立连接前调用
+    :param path: 数据库文件路径
+    """
+    if os.path.exists(path):
+        return
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    finally:
+        conn.close()
+    logger.info(f"Created database file {path}")
+
+
+# 创建异步数据库引擎（读写）
+engine = _create_engine(f"sqlite+aiosqlite:///{DB_PATH}", DB_POOL_SIZE, DB_MAX_OVERFLOW)
+
+# 创建只读引擎, 列表查询等读操作不再与写操作争用同一个连接池
+read_engine = _create_engine(
+    DATABASE_READ_URL or f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    DB_READ_POOL_SIZE,
+    DB_READ_MAX_OVERFLOW,
+    read_only=True,
+    ensure_file=None if DATABASE_READ_URL else DB_PATH,
 )
 
-# 创建异步会话工厂
+# 创建异步会话工厂（读写）
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
 
+# 创建只读会话工厂, 只用于不修改数据的查询
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
 
 # 创建异步基类
 class Base(DeclarativeBase):
@@ -35,6 +184,14 @@ class Base(DeclarativeBase):
 # 获取异步数据库会话
 async def get_db():
     async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+# 获取只读数据库会话
+async def get_read_db():
+    async with AsyncReadSessionLocal() as session:
         try:
             yield session
         finally:
@@ -0,0 +1,105 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+"""
+进程内缓存(一级缓存)
+位于Redis(二级缓存)之前, 每个worker进程独立持有一份
+容量有上限, 超出时按LRU淘汰; 每个条目都有过期时间, 与Redis中键的剩余TTL保持一致
+"""
+
+# 用于区分"未命中"和"缓存值为None"
+MISSING = object()
+
+
+class LocalCache:
+    """进程内TTL/LRU缓存"""
+
+    def __init__(self, max_size: int = 1024, default_ttl: float = 60):
+        """
+        :param max_size: 最大条目数
+        :param default_ttl: 默认过期时间（秒）, 用于Redis中没有过期时间的键
+        """
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        """
+        获取缓存
+        :param key: 键
+        :return: 值, 未命中或已过期时返回 MISSING
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            expire_at, value = entry
+            if expire_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            # 命中后移动到末尾, 表示最近使用
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        设置缓存
+        :param key: 键
+        :param value: 值
+        :param ttl: 过期时间（秒）, 为None时使用默认过期时间
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            # 超出容量时淘汰最久未使用的条目
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """
+        删除缓存
+        :param key: 键
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        获取命中率等统计信息
+        :return: 统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,432 @@
+import time
+import asyncio
+import fnmatch
+from typing import Any, Callable, Dict, Optional
+
+"""
+进程内的Redis替代实现(CACHE_BACKEND=memory)
+实现 Cache 用到的 redis.asyncio.Redis 接口子集, 无需Redis服务即可启动应用、运行基准测试:
+- 字符串: GET / SET(EX, NX) / MGET / INCR
+- 通用: DEL / EXISTS / EXPIRE / PTTL / KEYS / SCAN
+- 列表: RPUSH / LTRIM / LRANGE
+- 集合: SADD / SMEMBERS
+- pub/sub、pipeline、register_script
+数据只存在于当前进程, 多个worker之间不共享; 与 decode_responses=False 一致, 值以字节串返回
+Lua脚本无法执行, 由调用方按脚本源码注册等价的Python实现
+"""
+
+# 已过期键的清理间隔（写操作次数）
+SWEEP_INTERVAL = 1000
+
+
+class MemoryServer:
+    """
+    进程内的数据和频道
+    同一进程中的所有 MemoryRedis 客户端共用一份, 与连接同一个Redis服务一致, 关闭客户端不会丢失数据
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        # {键: 过期时间（time.monotonic）}
+        self._expires: Dict[str, float] = {}
+        # {频道: {订阅者}}
+        self._channels: Dict[str, set] = {}
+        self._writes = 0
+
+    # ------------------ 过期 ------------------
+
+    def _alive(self, key: str) -> bool:
+        """键是否存在, 已过期的键在此时删除"""
+        expire_at = self._expires.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+        return key in self._data
+
+    def _lookup(self, key: str, kind: type, default=None):
+        if not self._alive(key):
+            return default
+        value = self._data[key]
+        if not isinstance(value, kind):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _store(self, key: str, value, ex: Optional[float] = None):
+        self._data[key] = value
+        if ex:
+            self._expires[key] = time.monotonic() + float(ex)
+        else:
+            self._expires.pop(key, None)
+        self._writes += 1
+        if self._writes % SWEEP_INTERVAL == 0:
+            self._sweep()
+
+    def _sweep(self):
+        """清理已过期的键, 避免只写不读的键一直占用内存"""
+        now = time.monotonic()
+        for key in [key for key, expire_at in self._expires.items() if expire_at <= now]:
+            self._data.pop(key, None)
+            del self._expires[key]
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, str):
+            return value.encode()
+        return str(value).encode()
+
+    @staticmethod
+    def _range(length: int, start: int, end: int) -> slice:
+        """Redis 的闭区间下标（支持负数）转换为切片"""
+        start, end = int(start), int(end)
+        if start < 0:
+            start = max(length + start, 0)
+        if end < 0:
+            end = length + end
+        return slice(start, max(end + 1, start))
+
+    # ------------------ 命令 ------------------
+
+    def ping(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._lookup(key, bytes)
+
+    def mget(self, keys, *args) -> list:
+        if isinstance(keys, str):
+            keys = [keys]
+        return [self.get(key) for key in list(keys) + list(args)]
+
+    def set(self, key: str, value, ex: Optional[float] = None, nx: bool = False):
+        if nx and self._alive(key):
+            return None
+        self._store(key, self._encode(value), ex)
+        return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        value = int(self._lookup(key, bytes, b"0")) + amount
+        # 与Redis一致, INCR 保留原有的过期时间
+        self._data[key] = self._encode(value)
+        return value
+
+    def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                deleted += 1
+        return deleted
+
+    def exists(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key: str, seconds: float) -> bool:
+        if not self._alive(key):
+            return False
+        self._expires[key] = time.monotonic() + float(seconds)
+        return True
+
+    def pttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        expire_at = self._expires.get(key)
+        if expire_at is None:
+            return -1
+        return max(int((expire_at - time.monotonic()) * 1000), 0)
+
+    def rpush(self, key: str, *values) -> int:
+        items = self._lookup(key, list)
+        if items is None:
+            items = []
+            self._store(key, items)
+        items.extend(self._encode(value) for value in values)
+        return len(items)
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._lookup(key, list)
+        if items is not None:
+            items[:] = items[self._range(len(items), start, end)]
+            if not items:
+                self.delete(key)
+        return True
+
+    def lrange(self, key: str, start: int, end: int) -> list:
+        items = self._lookup(key, list, [])
+        return items[self._range(len(items), start, end)]
+
+    def sadd(self, key: str, *members) -> int:
+        members_set = self._lookup(key, set)
+        if members_set is None:
+            members_set = set()
+            self._store(key, members_set)
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        return added
+
+    def srem(self, key: str, *members) -> int:
+        members_set = self._lookup(key, set)
+        if members_set is None:
+            return 0
+        removed = len(members_set & set(members))
+        members_set.difference_update(members)
+        if not members_set:
+            self.delete(key)
+        return removed
+
+    def smembers(self, key: str) -> set:
+        return set(self._lookup(key, set, set()))
+
+    def keys(self, pattern: str = "*") -> list:
+        return [key.encode() for key in list(self._data) if fnmatch.fnmatchcase(key, pattern) and self._alive(key)]
+
+    def flushall(self) -> bool:
+        self._data.clear()
+        self._expires.clear()
+        return True
+
+    def publish(self, channel: str, message) -> int:
+        subscribers = self._channels.get(channel, ())
+        data = self._encode(message)
+        for subscriber in list(subscribers):
+            subscriber.deliver(channel, data)
+        return len(subscribers)
+
+    # ------------------ 订阅 ------------------
+
+    def _subscribe(self, channel: str, subscriber: "MemoryPubSub"):
+        self._channels.setdefault(channel, set()).add(subscriber)
+
+    def _unsubscribe(self, channel: str, subscriber: "MemoryPubSub"):
+        subscribers = self._channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._channels[channel]
+
+
+# 可通过 MemoryRedis / MemoryPipeline 调用的命令
+COMMANDS = frozenset({
+    "ping", "get", "mget", "set", "incr", "delete", "exists", "expire", "pttl",
+    "rpush", "ltrim", "lrange", "sadd", "srem", "smembers", "keys", "flushall", "publish",
+})
+
+# 进程内共用的数据
+_default_server = MemoryServer()
+
+
+class MemoryPubSub:
+    """与 redis.asyncio.client.PubSub 接口一致的订阅对象"""
+
+    def __init__(self, server: MemoryServer):
+        self._server = server
+        self._channels = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def subscribe(self, *channels: str):
+        if self._queue is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+        for channel in channels:
+            self._channels.add(channel)
+            self._server._subscribe(channel, self)
+            self._queue.put_nowait({"type": "subscribe", "pattern": None, "channel": channel.encode(), "data": len(self._channels)})
+
+    def deliver(self, channel: str, data: bytes):
+        """由 publish 调用, 发布者可能在其他线程的事件循环中"""
+        message = {"type": "message", "pattern": None, "channel": channel.encode(), "data": data}
+        try:
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
+            if self._loop is running_loop:
+                self._queue.put_nowait(message)
+            else:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+        except RuntimeError:
+            # 订阅者所在的事件循环已关闭
+            self._close_channels()
+
+    async def listen(self):
+        while self._channels:
+            yield await self._queue.get()
+
+    def _close_channels(self):
+        for channel in self._channels:
+            self._server._unsubscribe(channel, self)
+        self._channels.clear()
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or list(self._channels):
+            self._channels.discard(channel)
+            self._server._unsubscribe(channel, self)
+
+    async def close(self):
+        self._close_channels()
+
+    aclose = close
+
+
+class MemoryPipeline:
+    """
+    与 redis.asyncio.client.Pipeline 接口一致的批量命令
+    命令在 execute 时依次执行, 中间没有 await, 天然是原子的
+    """
+
+    def __init__(self, server: MemoryServer):
+        self._server = server
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        if name not in COMMANDS:
+            raise AttributeError(f"MemoryPipeline does not support command {name!r}")
+
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self._commands = self._commands, []
+        results = []
+        for name, args, kwargs in commands:
+            try:
+                results.append(getattr(self._server, name)(*args, **kwargs))
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+    async def reset(self):
+        self._commands = []
+
+
+class MemoryScript:
+    """register_script 返回的脚本对象, 调用时执行注册的Python实现"""
+
+    def __init__(self, server: MemoryServer, func: Callable):
+        self._server = server
+        self._func = func
+
+    async def __call__(self, keys=None, args=None, client=None):
+        return self._func(self._server, list(keys or []), list(args or []))
+
+
+class MemoryRedis:
+    """
+    与 redis.asyncio.Redis 接口一致的进程内客户端
+    :param scripts: {Lua脚本源码: (server, keys, args) -> 结果 的Python实现}
+    :param server: 数据所在的 MemoryServer, 默认使用进程内共用的一份
+    """
+
+    def __init__(self, scripts: Optional[Dict[str, Callable]] = None, server: Optional[MemoryServer] = None):
+        self._server = server or _default_server
+        self._scripts = scripts or {}
+
+    def __getattr__(self, name: str):
+        if name not in COMMANDS:
+            raise AttributeError(f"MemoryRedis does not support command {name!r}")
+        method = getattr(self._server, name)
+
+        async def command(*args, **kwargs):
+            return method(*args, **kwargs)
+        return command
+
+    def register_script(self, source: str) -> MemoryScript:
+        func = self._scripts.get(source)
+        if func is None:
+            raise NotImplementedError("Lua scripts are not supported by the memory backend, register a Python implementation")
+        return MemoryScript(self._server, func)
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self._server)
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        for key in self._server.keys(match or "*"):
+            yield key
+
+    def pubsub(self) -> MemoryPubSub:
+        return MemoryPubSub(self._server)
+
+    async def close(self):
+        pass
+
+    aclose = close
+
+
+# ------------------ Cache 脚本的Python实现 ------------------
+
+def append_message(server: MemoryServer, keys: list, args: list) -> int:
+    """APPEND_MESSAGE_SCRIPT: 追加消息并按条数、总字节数裁剪队列"""
+    key = keys[0]
+    message, max_len, max_bytes, expire = args[0], int(args[1]), int(args[2]), int(args[3])
+    length = server.rpush(key, message)
+    if max_len > 0 and length > max_len:
+        server.ltrim(key, -max_len, -1)
+        length = max_len
+    if max_bytes > 0:
+        items = server.lrange(key, 0, -1)
+        total = 0
+        keep = 0
+        # 从最新的消息往前累加字节数, 至少保留最新的一条
+        for item in reversed(items):
+            total += len(item)
+            if total > max_bytes and keep > 0:
+                break
+            keep += 1
+        if keep < len(items):
+            server.ltrim(key, -keep, -1)
+        length = keep
+    if expire > 0:
+        server.expire(key, expire)
+    return length
+
+
+def set_tagged(server: MemoryServer, keys: list, args: list) -> int:
+    """SET_TAGGED_SCRIPT: 标签未在读取之后被失效时写入缓存并登记到标签集合"""
+    n = (len(keys) - 1) // 2
+    start_seq = int(args[2])
+    for seq_key in keys[1 + n:]:
+        if int(server.get(seq_key) or 0) > start_seq:
+            return 0
+    server.set(keys[0], args[0], ex=int(args[1]))
+    for tag_key in keys[1:1 + n]:
+        server.sadd(tag_key, keys[0])
+        server.expire(tag_key, int(args[3]))
+    return 1
+
+
+def invalidate_tags(server: MemoryServer, keys: list, args: list) -> list:
+    """INVALIDATE_TAGS_SCRIPT: 删除标签下的所有缓存并记录失效序号"""
+    n = (len(keys) - 1) // 2
+    seq = server.incr(keys[0])
+    deleted = []
+    for tag_key, seq_key in zip(keys[1:1 + n], keys[1 + n:]):
+        for member in server.smembers(tag_key):
+            server.delete(member)
+            deleted.append(member)
+        server.delete(tag_key)
+        server.set(seq_key, seq, ex=int(args[0]))
+    return deleted
+
+
+def release_lock(server: MemoryServer, keys: list, args: list) -> int:
+    """RELEASE_LOCK_SCRIPT: 锁的值与持有者标识一致时删除"""
+    value = server.get(keys[0])
+    if value is not None and value == server._encode(args[0]):
+        return server.delete(keys[0])
+    return 0
@@ -5,7 +5,9 @@ from robyn import Request, Response, status_codes
 from core.response import ApiResponse
 from sqlalchemy.exc import SQLAlchemyError
 from core.logger import setup_logger
-from core.auth import TokenService, get_token_from_request, get_current_user
+from common.utils.batch_loader import request_scope
+from core.auth import TokenService, get_token_from_request, get_current_user, get_auth_context
+from core.context import request_context
 from apps.users.services import check_and_refresh_token
 
 
@@ -17,11 +19,13 @@ def error_handler(func: Callable) -> Callable:
     """
     全局错误处理装饰器
     用于捕获和处理路由处理函数中的异常
+    同时开启请求级上下文: 令牌只解码一次, 批量加载器在同一请求内重复加载同一条数据只查询一次
     """
     @wraps(func)
     async def wrapper(*args, **kwargs) -> Response:
         try:
-            return await func(*args, **kwargs)
+            with request_context(), request_scope():
+                return await func(*args, **kwargs)
         except SQLAlchemyError as e:
             # 数据库相关错误
             logger.error(f"Database error in {func.__name__}: {str(e)}\n{traceback.format_exc()}")
@@ -76,12 +80,13 @@ def auth_required(func: Callable) -> Callable:
     """
     @wraps(func)
     async def wrapper(request: Request, *args, **kwargs) -> Response:
-        token = get_token_from_request(request)
-        if not token:
+        # 令牌在请求内只解码、验证一次, 后续的续期判断和用户查询复用同一个上下文
+        context = await get_auth_context(request)
+        if not context.token:
             return ApiResponse.unauthorized("请先登录")
         
         # 验证令牌有效性
-        if not TokenService.verify_token(token):
+        if not context.authenticated:
             return ApiResponse.unauthorized("登录已过期，请重新登录")
         
         # 检查是否需要续期
@@ -98,12 +103,13 @@ def auth_required(func: Callable) -> Callable:
 def auth_userinfo(func: Callable) -> Callable:
     @wraps(func)
     async def wrapper(request: Request, *args, **kwargs) -> Response:
-        token = get_token_from_request(request)
-        if not token:
+        # 令牌在请求内只解码、验证一次, 后续的续期判断和用户查询复用同一个上下文
+        context = await get_auth_context(request)
+        if not context.token:
             return ApiResponse.unauthorized("请先登录")
         
         # 验证令牌有效性
-        if not TokenService.verify_token(token):
+        if not context.authenticated:
             return ApiResponse.unauthorized("登录已过期，请重新登录")
         
         # 获取用户信息并设置到 request 中
@@ -132,16 +138,17 @@ def admin_required(func: Callable) -> Callable:
     """
     @wraps(func)
     async def wrapper(request: Request, *args, **kwargs) -> Response:
-        token = get_token_from_request(request)
-        if not token:
+        # 令牌在请求内只解码、验证一次, 后续的续期判断和用户查询复用同一个上下文
+        context = await get_auth_context(request)
+        if not context.token:
             return ApiResponse.unauthorized("请先登录")
         
         # 验证令牌有效性
-        if not TokenService.verify_token(token):
+        if not context.authenticated:
             return ApiResponse.unauthorized("登录已过期，请重新登录")
         
         # 验证管理员权限
-        is_admin = await TokenService.verify_admin(token)
+        is_admin = await TokenService.verify_admin(context.token)
         if not is_admin:
             return ApiResponse.forbidden("需要管理员权限")
         
@@ -0,0 +1,141 @@
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict
+
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖, 仅在选用时需要安装
+    msgpack = None
+
+"""
+缓存值序列化
+写入Redis的值 = 1字节格式头 + 序列化后的内容
+格式头低7位为序列化格式编号, 最高位表示内容是否经过zlib压缩
+没有格式头的旧值（json.dumps写入的JSON文本）仍可正常读取, 便于新旧版本共存
+"""
+
+# 格式头中的压缩标记位
+COMPRESSED_FLAG = 0x80
+
+
+class Serializer:
+    """序列化器基类"""
+
+    # 格式编号, 写入格式头, 取值范围 1~31（避开可打印字符, 保证与旧JSON值可区分）
+    format_id = 0
+    name = ""
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class OrjsonSerializer(Serializer):
+    """orjson 序列化器"""
+
+    format_id = 0x01
+    name = "orjson"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+def _msgpack_default(value: Any):
+    """msgpack 不支持的类型, 与 orjson 一样按ISO格式字符串写入"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+class MsgpackSerializer(Serializer):
+    """msgpack 序列化器"""
+
+    format_id = 0x02
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed, run `pip install msgpack` to use the msgpack serializer")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+SERIALIZERS: Dict[str, type] = {
+    OrjsonSerializer.name: OrjsonSerializer,
+    MsgpackSerializer.name: MsgpackSerializer,
+}
+
+
+class ValueCodec:
+    """
+    缓存值编解码
+    写入时使用指定的序列化器, 超过阈值的内容透明压缩; 读取时根据格式头选择序列化器
+    """
+
+    def __init__(self, serializer: str = "orjson", compress_threshold: int = 0, compress_level: int = 6):
+        """
+        :param serializer: 写入时使用的序列化器名称
+        :param compress_threshold: 序列化后超过该字节数时压缩, 0 表示不压缩
+        :param compress_level: zlib 压缩级别
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        self.serializer = SERIALIZERS[serializer]()
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        # 读取时按格式编号查找序列化器, 未安装的可选序列化器延迟报错
+        self._readers: Dict[int, Serializer] = {self.serializer.format_id: self.serializer}
+
+    def _reader(self, format_id: int) -> Serializer:
+        reader = self._readers.get(format_id)
+        if reader is None:
+            for serializer_cls in SERIALIZERS.values():
+                if serializer_cls.format_id == format_id:
+                    reader = self._readers[format_id] = serializer_cls()
+                    break
+            else:
+                raise ValueError(f"Unknown cache value format: {format_id:#x}")
+        return reader
+
+    def encode(self, value: Any) -> bytes:
+        """
+        编码缓存值
+        :param value: 值
+        :return: 带格式头的字节串
+        """
+        body = self.serializer.dumps(value)
+        header = self.serializer.format_id
+        if self.compress_threshold and len(body) >= self.compress_threshold:
+            body = zlib.compress(body, self.compress_level)
+            header |= COMPRESSED_FLAG
+        return bytes((header,)) + body
+
+    def decode(self, data: bytes) -> Any:
+        """
+        解码缓存值
+        :param data: Redis 中读取的字节串
+        :return: 值, 空值返回None
+        """
+        if not data:
+            return None
+        header = data[0]
+        format_id = header & ~COMPRESSED_FLAG
+        # 旧值为JSON文本, 首字节是可打印字符或空白
+        if format_id >= 0x20 or format_id in (0x09, 0x0a, 0x0d):
+            return json.loads(data)
+        body = data[1:]
+        if header & COMPRESSED_FLAG:
+            body = zlib.decompress(body)
+        return self._reader(format_id).loads(body)
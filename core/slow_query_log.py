@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import threading
+from collections import deque, OrderedDict
+from typing import Any, List, Optional
+from core.logger import setup_logger
+
+"""
+慢查询记录
+耗时超过 DB_SLOW_QUERY_MS 的SQL连同参数结构（只记录类型, 不记录值）和 EXPLAIN QUERY PLAN 结果
+保存在固定大小的环形缓冲区中, 同时以JSON行写入 logs/slow_query.log;
+管理员可通过 GET /admin/slow-queries 查看, 按语句汇总次数和耗时
+"""
+
+# 慢查询日志, 每条记录一行JSON
+sink = setup_logger('slow_query')
+
+DB_SLOW_QUERY_BUFFER_SIZE = int(os.getenv('DB_SLOW_QUERY_BUFFER_SIZE', 200))  # 环形缓冲区保存的慢查询条数
+DB_SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'  # 是否采集执行计划
+DB_SLOW_QUERY_PLAN_TTL = float(os.getenv('DB_SLOW_QUERY_PLAN_TTL', 300))  # 同一语句的执行计划缓存时间（秒）
+DB_SLOW_QUERY_PLAN_CACHE_SIZE = 256
+
+# 只对这些语句采集执行计划
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def parameters_shape(parameters: Any, executemany: bool = False) -> Any:
+    """
+    参数结构: 只保留参数名和类型, 不记录参数值
+    :param parameters: 语句参数（元组、列表或字典）
+    :param executemany: 是否为批量执行
+    :return: 参数结构
+    """
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"rows": len(parameters), "each": parameters_shape(first)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__ if parameters is not None else None
+
+
+class SlowQueryLog:
+    """慢查询环形缓冲区, 线程安全"""
+
+    def __init__(self, size: int = DB_SLOW_QUERY_BUFFER_SIZE):
+        self._entries: deque = deque(maxlen=size)
+        self._plans: "OrderedDict[str, tuple]" = OrderedDict()  # {语句: (执行计划, 采集时间)}
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def cached_plan(self, statement: str) -> Optional[List[str]]:
+        """
+        获取缓存中未过期的执行计划, 同一语句不必每次都执行 EXPLAIN
+        :param statement: SQL语句
+        :return: 执行计划, 没有时为None
+        """
+        with self._lock:
+            cached = self._plans.get(statement)
+            if cached is None or time.time() - cached[1] > DB_SLOW_QUERY_PLAN_TTL:
+                return None
+            return cached[0]
+
+    def explain(self, dbapi_connection, statement: str, parameters: Any) -> Optional[List[str]]:
+        """
+        在执行慢查询的同一连接上执行 EXPLAIN QUERY PLAN（仅SQLite）
+        :param dbapi_connection: 数据库连接
+        :param statement: SQL语句
+        :param parameters: 语句参数
+        :return: 执行计划的每一行, 语句不支持时为None
+        """
+        if not DB_SLOW_QUERY_EXPLAIN or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        plan = self.cached_plan(statement)
+        if plan is not None:
+            return plan
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            # 每行为 (id, parent, notused, detail)
+            plan = [row[-1] for row in cursor.fetchall()]
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {str(e)}"]
+        finally:
+            cursor.close()
+        with self._lock:
+            self._plans[statement] = (plan, time.time())
+            self._plans.move_to_end(statement)
+            while len(self._plans) > DB_SLOW_QUERY_PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def record(self, statement: str, parameters: Any, elapsed_ms: float, executemany: bool = False, plan: Optional[List[str]] = None) -> dict:
+        """
+        记录一条慢查询, 并写入日志
+        :param statement: SQL语句
+        :param parameters: 语句参数
+        :param elapsed_ms: 耗时（毫秒）
+        :param executemany: 是否为批量执行
+        :param plan: 执行计划
+        :return: 记录
+        """
+        entry = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "elapsed_ms": round(elapsed_ms, 2),
+            "statement": statement,
+            "params": parameters_shape(parameters, executemany),
+            "plan": plan,
+            # 执行计划中出现 "SCAN" 而没有使用索引时, 通常意味着全表扫描
+            "full_scan": any(
+                line.startswith("SCAN") and "USING" not in line and "VIRTUAL TABLE" not in line and "CONSTANT ROW" not in line
+                for line in plan or ()
+            ),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+        sink.warning(json.dumps(entry, ensure_ascii=False, default=str))
+        return entry
+
+    def snapshot(self, limit: Optional[int] = None) -> dict:
+        """
+        获取最近的慢查询和按语句汇总的统计
+        :param limit: 返回最近的条数, 默认全部
+        :return: 快照字典
+        """
+        with self._lock:
+            entries = list(self._entries)
+            total = self.total
+        summary = {}
+        for entry in entries:
+            item = summary.setdefault(entry["statement"], {"statement": entry["statement"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            item["count"] += 1
+            item["total_ms"] += entry["elapsed_ms"]
+            item["max_ms"] = max(item["max_ms"], entry["elapsed_ms"])
+        for item in summary.values():
+            item["avg_ms"] = round(item["total_ms"] / item["count"], 2)
+            item["total_ms"] = round(item["total_ms"], 2)
+        recent = entries[::-1]
+        return {
+            "total": total,
+            "buffered": len(entries),
+            "recent": recent[:limit] if limit else recent,
+            "by_statement": sorted(summary.values(), key=lambda item: item["total_ms"], reverse=True),
+        }
+
+    def reset(self) -> None:
+        """清空记录"""
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+            self.total = 0
+
+
+slow_query_log = SlowQueryLog()
@@ -1,79 +1,697 @@
-from datetime import datetime
-from typing import Dict, Set
+import os
+import sys
+import json
+import time
+import math
+import heapq
+import uuid
+import asyncio
+import hashlib
 import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from core.cache import Cache
 from core.logger import setup_logger
+from common.utils.bloom import BloomFilter
+
+"""
+令牌黑名单
+黑名单中只保存令牌的SHA-256摘要（32字节）和过期时间, 不保存令牌本身; 读操作不加锁,
+过期记录按过期时间放入最小堆, 由后台任务定期从堆顶清理, 记录数有上限, 内存占用可通过 stats() 查看
+超出上限时淘汰最早过期的记录, 被淘汰的摘要仍保留在布隆过滤器中, 直到全部过期, 已吊销的令牌不会因淘汰而重新生效
+
+TOKEN_BLACKLIST_BACKEND 选择实现:
+    local: 单机模式, 只在本进程内记录, 不依赖Redis（LocalTokenBlacklist）
+    redis: 吊销记录保存在Redis中（{prefix}:{摘要}, 值为令牌过期时间, TTL为令牌剩余有效期）,
+           并通过 pub/sub 通知所有进程; 每个进程在本地记录前再加一层布隆过滤器,
+           绝大多数令牌未被吊销, 在布隆过滤器中即可判定, 不访问Redis（TokenBlacklist）
+           进程(重新)订阅频道时从Redis重新加载全部记录, 订阅中断期间其他进程吊销的令牌不会遗漏
+
+本进程无法确定时（尚未完成第一次从Redis加载, 或布隆过滤器命中但没有本地记录）:
+    is_revoked（异步, 请求鉴权使用）查询Redis确认; Redis不可用时布隆过滤器命中按已吊销处理,
+               第一次加载前按 TOKEN_BLACKLIST_FAIL_CLOSED 处理; 单机模式按已吊销处理
+    is_blacklisted（同步）不访问Redis, 按未吊销处理, 由请求鉴权路径的 is_revoked 最终确认
+订阅断开期间保留上次加载的结果, 布隆过滤器未命中的令牌仍判定为未吊销, Redis不可用时不影响已登录用户
+"""
 
 # 设置日志记录器
 logger = setup_logger('token_blacklist')
 
-class TokenBlacklist:
-    """令牌黑名单管理类"""
-    
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        with cls._lock:
-            if cls._instance is None:
-                cls._instance = super().__new__(cls)
-                # 初始化黑名单集合和过期时间映射
-                cls._instance.blacklist = set()  
-                cls._instance.expire_times = {}   
-            return cls._instance
-    
-    def add_to_blacklist(self, token: str, expire_time: datetime) -> None:
+TOKEN_BLACKLIST_BACKEND = os.getenv('TOKEN_BLACKLIST_BACKEND', 'redis').lower()  # redis / local
+TOKEN_BLACKLIST_PREFIX = os.getenv('TOKEN_BLACKLIST_PREFIX', 'token:blacklist')
+TOKEN_BLACKLIST_CHANNEL = os.getenv('TOKEN_BLACKLIST_CHANNEL', 'token:blacklist:events')
+TOKEN_BLACKLIST_MAX_ENTRIES = int(os.getenv('TOKEN_BLACKLIST_MAX_ENTRIES', 100000))  # 本地最多保存的吊销记录数
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.getenv('TOKEN_BLACKLIST_BLOOM_CAPACITY', 100000))  # 布隆过滤器预期容量
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLACKLIST_BLOOM_ERROR_RATE', 0.001))  # 布隆过滤器误判率
+TOKEN_BLACKLIST_CLEANUP_INTERVAL = float(os.getenv('TOKEN_BLACKLIST_CLEANUP_INTERVAL', 60))  # 清理过期记录的间隔（秒）
+# 第一次从Redis加载完成前Redis不可用、无法确认令牌是否已吊销时是否按已吊销处理
+TOKEN_BLACKLIST_FAIL_CLOSED = os.getenv('TOKEN_BLACKLIST_FAIL_CLOSED', 'false').lower() == 'true'
+TOKEN_BLACKLIST_RETRY_DELAY = 1  # 订阅断开后的重试间隔（秒）
+
+# 保存全部已吊销摘要的集合, 用于进程启动或重新订阅时加载; 其中过期的摘要在加载时移除
+TOKEN_BLACKLIST_INDEX = f"{TOKEN_BLACKLIST_PREFIX}:index"
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+# 每条记录的内存估算: 字典中的摘要和过期时间, 以及堆中的 (过期时间, 摘要) 元组
+_ENTRY_BYTES = sys.getsizeof(b"\0" * DIGEST_SIZE) + sys.getsizeof(0.0)
+_HEAP_ITEM_BYTES = sys.getsizeof((0.0, b""))
+
+
+def token_digest(token: str) -> bytes:
+    """
+    令牌摘要, 黑名单中只保存摘要, 不保存令牌本身
+    :param token: JWT令牌
+    :return: SHA-256摘要（32字节）
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class DigestStore:
+    """
+    已吊销摘要的进程内存储
+    读操作（contains）只做一次字典查找, 不加锁; 写操作持有写锁, 各方法不互相调用, 不会重入
+    过期时间另存于最小堆, sweep 只需从堆顶弹出已过期的记录; 超出容量时淘汰最早过期的记录, 并通过 on_evict 通知调用方
+    """
+
+    def __init__(self, max_entries: int = TOKEN_BLACKLIST_MAX_ENTRIES, on_evict: Optional[Callable[[bytes, float], None]] = None):
+        """
+        :param max_entries: 最多保存的记录数
+        :param on_evict: 记录被淘汰时的回调 (摘要, 过期时间), 持有写锁时调用
+        """
+        self.max_entries = max(1, max_entries)
+        self._on_evict = on_evict
+        # {摘要: 过期时间（时间戳, 秒）}
+        self._entries: Dict[bytes, float] = {}
+        # (过期时间, 摘要), 记录被移除或延长后, 旧的堆元素在弹出时跳过
+        self._heap: List[Tuple[float, bytes]] = []
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> List[Tuple[bytes, float]]:
+        """全部记录的 (摘要, 过期时间)（快照）"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def contains(self, digest: bytes, now: Optional[float] = None) -> bool:
+        """
+        摘要是否在未过期的记录中
+        :param digest: 令牌摘要
+        :param now: 当前时间戳, 默认 time.time()
+        :return: 是否存在
+        """
+        expires_at = self._entries.get(digest)
+        return expires_at is not None and expires_at > (now or time.time())
+
+    def add(self, digest: bytes, expires_at: float) -> bool:
+        """
+        加入记录, 已存在时取较晚的过期时间
+        :param digest: 令牌摘要
+        :param expires_at: 过期时间（时间戳, 秒）
+        :return: 是否为新记录
+        """
+        now = time.time()
+        if expires_at <= now:
+            return False
+        with self._lock:
+            current = self._entries.get(digest)
+            if current is not None and current >= expires_at:
+                return False
+            self._entries[digest] = expires_at
+            heapq.heappush(self._heap, (expires_at, digest))
+            self._sweep(now)
+            while len(self._entries) > self.max_entries:
+                self._evict_earliest()
+            # 移除、延长过的记录在堆中留下的旧元素过多时重建堆
+            if len(self._heap) > 2 * len(self._entries) + 1024:
+                self._heap = [(exp, key) for key, exp in self._entries.items()]
+                heapq.heapify(self._heap)
+        return current is None
+
+    def discard(self, digest: bytes) -> None:
+        """
+        移除记录, 堆中的元素在弹出时跳过
+        :param digest: 令牌摘要
+        """
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def sweep(self) -> int:
+        """
+        清理已过期的记录, 只访问堆顶已过期的元素
+        :return: 清理的数量
+        """
+        with self._lock:
+            return self._sweep(time.time())
+
+    def _sweep(self, now: float) -> int:
+        """从堆顶弹出已过期的元素并删除对应记录（调用方持有写锁）"""
+        removed = 0
+        heap, entries = self._heap, self._entries
+        while heap and heap[0][0] <= now:
+            expires_at, digest = heapq.heappop(heap)
+            if entries.get(digest) == expires_at:
+                del entries[digest]
+                removed += 1
+        self.expired += removed
+        return removed
+
+    def _evict_earliest(self) -> None:
+        """淘汰最早过期的记录（调用方持有写锁）"""
+        while self._heap:
+            expires_at, digest = heapq.heappop(self._heap)
+            if self._entries.get(digest) == expires_at:
+                del self._entries[digest]
+                self.evicted += 1
+                if self._on_evict is not None:
+                    self._on_evict(digest, expires_at)
+                return
+
+    def memory_bytes(self) -> int:
+        """估算记录占用的内存（字节）"""
+        return (
+            sys.getsizeof(self._entries) + sys.getsizeof(self._heap)
+            + len(self._entries) * _ENTRY_BYTES + len(self._heap) * _HEAP_ITEM_BYTES
+        )
+
+    def stats(self) -> dict:
+        """
+        获取记录数、容量、淘汰和过期清理次数以及内存占用
+        :return: 统计信息字典
+        """
+        return {
+            "entries": len(self._entries),
+            "heap_size": len(self._heap),
+            "max_entries": self.max_entries,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class LocalTokenBlacklist:
+    """
+    单机令牌黑名单, 只在本进程内记录吊销的令牌
+    is_blacklisted 不加锁; 过期记录由后台任务定期清理
+    被淘汰的摘要加入布隆过滤器, 命中的令牌无法确定是否已吊销, 按已吊销处理
+    """
+
+    def __init__(self, max_entries: int = TOKEN_BLACKLIST_MAX_ENTRIES):
+        """
+        :param max_entries: 最多保存的记录数, 超出时淘汰最早过期的记录
+        """
+        self._store = DigestStore(max_entries, on_evict=self._on_evict)
+        # 被淘汰摘要的布隆过滤器, 第一次淘汰时创建, 其中的摘要全部过期后清空
+        self._evicted: Optional[BloomFilter] = None
+        # 被淘汰摘要中最晚的过期时间
+        self._evicted_until = 0.0
+        self._cleanup_task = None
+        # 上次输出容量已满警告的时间, 每个清理间隔最多输出一次
+        self._full_warned_at = 0.0
+
+    def _remember(self, digest: bytes, expires_at: float) -> bool:
+        """
+        记录已吊销的摘要
+        :param digest: 令牌摘要
+        :param expires_at: 令牌过期时间（时间戳, 秒）
+        :return: 是否为新记录
+        """
+        evicted = self._store.evicted
+        added = self._store.add(digest, expires_at)
+        if self._store.evicted != evicted and time.time() - self._full_warned_at >= TOKEN_BLACKLIST_CLEANUP_INTERVAL:
+            self._full_warned_at = time.time()
+            logger.warning(
+                f"Token blacklist is full ({self._store.max_entries}), earliest expiring entries are being evicted "
+                "and kept in a bloom filter"
+            )
+        return added
+
+    def _on_evict(self, digest: bytes, expires_at: float) -> None:
+        """
+        记录被淘汰时加入布隆过滤器（DigestStore 持有写锁时调用）
+        :param digest: 令牌摘要
+        :param expires_at: 令牌过期时间（时间戳, 秒）
+        """
+        self._evicted_until = max(self._evicted_until, expires_at)
+        if self._evicted is None:
+            bloom = BloomFilter(TOKEN_BLACKLIST_BLOOM_CAPACITY, TOKEN_BLACKLIST_BLOOM_ERROR_RATE)
+            bloom.add(digest)
+            self._evicted = bloom
+        else:
+            self._evicted.add(digest)
+
+    def _check_local(self, digest: bytes) -> Optional[bool]:
+        """
+        在本进程中检查摘要
+        :param digest: 令牌摘要
+        :return: 是否已吊销, 命中被淘汰摘要的布隆过滤器时无法确定, 为None
+        """
+        if self._store.contains(digest):
+            return True
+        evicted = self._evicted
+        if evicted is not None and digest in evicted and time.time() < self._evicted_until:
+            return None
+        return False
+
+    # ------------------ 对外接口 ------------------
+
+    def add_to_blacklist(self, token: str, expires_at: float) -> None:
         """
         将令牌添加到黑名单
         :param token: 要加入黑名单的令牌
-        :param expire_time: 令牌的过期时间
+        :param expires_at: 令牌的过期时间（JWT exp, 时间戳, 秒）
         """
-        with self._lock:
-            self.blacklist.add(token)
-            self.expire_times[token] = expire_time
-            logger.info(f"Token added to blacklist, expires at {expire_time}")
-    
+        self._remember(token_digest(token), expires_at)
+        logger.info(f"Token added to blacklist, expires at {time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(expires_at))} UTC")
+
+    async def revoke(self, token: str, expires_at: float) -> bool:
+        """
+        将令牌添加到黑名单
+        :param token: 要加入黑名单的令牌
+        :param expires_at: 令牌的过期时间（时间戳, 秒）
+        :return: 是否已保存
+        """
+        self.add_to_blacklist(token, expires_at)
+        return True
+
     def is_blacklisted(self, token: str) -> bool:
         """
-        检查令牌是否在黑名单中
+        检查令牌是否在黑名单中, 只检查本进程的记录
+        无法确定时按未吊销处理, 请求鉴权由 is_revoked 最终确认
         :param token: 要检查的令牌
         :return: 是否在黑名单中
         """
-        with self._lock:
-            # 如果令牌在黑名单中且未过期，返回True
-            if token in self.blacklist:
-                expire_time = self.expire_times.get(token)
-                if expire_time and expire_time > datetime.utcnow():
-                    return True
-                # 如果令牌已过期，从黑名单中移除
-                self.remove_from_blacklist(token)
-            return False
-    
+        self._ensure_tasks()
+        return self._check_local(token_digest(token)) is True
+
+    async def is_revoked(self, token: str) -> bool:
+        """
+        检查令牌是否已被吊销, 单机模式没有可以确认的后端, 无法确定时按已吊销处理
+        :param token: 要检查的令牌
+        :return: 是否已被吊销
+        """
+        self._ensure_tasks()
+        return self._check_local(token_digest(token)) is not False
+
     def remove_from_blacklist(self, token: str) -> None:
         """
-        从黑名单中移除令牌
+        从本进程的黑名单中移除令牌
         :param token: 要移除的令牌
         """
-        with self._lock:
-            self.blacklist.discard(token)
-            self.expire_times.pop(token, None)
-            logger.info(f"Token removed from blacklist")
-    
-    def cleanup_expired_tokens(self) -> None:
+        self._store.discard(token_digest(token))
+        logger.info("Token removed from blacklist")
+
+    def cleanup_expired_tokens(self) -> int:
         """
-        清理已过期的令牌
+        清理已过期的令牌, 被淘汰的摘要全部过期后清空其布隆过滤器
+        :return: 清理的数量
         """
-        with self._lock:
-            current_time = datetime.utcnow()
-            expired_tokens = [
-                token for token, expire_time in self.expire_times.items()
-                if expire_time <= current_time
-            ]
-            
-            for token in expired_tokens:
-                self.remove_from_blacklist(token)
-            
-            if expired_tokens:
-                logger.info(f"Cleaned up {len(expired_tokens)} expired tokens")
+        removed = self._store.sweep()
+        if removed:
+            logger.info(f"Cleaned up {removed} expired tokens")
+        if self._evicted is not None and time.time() >= self._evicted_until:
+            self._evicted = None
+        return removed
+
+    def stats(self) -> dict:
+        """
+        获取黑名单统计
+        :return: 统计信息字典
+        """
+        store = self._store.stats()
+        evicted = self._evicted.stats() if self._evicted is not None else None
+        return {
+            **store,
+            "backend": "local",
+            "evicted_bloom": evicted,
+            "memory_bytes": store["memory_bytes"] + (evicted["memory_bytes"] if evicted else 0),
+        }
+
+    # ------------------ 后台任务 ------------------
+
+    def _ensure_tasks(self) -> None:
+        """在当前事件循环中启动清理任务（已在运行时跳过）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._cleanup_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._cleanup_task = loop.create_task(self._cleanup_periodically())
+
+    async def _cleanup_periodically(self):
+        """定期清理过期记录"""
+        while True:
+            await asyncio.sleep(TOKEN_BLACKLIST_CLEANUP_INTERVAL)
+            try:
+                self.cleanup_expired_tokens()
+            except Exception as e:
+                logger.error(f"Token blacklist cleanup error: {str(e)}")
+
+
+class TokenBlacklist(LocalTokenBlacklist):
+    """
+    多进程共享的令牌黑名单, 吊销记录保存在Redis中, 本地记录前加一层布隆过滤器
+    布隆过滤器只在持有写锁时修改, 重建时整体替换引用, 读操作不加锁
+    本地记录被淘汰后摘要仍在布隆过滤器中, 命中但没有本地记录时由 is_revoked 向Redis确认;
+    布隆过滤器只从Redis重建, 不会丢失本地已淘汰的摘要
+    """
+
+    def __init__(
+        self,
+        max_entries: int = TOKEN_BLACKLIST_MAX_ENTRIES,
+        capacity: int = TOKEN_BLACKLIST_BLOOM_CAPACITY,
+        error_rate: float = TOKEN_BLACKLIST_BLOOM_ERROR_RATE
+    ):
+        """
+        :param max_entries: 本地最多保存的记录数, 被淘汰的记录由布隆过滤器和Redis兜底
+        :param capacity: 布隆过滤器预期容量
+        :param error_rate: 布隆过滤器误判率
+        """
+        super().__init__(max_entries)
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._write_lock = threading.Lock()
+        # 当前进程标识, 用于忽略自己发布的吊销消息
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task = None
+        # 未完成的Redis写入任务, 保留引用以免被回收
+        self._pending = set()
+        # 是否已从Redis加载过全部记录; 订阅断开后保持为True, 本地记录在上次加载时是完整的
+        self.synced = False
+        # 当前是否已订阅频道
+        self.subscribed = False
+        # 布隆过滤器中的摘要按过期时间分桶计数（桶宽为清理间隔）, 用于估算其中已过期的数量
+        self._bloom_expiry: Dict[int, int] = {}
+        # 从Redis重建布隆过滤器期间新记录的 (摘要, 过期时间), 重建完成后补入; 未在重建时为None
+        self._rebuilding: Optional[List[Tuple[bytes, float]]] = None
+        self.bloom_negatives = 0
+        self.local_hits = 0
+        self.unresolved = 0
+        self.redis_checks = 0
+        self.bloom_rebuilds = 0
+
+    @staticmethod
+    def _key(digest: bytes) -> str:
+        return f"{TOKEN_BLACKLIST_PREFIX}:{digest.hex()}"
+
+    # ------------------ 本地记录 ------------------
+
+    @staticmethod
+    def _expiry_bucket(expires_at: float) -> int:
+        return int(expires_at // TOKEN_BLACKLIST_CLEANUP_INTERVAL)
+
+    def _remember(self, digest: bytes, expires_at: float) -> bool:
+        """
+        记录已吊销的摘要, 新记录同时加入布隆过滤器; 布隆过滤器达到容量时在后台从Redis重建并扩容
+        :param digest: 令牌摘要
+        :param expires_at: 令牌过期时间（时间戳, 秒）
+        :return: 是否为新记录
+        """
+        with self._write_lock:
+            if not super()._remember(digest, expires_at):
+                return False
+            self._bloom.add(digest)
+            bucket = self._expiry_bucket(expires_at)
+            self._bloom_expiry[bucket] = self._bloom_expiry.get(bucket, 0) + 1
+            if self._rebuilding is not None:
+                self._rebuilding.append((digest, expires_at))
+            full = self._bloom.count >= self._bloom.capacity
+        if full:
+            self._schedule_rebuild()
+        return True
+
+    def _on_evict(self, digest: bytes, expires_at: float) -> None:
+        """被淘汰的摘要已在布隆过滤器中, 不需要另外记录"""
+
+    def _bloom_expired(self) -> int:
+        """估算布隆过滤器中已过期的摘要数量"""
+        current = self._expiry_bucket(time.time())
+        return sum(count for bucket, count in list(self._bloom_expiry.items()) if bucket < current)
+
+    def _schedule_rebuild(self) -> None:
+        """在后台从Redis重建布隆过滤器（正在重建或没有运行中的事件循环时跳过）"""
+        with self._write_lock:
+            if self._rebuilding is not None:
+                return
+            self._rebuilding = []
+        if not self._schedule(self._rebuild_bloom()):
+            with self._write_lock:
+                self._rebuilding = None
+
+    async def _rebuild_bloom(self) -> None:
+        """
+        按Redis中全部未过期的吊销记录和本地记录重建布隆过滤器, 元素数量接近容量时扩容
+        本地已淘汰的摘要在Redis中仍有记录, 重建后仍在布隆过滤器中; Redis不可用时保留原布隆过滤器
+        """
+        try:
+            redis = await Cache.client()
+            records = await self._fetch(redis)
+        except Exception as e:
+            logger.error(f"Failed to rebuild token blacklist bloom filter: {str(e)}")
+            with self._write_lock:
+                self._rebuilding = None
+            return
+        with self._write_lock:
+            merged = dict(records)
+            merged.update(self._store.items())
+            merged.update(self._rebuilding)
+            bloom = BloomFilter(max(self._capacity, len(merged) * 2), self._error_rate)
+            expiry: Dict[int, int] = {}
+            for digest, expires_at in merged.items():
+                bloom.add(digest)
+                bucket = self._expiry_bucket(expires_at)
+                expiry[bucket] = expiry.get(bucket, 0) + 1
+            self._bloom, self._bloom_expiry = bloom, expiry
+            self._rebuilding = None
+            self.bloom_rebuilds += 1
+        logger.info(f"Token blacklist bloom filter rebuilt with {len(merged)} entries, capacity {bloom.capacity}")
+
+    def _check_local(self, digest: bytes) -> Optional[bool]:
+        """
+        在本进程中检查摘要
+        :param digest: 令牌摘要
+        :return: True 已吊销, False 未吊销, None 无法确定（尚未完成同步, 或布隆过滤器命中但没有记录: 误判或已被淘汰）
+        """
+        if digest not in self._bloom:
+            self.bloom_negatives += 1
+            # 第一次加载完成前其他进程吊销的令牌可能还未加载
+            return False if self.synced else None
+        if self._store.contains(digest):
+            self.local_hits += 1
+            return True
+        self.unresolved += 1
+        return None
+
+    # ------------------ 对外接口 ------------------
+
+    def add_to_blacklist(self, token: str, expires_at: float) -> None:
+        """
+        将令牌添加到黑名单
+        立即在本进程生效, 写入Redis和通知其他进程在后台完成
+        :param token: 要加入黑名单的令牌
+        :param expires_at: 令牌的过期时间（JWT exp, 时间戳, 秒）
+        """
+        super().add_to_blacklist(token, expires_at)
+        if not self._schedule(self._persist(token_digest(token), expires_at)):
+            logger.warning("No running event loop, token revocation is only recorded in this process")
+
+    async def revoke(self, token: str, expires_at: float) -> bool:
+        """
+        将令牌添加到黑名单, 等待写入Redis完成
+        :param token: 要加入黑名单的令牌
+        :param expires_at: 令牌的过期时间（时间戳, 秒）
+        :return: 是否已写入Redis
+        """
+        digest = token_digest(token)
+        self._remember(digest, expires_at)
+        return await self._persist(digest, expires_at)
+
+    async def is_revoked(self, token: str) -> bool:
+        """
+        检查令牌是否已被吊销, 本进程无法确定时查询Redis; 查询结果不写回本地记录, 以免查询时淘汰其他记录
+        Redis不可用时: 布隆过滤器命中（可能是被淘汰的吊销记录）按已吊销处理, 第一次加载前未命中按 TOKEN_BLACKLIST_FAIL_CLOSED 处理
+        :param token: 要检查的令牌
+        :return: 是否已被吊销
+        """
+        self._ensure_tasks()
+        digest = token_digest(token)
+        local = self._check_local(digest)
+        if local is not None:
+            return local
+
+        self.redis_checks += 1
+        try:
+            redis = await Cache.client()
+            value = await redis.get(self._key(digest))
+        except Exception as e:
+            logger.error(f"Failed to check token blacklist in Redis: {str(e)}")
+            return digest in self._bloom or TOKEN_BLACKLIST_FAIL_CLOSED
+        return value is not None
+
+    def cleanup_expired_tokens(self) -> int:
+        """
+        清理已过期的令牌, 布隆过滤器中一半以上的摘要已过期时从Redis重建
+        :return: 清理的数量
+        """
+        removed = super().cleanup_expired_tokens()
+        if 2 * self._bloom_expired() > self._bloom.count:
+            self._schedule_rebuild()
+        return removed
+
+    def stats(self) -> dict:
+        """
+        获取黑名单统计
+        :return: 统计信息字典
+        """
+        store = self._store.stats()
+        bloom = self._bloom.stats()
+        return {
+            **store,
+            "backend": "redis",
+            "synced": self.synced,
+            "subscribed": self.subscribed,
+            "bloom": bloom,
+            "bloom_negatives": self.bloom_negatives,
+            "local_hits": self.local_hits,
+            "unresolved": self.unresolved,
+            "redis_checks": self.redis_checks,
+            "bloom_rebuilds": self.bloom_rebuilds,
+            "memory_bytes": store["memory_bytes"] + bloom["memory_bytes"],
+        }
+
+    # ------------------ Redis同步 ------------------
+
+    def _schedule(self, coro) -> bool:
+        """
+        在当前事件循环中后台执行
+        :param coro: 协程
+        :return: 是否已提交, 没有运行中的事件循环时为False
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            coro.close()
+            return False
+        task = loop.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return True
+
+    async def _persist(self, digest: bytes, expires_at: float) -> bool:
+        """
+        写入Redis并通知其他进程
+        :param digest: 令牌摘要
+        :param expires_at: 令牌过期时间（时间戳, 秒）
+        :return: 是否成功
+        """
+        ttl = math.ceil(expires_at - time.time())
+        if ttl <= 0:
+            return True
+        message = json.dumps({"origin": self._instance_id, "digest": digest.hex(), "exp": expires_at})
+        try:
+            redis = await Cache.client()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._key(digest), str(expires_at), ex=ttl)
+                pipe.sadd(TOKEN_BLACKLIST_INDEX, digest.hex())
+                pipe.publish(TOKEN_BLACKLIST_CHANNEL, message)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to persist token revocation to Redis: {str(e)}")
+            return False
+
+    def _ensure_tasks(self) -> None:
+        """在当前事件循环中启动订阅和清理任务（已在运行时跳过）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._listener_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        super()._ensure_tasks()
+        self._listener_task = loop.create_task(self._listen())
+
+    async def _fetch(self, redis) -> List[Tuple[bytes, float]]:
+        """
+        读取Redis中全部未过期的吊销记录, 并从索引中移除已过期的摘要
+        :param redis: Redis客户端
+        :return: [(摘要, 过期时间)]
+        """
+        digests = [_text(digest) for digest in await redis.smembers(TOKEN_BLACKLIST_INDEX)]
+        if not digests:
+            return []
+        async with redis.pipeline(transaction=False) as pipe:
+            for digest in digests:
+                pipe.get(f"{TOKEN_BLACKLIST_PREFIX}:{digest}")
+            values = await pipe.execute()
+        records, expired = [], []
+        for digest, value in zip(digests, values):
+            if value is None:
+                expired.append(digest)
+            else:
+                records.append((bytes.fromhex(digest), float(_text(value))))
+        if expired:
+            await redis.srem(TOKEN_BLACKLIST_INDEX, *expired)
+        return records
+
+    async def _load(self, redis) -> int:
+        """
+        从Redis加载全部未过期的吊销记录
+        :param redis: Redis客户端
+        :return: 加载的数量
+        """
+        records = await self._fetch(redis)
+        for digest, expires_at in records:
+            self._remember(digest, expires_at)
+        return len(records)
+
+    async def _listen(self):
+        """订阅吊销消息; 每次(重新)订阅后从Redis重新加载, 补上断开期间错过的消息"""
+        while True:
+            pubsub = None
+            try:
+                redis = await Cache.client()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(TOKEN_BLACKLIST_CHANNEL)
+                loaded = await self._load(redis)
+                self.synced = self.subscribed = True
+                logger.info(f"Subscribed to token blacklist channel, {loaded} revoked tokens loaded")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") == self._instance_id:
+                        continue
+                    self._remember(bytes.fromhex(data["digest"]), float(data["exp"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token blacklist listener error: {str(e)}")
+                await asyncio.sleep(TOKEN_BLACKLIST_RETRY_DELAY)
+            finally:
+                # 断开期间保留上次加载的记录, 重新订阅后再次加载补上错过的消息
+                self.subscribed = False
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
 
 # 创建全局实例
-token_blacklist = TokenBlacklist() 
\ No newline at end of file
+if TOKEN_BLACKLIST_BACKEND == "local":
+    token_blacklist = LocalTokenBlacklist()
+elif TOKEN_BLACKLIST_BACKEND == "redis":
+    token_blacklist = TokenBlacklist()
+else:
+    raise ValueError(f"Unknown token blacklist backend: {TOKEN_BLACKLIST_BACKEND}")
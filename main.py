@@ -10,6 +10,13 @@ from pathlib import Path
 from settings import configure_cors
 from core.cache import Cache
 from core.logger import setup_logger
+from core.response import ApiResponse
+from core.middleware import admin_required, error_handler
+from core.slow_query_log import slow_query_log
+from core.token_blacklist import token_blacklist
+from core.database import engine
+from apps.products import fts as products_fts
+from apps.chat import fts as chat_fts
 import asyncio
 
 # 设置日志记录器
@@ -72,6 +79,46 @@ async def shutdown(request: Request) -> Response:
             description="Failed to shutdown"
         )
 
+# 缓存指标
+@app.get("/metrics/cache")
+@error_handler
+@admin_required
+async def cache_metrics(request: Request) -> Response:
+    """获取缓存各操作、各键前缀的调用次数、命中率和延迟分布"""
+    return ApiResponse.success(Cache.metrics_snapshot())
+
+# 慢查询记录
+@app.get("/admin/slow-queries")
+@error_handler
+@admin_required
+async def slow_queries(request: Request) -> Response:
+    """获取最近的慢查询（含参数结构和执行计划）及按语句汇总的次数和耗时, 可选查询参数 limit"""
+    limit = request.query_params.get("limit", None)
+    if limit:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return ApiResponse.validation_error("limit 必须为正整数")
+    return ApiResponse.success(slow_query_log.snapshot(limit or None))
+
+@app.delete("/admin/slow-queries")
+@error_handler
+@admin_required
+async def slow_queries_reset(request: Request) -> Response:
+    """清空慢查询记录"""
+    slow_query_log.reset()
+    return ApiResponse.success(message="慢查询记录已清空")
+
+# 令牌黑名单统计
+@app.get("/admin/token-blacklist")
+@error_handler
+@admin_required
+async def token_blacklist_stats(request: Request) -> Response:
+    """获取本进程令牌黑名单的记录数、内存占用、布隆过滤器状态和命中统计"""
+    return ApiResponse.success(token_blacklist.stats())
+
 # 在应用启动时自动初始化Redis
 async def init_redis():
     try:
@@ -91,6 +138,22 @@ async def init_redis():
         logger.error(f"Failed to initialize Redis: {str(e)}")
         raise
 
+# 在应用启动时检查全文索引, 已有数据库缺少索引或分词器配置变化时自动重建
+async def init_search_indexes():
+    if engine.dialect.name != "sqlite":
+        return
+    try:
+        async with engine.begin() as conn:
+            for name, module in (("products", products_fts), ("chat messages", chat_fts)):
+                if await module.ensure_fts(conn):
+                    logger.info(f"Full-text index for {name} rebuilt")
+    except Exception as e:
+        logger.error(f"Failed to prepare full-text indexes, search is unavailable until "
+                     f"'python -m apps.products.fts' / 'python -m apps.chat.fts' succeeds: {str(e)}")
+    finally:
+        # 连接属于启动时的事件循环, 释放后由服务进程重新建立
+        await engine.dispose()
+
 if __name__ == "__main__":
     try:
         # 在新的事件循环中初始化Redis
@@ -98,6 +161,7 @@ if __name__ == "__main__":
         asyncio.set_event_loop(loop)
         loop.run_until_complete(init_redis())
         logger.info("Redis initialized successfully")
+        loop.run_until_complete(init_search_indexes())
         
         # 启动应用
         app.start(port=8080, host="0.0.0.0")